@@ -7,6 +7,8 @@ usando regex e filtragem leve. Compatível com pipeline oficial.
 
 import os, re, json, cv2, numpy as np
 
+from core_pipeline.api.page_prep import PreparedPage
+
 def run_calibra_p10(pages_dir, outputs_dir, log_list):
     regex_codigo = r"CT\d{3,5}"
     regex_preco = r"R?\$ ?\d{1,3}(?:\.\d{3})*,\d{2}"
@@ -29,9 +31,7 @@ def run_calibra_p10(pages_dir, outputs_dir, log_list):
             if img is None:
                 log_list.append(f"⚠️ Falha ao ler {fname}\n")
                 continue
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            blur = cv2.medianBlur(gray, 3)
-            _, th = cv2.threshold(blur, 180, 255, cv2.THRESH_BINARY)
+            th = PreparedPage(img).get("th_180")
             text = " ".join(re.findall(r"[A-Z0-9\.\,\$\/\-]+", str(th)))
 
             codigos = re.findall(regex_codigo, text)
@@ -0,0 +1,326 @@
+"""
+Garimpo ML – Extração de imagens embutidas no PDF
+-------------------------------------------------
+Alternativa ao recorte raster (product_cropper): as fotos de produto já
+estão dentro do PDF como XObjects. Aqui cada imagem é extraída uma única
+vez (por xref e por hash de conteúdo), gravada com os bytes originais
+(sem decodificar/recortar/recodificar) e associada aos produtos pelo
+retângulo onde é desenhada na página.
+
+Imagens repetidas em muitas páginas (logos, selos, fundos) são ignoradas.
+
+Requer PyMuPDF (fitz). Sem ele, as funções retornam status "error" e o
+pipeline pode cair para o recorte raster.
+
+attach_catalog_images é o ponto de entrada do job de extração: localiza
+cada produto do catálogo pela caixa da sua linha de OCR e usa as imagens
+embutidas, com o recorte raster (product_cropper) nas páginas sem elas.
+"""
+
+import os
+import hashlib
+import traceback
+from collections import defaultdict
+
+from core_pipeline.api.pdf_renderer import load_image
+from core_pipeline.api.product_cropper import crop_product_from_page
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # dependência opcional
+    fitz = None
+
+
+# Imagem presente em mais que esta fração das páginas → decorativa (logo)
+MAX_PAGES_RATIO = 0.5
+# Imagens menores que isso (em pixels a dpi) não são fotos de produto
+MIN_SIZE_PX = 80
+
+
+def _placement_bbox(page, rect, scale):
+    """
+    Converte o retângulo de desenho (pontos PDF) para pixels no dpi do
+    pipeline, no mesmo espaço das páginas renderizadas.
+    """
+    r = fitz.Rect(rect)
+    if page.rotation:
+        r = r * page.rotation_matrix
+    return [int(round(r.x0 * scale)), int(round(r.y0 * scale)),
+            int(round(r.x1 * scale)), int(round(r.y1 * scale))]
+
+
+def extract_embedded_images(pdf_path, output_dir, dpi=300,
+                            min_size_px=MIN_SIZE_PX, max_pages_ratio=MAX_PAGES_RATIO):
+    """
+    Extrai as imagens embutidas, deduplicadas, com suas posições.
+
+    Retorno:
+        {
+          "status": "success" | "error",
+          "images": {
+              <hash>: {
+                  "hash": str,
+                  "path": str,
+                  "ext": str,
+                  "pages": [int, ...],
+              }, ...
+          },
+          "placements": {
+              <page>: [{"hash": str, "bbox": [x1, y1, x2, y2]}, ...]
+          },
+          "skipped_repeated": int,   # imagens descartadas como logo/fundo
+          "error": str | None
+        }
+    """
+    result = {
+        "status": "error",
+        "images": {},
+        "placements": {},
+        "skipped_repeated": 0,
+        "error": None,
+    }
+
+    if fitz is None:
+        result["error"] = "PyMuPDF (fitz) não instalado"
+        return result
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        scale = dpi / 72.0
+
+        xref_hash = {}                 # xref → hash de conteúdo
+        pages_by_hash = defaultdict(set)
+        raw_placements = defaultdict(list)
+        payloads = {}                  # hash → (bytes, ext), só até gravar
+
+        with fitz.open(pdf_path) as doc:
+            total_pages = doc.page_count
+
+            for pno in range(total_pages):
+                page = doc[pno]
+                page_num = pno + 1
+
+                for info in page.get_image_info(xrefs=True):
+                    xref = info.get("xref") or 0
+                    if xref <= 0:
+                        # imagem inline (sem xref) → fica para o recorte raster
+                        continue
+
+                    bbox = _placement_bbox(page, info["bbox"], scale)
+                    if (bbox[2] - bbox[0]) < min_size_px or (bbox[3] - bbox[1]) < min_size_px:
+                        continue
+
+                    # Extrai cada xref uma única vez
+                    if xref not in xref_hash:
+                        extracted = doc.extract_image(xref)
+                        if not extracted or not extracted.get("image"):
+                            xref_hash[xref] = None
+                            continue
+                        data = extracted["image"]
+                        digest = hashlib.sha1(data).hexdigest()
+                        xref_hash[xref] = digest
+                        payloads.setdefault(digest, (data, extracted.get("ext", "bin")))
+
+                    digest = xref_hash[xref]
+                    if digest is None:
+                        continue
+
+                    pages_by_hash[digest].add(page_num)
+                    raw_placements[page_num].append({"hash": digest, "bbox": bbox})
+
+        # Descarta imagens repetidas em muitas páginas (logos/fundos)
+        limit = max(2, int(total_pages * max_pages_ratio))
+        decorative = {h for h, pgs in pages_by_hash.items() if total_pages > 1 and len(pgs) >= limit}
+        result["skipped_repeated"] = len(decorative)
+
+        # Grava cada imagem única uma vez, com os bytes originais
+        for digest, (data, ext) in payloads.items():
+            if digest in decorative or digest not in pages_by_hash:
+                continue
+            path = os.path.join(output_dir, f"img_{digest[:16]}.{ext}")
+            if not os.path.exists(path):
+                with open(path, "wb") as f:
+                    f.write(data)
+            result["images"][digest] = {
+                "hash": digest,
+                "path": path,
+                "ext": ext,
+                "pages": sorted(pages_by_hash[digest]),
+            }
+
+        for page_num, items in raw_placements.items():
+            kept = [p for p in items if p["hash"] in result["images"]]
+            if kept:
+                result["placements"][page_num] = kept
+
+        result["status"] = "success"
+        return result
+
+    except Exception as e:
+        result["error"] = str(e)
+        result["traceback"] = traceback.format_exc()
+        return result
+
+
+def _intersection(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    return w * h if w > 0 and h > 0 else 0
+
+
+def _center_distance(a, b):
+    ax, ay = (a[0] + a[2]) / 2.0, (a[1] + a[3]) / 2.0
+    bx, by = (b[0] + b[2]) / 2.0, (b[1] + b[3]) / 2.0
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5
+
+
+def match_images_to_products(products, placements, max_distance=900):
+    """
+    Associa imagens a produtos da mesma página pelo retângulo de desenho.
+
+    Prioridade: maior sobreposição imagem × bbox do produto; sem
+    sobreposição, o centro mais próximo dentro de max_distance (pixels).
+    Cada imagem desenhada atende no máximo um produto.
+
+    Retorna {product_index: placement}.
+    """
+    candidates = []
+    for idx, prod in enumerate(products):
+        bbox = prod.get("bbox")
+        if not bbox or len(bbox) != 4:
+            continue
+        for pi, pl in enumerate(placements):
+            inter = _intersection(bbox, pl["bbox"])
+            dist = _center_distance(bbox, pl["bbox"])
+            if inter <= 0 and dist > max_distance:
+                continue
+            # sobreposição vence qualquer distância
+            candidates.append((-inter, dist, idx, pi))
+
+    candidates.sort()
+    used_products, used_placements, matches = set(), set(), {}
+    for _, _, idx, pi in candidates:
+        if idx in used_products or pi in used_placements:
+            continue
+        matches[idx] = placements[pi]
+        used_products.add(idx)
+        used_placements.add(pi)
+    return matches
+
+
+def attach_embedded_images(pdf_path, page_products, output_dir, dpi=300):
+    """
+    Substituto de product_cropper.crop_products_from_list baseado nas
+    imagens embutidas.
+
+    Args:
+        pdf_path (str): PDF do job.
+        page_products (dict): {page_num: [produto, ...]} com "bbox" em
+            pixels a `dpi` (mesmo espaço de product_detector).
+        output_dir (str): pasta das imagens deduplicadas.
+
+    Returns:
+        {
+          "status": "success" | "error",
+          "items": {page_num: [{"product_index", "output_path", "bbox_final", "image_hash"}]},
+          "unique_images": int,
+          "skipped_repeated": int,
+          "error": str | None
+        }
+    """
+    result = {
+        "status": "error",
+        "items": {},
+        "unique_images": 0,
+        "skipped_repeated": 0,
+        "error": None,
+    }
+
+    extracted = extract_embedded_images(pdf_path, output_dir, dpi=dpi)
+    if extracted["status"] != "success":
+        result["error"] = extracted["error"]
+        return result
+
+    images = extracted["images"]
+    for page_num, products in page_products.items():
+        placements = extracted["placements"].get(int(page_num), [])
+        matches = match_images_to_products(products, placements)
+
+        items = []
+        for idx in sorted(matches):
+            pl = matches[idx]
+            items.append({
+                "product_index": idx,
+                "output_path": images[pl["hash"]]["path"],
+                "bbox_final": pl["bbox"],
+                "image_hash": pl["hash"],
+            })
+        result["items"][page_num] = items
+
+    result["status"] = "success"
+    result["unique_images"] = len(images)
+    result["skipped_repeated"] = extracted["skipped_repeated"]
+    return result
+
+
+def attach_catalog_images(pdf_path, produtos, line_boxes, crops_dir, page_image=None, url_prefix=""):
+    """
+    Preenche "imagem" dos produtos do catálogo do job.
+
+    Args:
+        pdf_path (str): PDF do job.
+        produtos (list): produtos do catálogo ({"page", "original", ...});
+            alterados no lugar.
+        line_boxes (dict): {page: {texto da linha: [x1, y1, x2, y2]}} a
+            300 DPI; o produto é localizado pelo seu "original".
+        crops_dir (str): pasta das imagens (embutidas e recortes).
+        page_image (callable | None): page → caminho/array da página a
+            300 DPI (ou None) para o recorte raster das páginas sem
+            imagem embutida; None → sem fallback.
+        url_prefix (str): prefixo do "imagem" gravado no produto.
+
+    Returns:
+        {"embedded": int, "cropped": int, "unique_images": int,
+         "skipped_repeated": int, "error": str | None}
+    """
+    summary = {"embedded": 0, "cropped": 0, "unique_images": 0, "skipped_repeated": 0, "error": None}
+
+    refs = defaultdict(list)           # page → [(produto, bbox), ...]
+    for prod in produtos:
+        bbox = line_boxes.get(prod.get("page"), {}).get(prod.get("original", ""))
+        if bbox:
+            refs[prod["page"]].append((prod, bbox))
+    if not refs:
+        return summary
+
+    os.makedirs(crops_dir, exist_ok=True)
+    page_products = {pg: [{"bbox": bbox} for _, bbox in items] for pg, items in refs.items()}
+    res = attach_embedded_images(pdf_path, page_products, crops_dir)
+    if res["status"] == "success":
+        summary["unique_images"] = res["unique_images"]
+        summary["skipped_repeated"] = res["skipped_repeated"]
+    else:
+        summary["error"] = res["error"]
+
+    for page_num, items in refs.items():
+        matched = res["items"].get(page_num) or []
+        for it in matched:
+            prod = items[it["product_index"]][0]
+            prod["imagem"] = url_prefix + os.path.basename(it["output_path"])
+        summary["embedded"] += len(matched)
+        if matched or page_image is None:
+            continue
+
+        # Página sem imagem embutida (ou sem PyMuPDF): recorte raster
+        src = page_image(page_num)
+        img = load_image(src) if src is not None else None
+        if img is None:
+            continue
+        for i, (prod, bbox) in enumerate(items):
+            name = f"page_{page_num:02d}_{prod.get('codigo') or i}.jpg"
+            crop = crop_product_from_page(img, bbox, os.path.join(crops_dir, name))
+            if crop["status"] == "success":
+                prod["imagem"] = url_prefix + name
+                summary["cropped"] += 1
+
+    return summary
@@ -4,8 +4,13 @@ import json
 import traceback
 import subprocess
 import shutil
+import queue
+import threading
+import time
 from pathlib import Path
 
+import cv2
+
 # =========================================================
 # 🔹 Garantir que o pacote core_pipeline seja importável
 #    quando o script é chamado via caminho absoluto
@@ -14,8 +19,19 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
-from core_pipeline.api.pdf_to_jpg_converter import convert_pdf_to_jpg
+from core_pipeline.api.pdf_to_jpg_converter import convert_pdf_to_jpg, render_pdf_page, _get_page_count
+from core_pipeline.api.pdf_renderer import PdfDocument, RENDER_BACKEND, has_inprocess_backend, save_page_jpg, load_image
+from core_pipeline.api.pdf_text_layer import PdfTextLayer
+from core_pipeline.api.page_cache import PageCache, PAGE_CACHE_ENABLED
+from core_pipeline.api.page_store import PageStore, PAGE_STORE_ENABLED, PAGE_STORE_DIRNAME, page_name
+from core_pipeline.api.page_fingerprint import SupplierPageIndex, fingerprint_page, PAGE_REUSE_ENABLED
+from core_pipeline.api.embedded_images import attach_catalog_images
+from core_pipeline.api.ocr_executor import (
+    OcrExecutor, OCR_WORKERS, OCR_PAGE_TIMEOUT_S, OCR_PAGE_MAX_RSS_MB, OCR_PAGE_RETRIES
+)
 from core_pipeline.api.ocr_page_processor import run_ocr, _group_tokens_by_y, _concat_line_tokens
+from core_pipeline.pipeline_normalize_by_page import normalize_page
+from core_pipeline.assemble_products import clean_item
 
 
 # =========================================================
@@ -25,6 +41,32 @@ DATA_ROOT = "/home/ubuntu/garimpo-ml/core_pipeline/data"
 CENTRAL_OUTPUT_ROOT = "/home/ubuntu/garimpo-ml/core_pipeline/outputs"
 PYTHON_BIN = "/home/ubuntu/garimpo-ml/venv/bin/python3"
 
+# Número de pdftoppm simultâneos na conversão PDF → JPG (1 = sequencial)
+PDF_RENDER_WORKERS = int(os.environ.get("GARIMPO_PDF_WORKERS", os.cpu_count() or 1))
+
+# Modo streaming: cada página passa por render → OCR → normalize → assemble
+# assim que fica pronta (filas limitadas entre as etapas)
+STREAMING_MODE = os.environ.get("GARIMPO_STREAMING", "0") == "1"
+STREAM_QUEUE_SIZE = int(os.environ.get("GARIMPO_STREAM_QUEUE", "4"))
+
+# Com renderização em memória, grava page_XX.jpg apenas se necessário
+# (pages_jpg é servido ao navegador pelo static_output_router)
+KEEP_PAGE_JPG = os.environ.get("GARIMPO_KEEP_PAGE_JPG", "1") == "1"
+
+# Usa a camada de texto nativa do PDF (quando utilizável) no lugar do OCR
+TEXT_LAYER_MODE = os.environ.get("GARIMPO_TEXT_LAYER", "1") == "1"
+
+# Tarefa de OCR executada nos workers do OcrExecutor (importada no worker)
+OCR_TASK = "core_pipeline.api.extract_pipeline:ocr_page_task"
+
+# Nova tentativa de uma página que estourou tempo/memória: imagem reduzida
+# (300 → 200 DPI por padrão)
+OCR_DEGRADED_SCALE = float(os.environ.get("GARIMPO_OCR_DEGRADED_SCALE", str(2 / 3)))
+
+# Imagens dos produtos: embutidas no PDF, recorte da página como fallback
+# (gravadas em outputs/crops, servidas pelo static_output_router)
+PRODUCT_IMAGES_MODE = os.environ.get("GARIMPO_PRODUCT_IMAGES", "1") == "1"
+
 
 # =========================================================
 # 🔹 Utilitários
@@ -33,12 +75,14 @@ def ensure_dir(path: str | Path):
     Path(path).mkdir(parents=True, exist_ok=True)
 
 
-def write_progress(progress_path: Path, status: str, progress: int, step: str):
+def write_progress(progress_path: Path, status: str, progress: int, step: str, pages: dict | None = None):
     data = {
         "status": status,
         "progress": progress,
         "step": step
     }
+    if pages is not None:
+        data["pages"] = pages
     try:
         with progress_path.open("w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
@@ -53,18 +97,32 @@ def write_progress(progress_path: Path, status: str, progress: int, step: str):
 def step_convert_pdf_to_jpg(pdf_path: Path, pages_dir: Path):
     """
     Etapa 1: PDF → JPG usando pdf_to_jpg_converter.py
+    (renderização paralela por intervalos de páginas)
     """
     ensure_dir(pages_dir)
-    conv = convert_pdf_to_jpg(str(pdf_path), str(pages_dir))
+    conv = convert_pdf_to_jpg(str(pdf_path), str(pages_dir), workers=PDF_RENDER_WORKERS)
     return conv
 
 
-def step_ocr_pages(pages_dir: Path, ocr_dir: Path):
+def step_ocr_pages(pages_dir: Path, ocr_dir: Path, pdf_path: Path | None = None,
+                   stats: dict | None = None, page_index: SupplierPageIndex | None = None,
+                   job_id: str | None = None, line_boxes: dict | None = None):
     """
     Etapa 2: OCR de cada página.
     Usa run_ocr + agrupamento visual para gerar uma lista de linhas de texto.
+    Se pdf_path for informado (e TEXT_LAYER_MODE), páginas com camada de
+    texto nativa utilizável dispensam o OCR.
+    Com page_index, páginas idênticas a uma versão anterior do catálogo do
+    fornecedor reaproveitam o OCR gravado (ver page_fingerprint).
+    As páginas restantes vão para o OcrExecutor (pool de processos com
+    motor aquecido por worker; GARIMPO_OCR_WORKERS / GARIMPO_OCR_THREADS),
+    no modo protegido: página que passar do tempo ou da memória é refeita
+    em resolução menor e, se falhar de novo, fica registrada em
+    stats["ocr_failures"] enquanto o job segue.
     Salva arquivos:
         ocr_dir/page_XX_ocr.json  (lista de strings)
+    Com line_boxes (dict), recebe {page: {linha: bbox}} das páginas com
+    tokens (ver ocr_page_lines).
     Retorna lista de páginas processadas.
     """
     ensure_dir(ocr_dir)
@@ -74,29 +132,285 @@ def step_ocr_pages(pages_dir: Path, ocr_dir: Path):
         key=lambda p: p.name
     )
 
-    processed_pages = []
+    text_layer = PdfTextLayer(pdf_path) if (pdf_path and TEXT_LAYER_MODE) else None
+    text_layer_pages = 0
+    reuse = new_reuse_stats()
+    ocr_report = new_ocr_report()
+    lines_by_page = {}
+    boxes_by_page = {}
+    pending = []  # (page_num, img_path, fingerprint) que precisam de OCR
 
-    for idx, img_path in enumerate(page_files, start=1):
-        ocr_res = run_ocr(str(img_path))
-        if ocr_res.get("status") != "success":
-            # Se falhar, apenas registra e segue
-            continue
+    try:
+        # 1) Camada de texto nativa e páginas reaproveitadas (sem OCR)
+        for idx, img_path in enumerate(page_files, start=1):
+            page_num = idx  # assume ordenação natural da conversão
 
-        tokens = ocr_res.get("tokens", [])
-        linhas = _group_tokens_by_y(tokens, max_gap=25)
-        linhas_concat = _concat_line_tokens(linhas)
+            tokens = text_layer.usable_page_tokens(page_num) if text_layer else None
+            if tokens is not None:
+                text_layer_pages += 1
+                boxes_by_page[page_num] = {}
+                lines_by_page[page_num] = ocr_page_lines(img_path, tokens=tokens,
+                                                         line_boxes=boxes_by_page[page_num])
+                continue
+
+            fp, reused_lines = lookup_reused_page(page_num, img_path, page_index, reuse)
+            if reused_lines is not None:
+                lines_by_page[page_num] = reused_lines
+                continue
+
+            pending.append((page_num, img_path, fp))
+
+        # 2) OCR das demais páginas no pool (resultados em ordem de página)
+        if pending:
+            with new_ocr_executor() as executor:
+                items = executor.map(
+                    [(str(img_path), 1.0) for _, img_path, _ in pending],
+                    keys=[page_num for page_num, _, _ in pending],
+                    degrade=degrade_page_args,
+                )
+                for item, (page_num, _, fp) in zip(items, pending):
+                    if not note_ocr_item(ocr_report, page_num, item):
+                        # Se falhar, apenas registra e segue
+                        continue
+                    ocr_res = item["result"]
+
+                    boxes_by_page[page_num] = {}
+                    linhas_concat = ocr_page_lines(None, tokens=ocr_res.get("tokens", []),
+                                                   line_boxes=boxes_by_page[page_num])
+                    lines_by_page[page_num] = linhas_concat
+                    if page_index is not None and fp is not None:
+                        page_index.add(job_id, page_num, fp, linhas_concat, item["seconds"])
+    finally:
+        if text_layer:
+            text_layer.close()
+        if page_index is not None:
+            page_index.save()
+
+    processed_pages = []
+    for page_num in sorted(lines_by_page):
+        linhas_concat = lines_by_page[page_num]
+        if linhas_concat is None:
+            continue
 
-        page_num = idx  # assume ordenação natural da conversão
         out_json = ocr_dir / f"page_{page_num:02d}_ocr.json"
 
         with out_json.open("w", encoding="utf-8") as f:
             json.dump(linhas_concat, f, ensure_ascii=False, indent=2)
 
         processed_pages.append(page_num)
+        if line_boxes is not None and page_num in boxes_by_page:
+            line_boxes[page_num] = boxes_by_page[page_num]
+
+    if stats is not None:
+        stats["text_layer_pages"] = text_layer_pages
+        stats["ocr_pages"] = len(processed_pages) - text_layer_pages - reuse["pages_skipped"]
+        stats["page_reuse"] = reuse
+        stats["ocr_degraded_pages"] = ocr_report["degraded_pages"]
+        stats["ocr_failures"] = ocr_report["failed_pages"]
 
     return processed_pages
 
 
+# =========================================================
+# 🔹 OCR protegido por página (tempo, memória, nova tentativa)
+# =========================================================
+def _scale_token(tok, factor):
+    out = dict(tok)
+    if "bbox" in out:
+        out["bbox"] = [int(round(v * factor)) for v in out["bbox"]]
+    for k in ("left", "top", "width", "height"):
+        if k in out:
+            out[k] = int(round(out[k] * factor))
+    return out
+
+
+def ocr_page_task(img, scale=1.0):
+    """
+    Tarefa dos workers de OCR: run_ocr na página (caminho ou np.ndarray).
+    Com scale < 1 (tentativa degradada) a página é reduzida antes do OCR e
+    os tokens voltam para as coordenadas originais (o agrupamento por y
+    continua em pixels de 300 DPI).
+    """
+    src = str(img) if isinstance(img, (str, Path)) else img
+    if isinstance(src, str) and src.lower().endswith(".npy"):
+        # página do PageStore: mmap no próprio worker (sem decodificar nem
+        # serializar o array entre processos)
+        src = load_image(src)
+        if src is None:
+            return {"status": "error", "tokens": [], "error": f"Falha ao carregar imagem: {img}"}
+    if scale == 1.0:
+        return run_ocr(src)
+
+    arr = load_image(src)
+    if arr is None:
+        return {"status": "error", "tokens": [], "error": f"Falha ao carregar imagem: {img}"}
+    small = cv2.resize(arr, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    ocr_res = run_ocr(small)
+    if ocr_res.get("status") == "success":
+        ocr_res["tokens"] = [_scale_token(t, 1.0 / scale) for t in ocr_res.get("tokens", [])]
+    ocr_res["degraded_scale"] = scale
+    return ocr_res
+
+
+def degrade_page_args(args, attempt):
+    """
+    Argumentos da nova tentativa de uma página (OcrExecutor.map degrade=).
+    """
+    return (args[0], OCR_DEGRADED_SCALE)
+
+
+def new_ocr_executor(workers=None):
+    """
+    OcrExecutor no modo protegido: GARIMPO_OCR_PAGE_TIMEOUT por página,
+    GARIMPO_OCR_PAGE_MAX_RSS_MB por worker, GARIMPO_OCR_PAGE_RETRIES.
+    """
+    return OcrExecutor(
+        OCR_TASK, workers=workers,
+        timeout=OCR_PAGE_TIMEOUT_S, max_rss_mb=OCR_PAGE_MAX_RSS_MB, retries=OCR_PAGE_RETRIES,
+    )
+
+
+def note_ocr_item(ocr_report: dict, page_num: int, item: dict):
+    """
+    Registra no relatório as páginas refeitas em modo degradado e as que
+    falharam de vez (timeout / rss / crash / error).
+    """
+    ok = item["result"] is not None and item["result"].get("status") == "success"
+    if ok and item.get("attempts", 1) > 1:
+        ocr_report["degraded_pages"].append(page_num)
+    if not ok:
+        ocr_report["failed_pages"].append({
+            "page": page_num,
+            "failure": item.get("failure") or "error",
+            "attempts": item.get("attempts", 1),
+            "error": (item["error"] or (item["result"] or {}).get("error") or "")[:500],
+        })
+    return ok
+
+
+def new_ocr_report() -> dict:
+    return {"degraded_pages": [], "failed_pages": []}
+
+
+def line_bbox(tokens) -> list | None:
+    """
+    bbox [x1, y1, x2, y2] (união dos tokens) de uma linha agrupada.
+    """
+    boxes = [t["bbox"] for t in tokens if isinstance(t, dict) and t.get("bbox")]
+    if not boxes:
+        return None
+    return [min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes)]
+
+
+def ocr_page_lines(img_path, tokens=None, executor=None, ocr_report=None, page_num=None,
+                   line_boxes=None):
+    """
+    OCR de uma página → lista de linhas de texto (agrupamento visual).
+    Aceita caminho da imagem ou a página renderizada em memória (np.ndarray).
+    Se tokens (camada de texto nativa) forem informados, o OCR é dispensado.
+    Com executor (new_ocr_executor), o OCR roda no worker protegido e o
+    resultado entra em ocr_report (new_ocr_report).
+    Com line_boxes (dict), recebe {texto da linha: bbox} para localizar os
+    produtos na página (imagens, ver attach_catalog_images).
+    Retorna None se o OCR falhar.
+    """
+    if tokens is None:
+        src = img_path if not isinstance(img_path, (str, Path)) else str(img_path)
+        if executor is not None:
+            item = executor.run((src, 1.0), key=page_num, degrade=degrade_page_args)
+            if ocr_report is not None and not note_ocr_item(ocr_report, page_num, item):
+                return None
+            ocr_res = item["result"] or {}
+        else:
+            ocr_res = run_ocr(src)
+        if ocr_res.get("status") != "success":
+            return None
+        tokens = ocr_res.get("tokens", [])
+
+    linhas = _group_tokens_by_y(tokens, max_gap=25)
+    linhas_concat = _concat_line_tokens(linhas)
+    if line_boxes is not None and len(linhas_concat) == len(linhas):
+        for linha, grupo in zip(linhas_concat, linhas):
+            texto = linha if isinstance(linha, str) else linha.get("original", "")
+            bbox = line_bbox(grupo)
+            if bbox is not None:
+                line_boxes.setdefault(texto, bbox)
+    return linhas_concat
+
+
+def new_reuse_stats() -> dict:
+    return {"pages_skipped": 0, "time_saved_s": 0.0, "pages": {}}
+
+
+def ocr_page_lines_reusing(page_num, img, tokens, page_index, job_id, reuse,
+                           executor=None, ocr_report=None, line_boxes=None):
+    """
+    ocr_page_lines com reaproveitamento entre versões do catálogo:
+    se a página bater (phash + assinatura de blocos) com uma página já
+    processada do fornecedor, devolve as linhas gravadas sem rodar o OCR.
+    Páginas que passam pelo OCR entram no índice para as próximas versões.
+    reuse (dict de new_reuse_stats) acumula páginas puladas e tempo poupado.
+    executor / ocr_report / line_boxes: ver ocr_page_lines (páginas
+    reaproveitadas não trazem caixas).
+    """
+    if tokens is not None:
+        return ocr_page_lines(img, tokens=tokens, line_boxes=line_boxes)
+
+    fp, reused_lines = lookup_reused_page(page_num, img, page_index, reuse)
+    if reused_lines is not None:
+        return reused_lines
+
+    t0 = time.perf_counter()
+    linhas_concat = ocr_page_lines(img, tokens=None, executor=executor,
+                                   ocr_report=ocr_report, page_num=page_num,
+                                   line_boxes=line_boxes)
+    if linhas_concat is not None and fp is not None:
+        page_index.add(job_id, page_num, fp, linhas_concat, time.perf_counter() - t0)
+    return linhas_concat
+
+
+# reuse é compartilhado pelas threads de OCR do modo streaming
+_REUSE_LOCK = threading.Lock()
+
+
+def lookup_reused_page(page_num, img, page_index, reuse):
+    """
+    Procura a página no índice do fornecedor.
+    Retorna (fingerprint | None, linhas reaproveitadas | None).
+    """
+    if page_index is None or img is None:
+        return None, None
+
+    try:
+        fp = fingerprint_page(img)
+    except Exception:
+        return None, None
+
+    hit = page_index.find(fp)
+    if hit is None:
+        return fp, None
+
+    with _REUSE_LOCK:
+        reuse["pages_skipped"] += 1
+        reuse["time_saved_s"] = round(reuse["time_saved_s"] + hit.get("ocr_seconds", 0.0), 3)
+        reuse["pages"][page_num] = {"job_id": hit["job_id"], "page": hit["page"]}
+    return fp, hit["lines"]
+
+
+def mark_reused_products(produtos: list, reused_pages: dict) -> list:
+    """
+    Marca os produtos vindos de páginas reaproveitadas de outra versão.
+    """
+    for p in produtos:
+        origem = reused_pages.get(p.get("page"))
+        if origem is not None:
+            p["reused"] = True
+            p["reused_from"] = origem
+    return produtos
+
+
 def step_copy_ocr_to_central(ocr_dir: Path, central_job_dir: Path):
     """
     Copia os arquivos page_XX_ocr.json do job para:
@@ -146,12 +460,49 @@ def step_run_assemble(job_id: str, cwd: str):
         )
 
 
-def step_generate_job_catalog(job_id: str, supplier: str, date_tag: str, job_outputs_dir: Path):
+def step_attach_product_images(job_id: str, pdf_path: Path, line_boxes: dict,
+                               pages_dir: Path, job_outputs_dir: Path,
+                               store: PageStore | None = None) -> dict:
+    """
+    Etapa 4b: imagens dos produtos de core_pipeline/outputs/<JOB_ID>/catalogo_base.json.
+    Cada produto é localizado pela caixa da sua linha de OCR (line_boxes)
+    e recebe a foto embutida no PDF; páginas sem imagem embutida caem
+    para o recorte da página (product_cropper): do PageStore, se houver,
+    senão de pages_dir/page_XX.jpg.
+    As imagens vão para <job_outputs_dir>/crops.
+    Retorna o resumo de attach_catalog_images.
+    """
+    catalog_central = Path(CENTRAL_OUTPUT_ROOT) / job_id / "catalogo_base.json"
+    with catalog_central.open("r", encoding="utf-8") as f:
+        produtos = json.load(f)
+
+    def page_image(page_num):
+        if store is not None and store.has(page_name(page_num)):
+            return store.path_for(page_name(page_num))
+        img_path = pages_dir / f"page_{page_num:02d}.jpg"
+        return str(img_path) if img_path.exists() else None
+
+    summary = attach_catalog_images(
+        str(pdf_path), produtos, line_boxes, str(job_outputs_dir / "crops"),
+        page_image=page_image, url_prefix=f"/static_output/{job_id}/",
+    )
+
+    tmp = catalog_central.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(produtos, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, catalog_central)
+    return summary
+
+
+def step_generate_job_catalog(job_id: str, supplier: str, date_tag: str, job_outputs_dir: Path,
+                              page_reuse: dict | None = None):
     """
     Etapa 5: lê core_pipeline/outputs/<JOB_ID>/catalogo_base.json
     e grava dentro do job:
         <job_outputs_dir>/catalog_raw.json
     no formato esperado pelo HTML (dict com 'products').
+    Com page_reuse, os produtos de páginas reaproveitadas saem marcados
+    e o resumo (páginas puladas, tempo poupado) vai junto no payload.
     """
     central_job_dir = Path(CENTRAL_OUTPUT_ROOT) / job_id
     catalog_central = central_job_dir / "catalogo_base.json"
@@ -165,6 +516,9 @@ def step_generate_job_catalog(job_id: str, supplier: str, date_tag: str, job_out
     if not isinstance(produtos, list):
         raise ValueError("catalogo_base.json inválido: esperado list de produtos.")
 
+    if page_reuse and page_reuse.get("pages"):
+        mark_reused_products(produtos, page_reuse["pages"])
+
     ensure_dir(job_outputs_dir)
     catalog_job = job_outputs_dir / "catalog_raw.json"
 
@@ -175,6 +529,11 @@ def step_generate_job_catalog(job_id: str, supplier: str, date_tag: str, job_out
         "products_count": len(produtos),
         "products": produtos
     }
+    if page_reuse is not None:
+        payload["page_reuse"] = {
+            "pages_skipped": page_reuse["pages_skipped"],
+            "time_saved_s": page_reuse["time_saved_s"],
+        }
 
     with catalog_job.open("w", encoding="utf-8") as f:
         json.dump(payload, f, ensure_ascii=False, indent=2)
@@ -182,14 +541,358 @@ def step_generate_job_catalog(job_id: str, supplier: str, date_tag: str, job_out
     return str(catalog_job)
 
 
+# =========================================================
+# 🔹 Modo streaming (página a página)
+# =========================================================
+_STREAM_END = None
+
+
+def _use_inprocess_renderer() -> bool:
+    return RENDER_BACKEND != "pdftoppm" and has_inprocess_backend()
+
+
+def _stream_render(pdf_path: Path, pages_dir: Path, total_pages: int,
+                   render_q: queue.Queue, state: dict):
+    """
+    Etapa streaming 1: renderiza página a página e entrega na fila de OCR.
+
+    Com backend em memória (pypdfium2/PyMuPDF) o documento é aberto uma vez
+    e o array vai direto para o OCR; o JPG só é gravado se KEEP_PAGE_JPG.
+    Sem ele, usa pdftoppm por página e entrega o caminho do JPG.
+
+    Páginas com camada de texto nativa utilizável levam os tokens junto
+    (o OCR é dispensado) e nem são rasterizadas se KEEP_PAGE_JPG=0.
+
+    Com o PageStore do job (state["store"]), a página em memória é gravada
+    sem perda (.npy) e o que segue na fila é o caminho do .npy: o worker de
+    OCR, a impressão digital e o recorte das imagens abrem via mmap, sem
+    decodificar JPG nem serializar o array.
+    """
+    text_layer = PdfTextLayer(pdf_path) if TEXT_LAYER_MODE else None
+    doc = PdfDocument(pdf_path) if _use_inprocess_renderer() else None
+    store = state["store"] if doc is not None else None
+    page_cache = PageCache() if (doc is None and PAGE_CACHE_ENABLED) else None
+
+    try:
+        for page_num in range(1, total_pages + 1):
+            if state["abort"].is_set():
+                break
+
+            tokens = text_layer.usable_page_tokens(page_num) if text_layer else None
+            if tokens is not None and not KEEP_PAGE_JPG:
+                state["record"](page_num, "rendered")
+                render_q.put((page_num, None, tokens))
+                continue
+
+            img_path = pages_dir / f"page_{page_num:02d}.jpg"
+            if doc is not None:
+                try:
+                    img = doc.render_page(page_num, dpi=300)
+                except Exception as e:
+                    state["record"](page_num, "failed", str(e))
+                    continue
+                if KEEP_PAGE_JPG:
+                    save_page_jpg(img, img_path)
+                if store is not None:
+                    img = store.put(page_name(page_num), img, source=f"{doc.backend}@300dpi")
+            else:
+                res = render_pdf_page(str(pdf_path), page_num, str(img_path), cache=page_cache)
+                if res.get("status") != "success":
+                    state["record"](page_num, "failed", res.get("error"))
+                    continue
+                img = img_path
+
+            state["record"](page_num, "rendered")
+            render_q.put((page_num, img, tokens))
+    except Exception as e:
+        state["errors"].append(e)
+    finally:
+        if doc is not None:
+            doc.close()
+        if page_cache is not None:
+            page_cache.evict()
+            page_cache.flush_stats()
+        if text_layer is not None:
+            text_layer.close()
+        render_q.put(_STREAM_END)
+
+
+def _stream_ocr(ocr_dir: Path, central_job_dir: Path,
+                render_q: queue.Queue, ocr_q: queue.Queue, state: dict,
+                executor: OcrExecutor):
+    """
+    Etapa streaming 2: OCR por página. Grava page_XX_ocr.json no job e no
+    workspace central assim que a página termina.
+
+    Roda em várias threads (uma por worker de OCR, cada uma com o próprio
+    executor), todas consumindo render_q; a última a sair fecha ocr_q.
+    """
+    try:
+        while True:
+            item = render_q.get()
+            if item is _STREAM_END:
+                # devolve o marcador para as demais threads de OCR
+                render_q.put(_STREAM_END)
+                break
+            if state["abort"].is_set():
+                continue
+
+            page_num, img, tokens = item
+            boxes = {}
+            linhas_concat = ocr_page_lines_reusing(
+                page_num, img, tokens, state["page_index"], state["job_id"], state["reuse"],
+                executor=executor, ocr_report=state["ocr_report"], line_boxes=boxes,
+            )
+            if linhas_concat is None:
+                failed = [f for f in state["ocr_report"]["failed_pages"] if f["page"] == page_num]
+                reason = f"OCR interrompido ({failed[0]['failure']})" if failed else "OCR sem sucesso"
+                state["record"](page_num, "failed", reason)
+                continue
+            if tokens is not None:
+                state["record"](page_num, "text_layer")
+            elif page_num in state["reuse"]["pages"]:
+                state["record"](page_num, "reused")
+
+            name = f"page_{page_num:02d}_ocr.json"
+            with (ocr_dir / name).open("w", encoding="utf-8") as f:
+                json.dump(linhas_concat, f, ensure_ascii=False, indent=2)
+            shutil.copyfile(ocr_dir / name, central_job_dir / name)
+            state["line_boxes"][page_num] = boxes
+            # o .npy só fica até o fim do job se for a única fonte do recorte
+            if state["store"] is not None and (KEEP_PAGE_JPG or not PRODUCT_IMAGES_MODE):
+                state["store"].remove(page_name(page_num))
+
+            state["record"](page_num, "ocr_done")
+            ocr_q.put((page_num, linhas_concat))
+    except Exception as e:
+        state["errors"].append(e)
+        state["abort"].set()
+        # Libera o produtor caso esteja bloqueado na fila cheia (o marcador
+        # de fim, se já saiu, volta para as demais threads de OCR)
+        drained = []
+        while not render_q.empty():
+            drained.append(render_q.get_nowait())
+        if any(it is _STREAM_END for it in drained):
+            render_q.put(_STREAM_END)
+    finally:
+        with state["ocr_lock"]:
+            state["ocr_threads"] -= 1
+            last = state["ocr_threads"] == 0
+        if last:
+            ocr_q.put(_STREAM_END)
+
+
+def run_streaming_extract(pdf_path: Path, pages_dir: Path, ocr_dir: Path,
+                          central_job_dir: Path, job_id: str, supplier: str,
+                          date_tag: str, outputs_dir: Path, progress_path: Path,
+                          stats: dict | None = None) -> str:
+    """
+    Modo streaming (ver _run_streaming_extract). Com renderização em
+    memória e PAGE_STORE_ENABLED, as páginas passam pelo PageStore do job,
+    que é esvaziado ao final (sucesso ou erro).
+    """
+    store = None
+    if PAGE_STORE_ENABLED and _use_inprocess_renderer():
+        store = PageStore(pages_dir.parent / PAGE_STORE_DIRNAME)
+    try:
+        return _run_streaming_extract(
+            pdf_path, pages_dir, ocr_dir, central_job_dir, job_id, supplier,
+            date_tag, outputs_dir, progress_path, stats=stats, store=store,
+        )
+    finally:
+        if store is not None:
+            store.clear()
+
+
+def _run_streaming_extract(pdf_path: Path, pages_dir: Path, ocr_dir: Path,
+                           central_job_dir: Path, job_id: str, supplier: str,
+                           date_tag: str, outputs_dir: Path, progress_path: Path,
+                           stats: dict | None = None, store: PageStore | None = None) -> str:
+    """
+    Orquestra render → OCR → normalize → assemble página a página.
+
+    As etapas rodam em threads ligadas por filas limitadas (STREAM_QUEUE_SIZE),
+    então renderização, OCR e montagem se sobrepõem. Cada página gera
+    normalized_page_XX.json e atualiza catalog_raw.json assim que termina.
+    O progress.json recebe o estado de cada página em "pages".
+    Se stats for informado, recebe as mesmas chaves do step_ocr_pages
+    ("text_layer_pages", "ocr_pages", "page_reuse", ...).
+
+    Retorna o caminho do catalog_raw.json do job.
+    """
+    ensure_dir(pages_dir)
+    ensure_dir(ocr_dir)
+    ensure_dir(central_job_dir)
+    ensure_dir(outputs_dir)
+
+    total_pages = _get_page_count(str(pdf_path))
+    if total_pages <= 0:
+        raise RuntimeError("Não foi possível obter o número de páginas do PDF (pdfinfo).")
+
+    lock = threading.Lock()
+    pages_state = {
+        "total": total_pages,
+        "rendered": 0,
+        "ocr_done": 0,
+        "assembled": 0,
+        "text_layer": 0,
+        "reused": 0,
+        "failed": [],
+        "by_page": {},
+    }
+
+    def record(page_num, status, error=None):
+        with lock:
+            pages_state["by_page"][f"{page_num:02d}"] = status
+            if status == "failed":
+                pages_state["failed"].append({"page": page_num, "error": error})
+            elif status in pages_state:
+                pages_state[status] += 1
+            finished = pages_state["assembled"] + len(pages_state["failed"])
+            progress = 5 + int(90 * finished / total_pages)
+            write_progress(
+                progress_path,
+                f"Página {page_num}/{total_pages}: {status}",
+                progress,
+                "streaming",
+                pages=pages_state,
+            )
+
+    reuse = new_reuse_stats()
+    # Mesmo nº de workers de OCR do modo sequencial: uma thread por worker,
+    # cada uma com o próprio worker protegido (tempo/memória)
+    ocr_workers = max(1, OCR_WORKERS)
+    executors = [new_ocr_executor(workers=1) for _ in range(ocr_workers)]
+    state = {
+        "record": record,
+        "errors": [],
+        "abort": threading.Event(),
+        "job_id": job_id,
+        "reuse": reuse,
+        "page_index": SupplierPageIndex(supplier) if PAGE_REUSE_ENABLED else None,
+        "ocr_report": new_ocr_report(),
+        "line_boxes": {},
+        "store": store,
+        "ocr_lock": threading.Lock(),
+        "ocr_threads": ocr_workers,
+    }
+
+    render_q: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    ocr_q: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    threads = [
+        threading.Thread(
+            target=_stream_render,
+            args=(pdf_path, pages_dir, total_pages, render_q, state),
+            daemon=True,
+        ),
+    ] + [
+        threading.Thread(
+            target=_stream_ocr,
+            args=(ocr_dir, central_job_dir, render_q, ocr_q, state, executor),
+            daemon=True,
+        )
+        for executor in executors
+    ]
+    for t in threads:
+        t.start()
+
+    # Etapas 3+4 (normalize + assemble) na thread principal
+    catalog_job = outputs_dir / "catalog_raw.json"
+    produtos_por_pagina: dict[int, list] = {}
+
+    try:
+        while True:
+            item = ocr_q.get()
+            if item is _STREAM_END:
+                break
+
+            page_num, linhas_concat = item
+            norm = normalize_page(page_num, linhas_concat)
+
+            out_norm = central_job_dir / f"normalized_page_{page_num:02d}.json"
+            out_norm.write_text(json.dumps(norm, ensure_ascii=False, indent=2))
+
+            produtos_por_pagina[page_num] = mark_reused_products(
+                [clean_item(it) for it in norm], reuse["pages"]
+            )
+            produtos = sorted(
+                (p for itens in produtos_por_pagina.values() for p in itens),
+                key=lambda x: (x["page"], x["codigo"]),
+            )
+
+            payload = {
+                "job_id": job_id,
+                "supplier": supplier,
+                "date_tag": date_tag,
+                "products_count": len(produtos),
+                "partial": True,
+                "products": produtos
+            }
+            tmp = catalog_job.with_suffix(".json.tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, catalog_job)
+
+            record(page_num, "assembled")
+    except Exception:
+        state["abort"].set()
+        raise
+    finally:
+        for t in threads:
+            t.join(timeout=5)
+        for executor in executors:
+            executor.close()
+        if state["page_index"] is not None:
+            state["page_index"].save()
+
+    if state["errors"]:
+        raise state["errors"][0]
+
+    if not produtos_por_pagina:
+        raise RuntimeError("Nenhuma página processada no OCR.")
+
+    # Catálogo final (mesmo formato do modo sequencial)
+    produtos = sorted(
+        (p for itens in produtos_por_pagina.values() for p in itens),
+        key=lambda x: (x["page"], x["codigo"]),
+    )
+    with (central_job_dir / "catalogo_base.json").open("w", encoding="utf-8") as fp:
+        json.dump(produtos, fp, ensure_ascii=False, indent=2)
+
+    if PRODUCT_IMAGES_MODE:
+        images = step_attach_product_images(
+            job_id, pdf_path, state["line_boxes"], pages_dir, outputs_dir, store=state["store"]
+        )
+        if stats is not None:
+            stats["product_images"] = images
+
+    catalog_path = step_generate_job_catalog(job_id, supplier, date_tag, outputs_dir, page_reuse=reuse)
+    pages_state["time_saved_s"] = reuse["time_saved_s"]
+    if stats is not None:
+        stats["text_layer_pages"] = pages_state["text_layer"]
+        stats["ocr_pages"] = pages_state["ocr_done"] - pages_state["text_layer"] - pages_state["reused"]
+        stats["page_reuse"] = reuse
+        stats["ocr_degraded_pages"] = state["ocr_report"]["degraded_pages"]
+        stats["ocr_failures"] = state["ocr_report"]["failed_pages"]
+    write_progress(progress_path, "Extração finalizada", 100, "done", pages=pages_state)
+    return catalog_path
+
+
 # =========================================================
 # 🔹 Função principal de orquestração
 # =========================================================
-def run_extract_for_job(supplier: str, date_tag: str) -> dict:
+def run_extract_for_job(supplier: str, date_tag: str, streaming: bool | None = None) -> dict:
     """
     Orquestra o pipeline completo para um JOB:
         PDF → JPG → OCR → NORMALIZE → ASSEMBLE → catalog_raw.json
+
+    Com streaming=True (ou GARIMPO_STREAMING=1) as etapas são executadas
+    página a página via run_streaming_extract.
     """
+    if streaming is None:
+        streaming = STREAMING_MODE
+
     job_id = f"{supplier}_{date_tag}"
 
     job_dir = Path(DATA_ROOT) / job_id
@@ -220,6 +923,20 @@ def run_extract_for_job(supplier: str, date_tag: str) -> dict:
     write_progress(progress_path, "Iniciando extração", 1, "start")
 
     try:
+        if streaming:
+            write_progress(progress_path, "Extração em streaming", 5, "streaming")
+            ocr_stats = {}
+            catalog_path = run_streaming_extract(
+                pdf_path, pages_dir, ocr_dir,
+                Path(CENTRAL_OUTPUT_ROOT) / job_id,
+                job_id, supplier, date_tag, outputs_dir, progress_path,
+                stats=ocr_stats,
+            )
+            result["ocr_stats"] = ocr_stats
+            result["status"] = "success"
+            result["catalog_json"] = catalog_path
+            return result
+
         # ------------------------------
         # 1) PDF → JPG
         # ------------------------------
@@ -235,7 +952,14 @@ def run_extract_for_job(supplier: str, date_tag: str) -> dict:
         # 2) OCR páginas
         # ------------------------------
         write_progress(progress_path, "Executando OCR nas páginas", 20, "ocr_pages")
-        processed_pages = step_ocr_pages(pages_dir, ocr_dir)
+        ocr_stats = {}
+        page_index = SupplierPageIndex(supplier) if PAGE_REUSE_ENABLED else None
+        line_boxes = {}
+        processed_pages = step_ocr_pages(
+            pages_dir, ocr_dir, pdf_path=pdf_path, stats=ocr_stats,
+            page_index=page_index, job_id=job_id, line_boxes=line_boxes,
+        )
+        result["ocr_stats"] = ocr_stats
         if not processed_pages:
             msg = "Nenhuma página processada no OCR."
             write_progress(progress_path, msg, 100, "error_ocr")
@@ -261,11 +985,22 @@ def run_extract_for_job(supplier: str, date_tag: str) -> dict:
         write_progress(progress_path, "Montando catálogo final", 75, "assemble_catalog")
         step_run_assemble(job_id, cwd="/home/ubuntu/garimpo-ml")
 
+        # ------------------------------
+        # 5b) Imagens dos produtos (embutidas no PDF / recorte)
+        # ------------------------------
+        if PRODUCT_IMAGES_MODE:
+            write_progress(progress_path, "Associando imagens dos produtos", 85, "product_images")
+            ocr_stats["product_images"] = step_attach_product_images(
+                job_id, pdf_path, line_boxes, pages_dir, outputs_dir
+            )
+
         # ------------------------------
         # 6) Gerar catalog_raw.json dentro do job
         # ------------------------------
         write_progress(progress_path, "Gerando catalog_raw.json do job", 90, "job_catalog")
-        catalog_path = step_generate_job_catalog(job_id, supplier, date_tag, outputs_dir)
+        catalog_path = step_generate_job_catalog(
+            job_id, supplier, date_tag, outputs_dir, page_reuse=ocr_stats.get("page_reuse")
+        )
 
         # ------------------------------
         # 7) Finalização
@@ -5,39 +5,75 @@ import traceback
 import cv2
 import numpy as np
 
+from core_pipeline.api.pdf_renderer import load_image
+from core_pipeline.api.page_prep import is_prepared
+from core_pipeline.api.tiled_ops import run_local
+
+
+# Detector de colunas: "gaps" (projeção vertical + calhas) ou "kmeans"
+COLUMN_DETECTOR = os.environ.get("GARIMPO_COLUMN_DETECTOR", "gaps")
+# Calha entre colunas: tinta ≤ GUTTER_MAX_INK × p90 do perfil vertical,
+# com largura ≥ GUTTER_MIN_FRAC × largura da página
+GUTTER_MAX_INK = 0.15
+GUTTER_MIN_FRAC = 0.01
+# Calhas mantidas: largura ≥ GUTTER_REL × a da calha mais larga da página
+GUTTER_REL = 0.8
+# Componentes mais largos que isso (fração da página: molduras, faixas,
+# fundos) atravessam as colunas e não entram na detecção
+SPANNING_FRAC = 0.5
+# Só componentes do tamanho de texto formam o perfil (fotos invadem calhas)
+TEXT_MAX_FRAC = 0.03
+
+
+def _odd(value, minimum=3):
+    """
+    Arredonda para o ímpar mais próximo (tamanhos de janela/kernel).
+    """
+    v = max(minimum, int(round(value)))
+    return v if v % 2 == 1 else v + 1
+
 
-def _load_image_as_binary(image_path):
+def _load_image_as_binary(image_path, block_size=31):
     """
-    Carrega imagem e aplica uma binarização robusta para segmentação.
+    Carrega imagem (caminho, np.ndarray ou PreparedPage) e aplica uma
+    binarização robusta para segmentação.
+    Com PreparedPage na mesma escala, usa a variante "adaptive_inv_31_5".
+    Páginas muito grandes são binarizadas em blocos (tiled_ops.run_local).
 
     Retorna:
         bin_img (uint8): imagem binária (0/255)
         original (BGR): imagem original
     """
-    img = cv2.imread(image_path)
+    if is_prepared(image_path) and block_size == image_path.block(31):
+        return image_path.get("adaptive_inv_31_5"), image_path.bgr
+
+    img = load_image(image_path)
     if img is None:
         raise RuntimeError(f"Falha ao carregar imagem: {image_path}")
 
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
 
-    # Binarização adaptativa (funciona bem para catálogos com variação de iluminação)
-    bin_img = cv2.adaptiveThreshold(
-        gray,
-        255,
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY_INV,  # invertida: texto/elementos = 255
-        31,
-        5,
-    )
+    def binarize(tile):
+        # Binarização adaptativa (funciona bem para catálogos com variação de iluminação)
+        bin_img = cv2.adaptiveThreshold(
+            tile,
+            255,
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY_INV,  # invertida: texto/elementos = 255
+            block_size,
+            5,
+        )
+        # Pequena abertura para limpar ruídos isolados
+        return cv2.morphologyEx(bin_img, cv2.MORPH_OPEN, kernel, iterations=1)
 
-    # Pequena abertura para limpar ruídos isolados
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-    bin_img = cv2.morphologyEx(bin_img, cv2.MORPH_OPEN, kernel, iterations=1)
+    # Páginas muito grandes: blocos com margem num pool de threads
+    bin_img = run_local(gray, binarize)
 
     return bin_img, img
 
 
-def _find_connected_components(bin_img):
+def _find_connected_components(bin_img, min_area=30):
     """
     Encontra componentes conectados na imagem binária e retorna bounding boxes.
 
@@ -50,7 +86,7 @@ def _find_connected_components(bin_img):
     for label in range(1, num_labels):  # ignora background (0)
         x, y, w, h, area = stats[label]
         # Filtra ruídos muito pequenos
-        if area < 30:
+        if area < min_area:
             continue
         boxes.append((x, y, w, h))
 
@@ -77,9 +113,7 @@ def _kmeans_1d(points, k, max_iter=50):
     if len(unique_points) <= k:
         # Cada ponto único vira um cluster
         centers = unique_points
-        labels = np.zeros_like(points, dtype=int)
-        for i, p in enumerate(points):
-            labels[i] = int(np.where(centers == p)[0][0])
+        labels = np.searchsorted(centers, points).astype(int)
         return centers, labels
 
     # Inicialização determinística: centros igualmente espaçados no intervalo [min, max]
@@ -107,8 +141,9 @@ def _kmeans_1d(points, k, max_iter=50):
     # Ordena centros e realinha labels
     order = np.argsort(centers)
     centers = centers[order]
-    remap = {old: new for new, old in enumerate(order)}
-    labels = np.array([remap[l] for l in labels], dtype=int)
+    remap = np.empty(k, dtype=int)
+    remap[order] = np.arange(k)
+    labels = remap[labels]
 
     return centers, labels
 
@@ -121,10 +156,108 @@ def _estimate_column_count(image_width, min_col_width=250, max_cols=5):
     return max(1, min(estimated, max_cols))
 
 
-def _cluster_columns_from_boxes(boxes, img_width):
+def _column_profile(boxes, img_width):
+    """
+    Perfil vertical: em cada x, quantos componentes o cobrem (bincount das
+    bordas + cumsum, O(n + largura)). Contar componentes, e não somar
+    alturas, deixa as linhas de texto empilhadas pesarem mais que uma
+    foto isolada atravessando a calha.
+    """
+    b = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    x1 = np.clip(b[:, 0], 0, img_width)
+    x2 = np.clip(b[:, 0] + b[:, 2], 0, img_width)
+    edges = np.bincount(x1, minlength=img_width + 1) - np.bincount(x2, minlength=img_width + 1)
+    return np.cumsum(edges[:img_width])
+
+
+def _column_extents(boxes, labels, n):
+    """
+    (x1, x2) de cada coluna: menor x e maior x + w dos seus componentes
+    (None para coluna vazia).
+    """
+    b = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    extents = []
+    for ci in range(n):
+        sel = labels == ci
+        if not sel.any():
+            extents.append(None)
+            continue
+        extents.append((int(b[sel, 0].min()), int((b[sel, 0] + b[sel, 2]).max())))
+    return extents
+
+
+def _gap_column_labels(boxes, img_width, min_col_width=250):
     """
-    Agrupa bounding boxes de componentes em colunas usando KMeans 1D
-    nos centros em X.
+    Colunas pelas calhas do perfil vertical de tinta: o número de colunas
+    sai da própria página. Colunas mais estreitas que min_col_width são
+    unidas à vizinha do lado da calha mais estreita. Componentes que
+    atravessam a página (SPANNING_FRAC) ficam sem coluna (label -1).
+
+    Retorna:
+        (labels, n) — coluna de cada componente — ou None se não houver tinta.
+    """
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    spanning = b[:, 2] > SPANNING_FRAC * img_width
+    if spanning.all():
+        return None
+    text = (~spanning) & (b[:, 3] <= TEXT_MAX_FRAC * img_width)
+
+    prof = _column_profile(b[text], img_width) if text.any() else _column_profile(b[~spanning], img_width)
+    ink = np.flatnonzero(prof > 0)
+    if len(ink) == 0:
+        return None
+    lo, hi = int(ink[0]), int(ink[-1])
+    span = prof[lo:hi + 1]
+
+    # Trechos de pouca tinta, internos (não encostam nas bordas da tinta)
+    low = span <= GUTTER_MAX_INK * np.percentile(span, 90)
+    edges = np.diff(np.concatenate(([0], low.view(np.int8), [0])))
+    g_start = np.flatnonzero(edges == 1)
+    g_end = np.flatnonzero(edges == -1)
+    keep = (
+        (g_end - g_start >= max(2, int(GUTTER_MIN_FRAC * img_width)))
+        & (g_start > 0) & (g_end < len(span))
+    )
+    cuts = list(lo + (g_start[keep] + g_end[keep]) / 2.0)
+    widths = dict(zip(cuts, g_end[keep] - g_start[keep]))
+
+    centers_x = b[:, 0] + b[:, 2] / 2.0
+
+    while True:
+        labels = np.searchsorted(np.asarray(cuts), centers_x)
+        labels[spanning] = -1
+        extents = _column_extents(boxes, labels, len(cuts) + 1)
+        if None in extents:
+            # corte sem componentes de um dos lados: descarta
+            i = extents.index(None)
+            cuts.pop(min(i, len(cuts) - 1))
+            continue
+        if not cuts:
+            return labels, 1
+        col_widths = [x2 - x1 for x1, x2 in extents]
+        narrow = int(np.argmin(col_widths))
+        if col_widths[narrow] >= min_col_width:
+            # calhas bem mais estreitas que a principal: espaço interno
+            # de um bloco (ex.: foto × especificações do produto)
+            widest = max(widths[c] for c in cuts)
+            strong = [c for c in cuts if widths[c] >= GUTTER_REL * widest]
+            if len(strong) == len(cuts):
+                return labels, len(cuts) + 1
+            cuts = strong
+            continue
+        # une à vizinha com a calha mais estreita
+        left = extents[narrow][0] - extents[narrow - 1][1] if narrow > 0 else np.inf
+        right = extents[narrow + 1][0] - extents[narrow][1] if narrow < len(cuts) else np.inf
+        cuts.pop(narrow - 1 if left <= right else narrow)
+
+
+def _cluster_columns_from_boxes(boxes, img_width, min_col_width=250):
+    """
+    Agrupa bounding boxes de componentes em colunas.
+
+    Padrão (COLUMN_DETECTOR="gaps"): calhas do perfil vertical de tinta,
+    com número de colunas automático. KMeans 1D nos centros em X (k pela
+    largura da página) fica como alternativa e como fallback.
 
     Retorna:
         columns: lista de dicionários:
@@ -137,37 +270,31 @@ def _cluster_columns_from_boxes(boxes, img_width):
     if not boxes:
         return []
 
-    centers_x = np.array([x + w / 2.0 for (x, _, w, _) in boxes], dtype=float)
+    found = _gap_column_labels(boxes, img_width, min_col_width) if COLUMN_DETECTOR == "gaps" else None
+    if found is not None:
+        labels, n = found
+    else:
+        centers_x = np.array([x + w / 2.0 for (x, _, w, _) in boxes], dtype=float)
 
-    k = _estimate_column_count(img_width)
-    centers, labels = _kmeans_1d(centers_x, k)
+        k = _estimate_column_count(img_width, min_col_width=min_col_width)
+        centers, labels = _kmeans_1d(centers_x, k)
 
-    if len(centers) == 0:
-        # Fallback: uma coluna cobrindo a página inteira
-        return [
-            {
-                "column_index": 0,
-                "x1": 0,
-                "x2": img_width - 1,
-            }
-        ]
+        if len(centers) == 0:
+            # Fallback: uma coluna cobrindo a página inteira
+            return [
+                {
+                    "column_index": 0,
+                    "x1": 0,
+                    "x2": img_width - 1,
+                }
+            ]
+        n = len(centers)
 
     columns = []
-    for ci in range(len(centers)):
-        # Coleta todos os boxes deste cluster e pega min/max em X
-        xs = []
-        xe = []
-        for (box, lab) in zip(boxes, labels):
-            if lab != ci:
-                continue
-            x, _, w, _ = box
-            xs.append(x)
-            xe.append(x + w)
-        if not xs:
+    for ci, extent in enumerate(_column_extents(boxes, labels, n)):
+        if extent is None:
             continue
-
-        col_x1 = int(min(xs))
-        col_x2 = int(max(xe))
+        col_x1, col_x2 = extent
 
         # Margem mínima para garantir cobertura visual suficientemente larga
         margin = max(5, int(0.01 * img_width))
@@ -213,67 +340,43 @@ def _segment_lines_in_column(bin_img, col_x1, col_x2, min_line_height=20, min_ar
     # Recorte da coluna
     col_region = bin_img[:, col_x1:col_x2 + 1]
 
-    # Projeção horizontal (soma de pixels brancos na linha)
-    proj = np.sum(col_region > 0, axis=1)  # vetor de tamanho h
-
-    # Threshold: linha "ativa" se proj > 0 (ou pequena fração de largura)
-    active = proj > 0
-
-    blocks = []
-    in_block = False
-    start_y = 0
-
-    for y in range(h):
-        if active[y]:
-            if not in_block:
-                in_block = True
-                start_y = y
-        else:
-            if in_block:
-                end_y = y - 1
-                height = end_y - start_y + 1
-                if height >= min_line_height:
-                    # bounding box na coluna
-                    block_height = height
-                    block_width = col_x2 - col_x1 + 1
-                    if block_width * block_height >= min_area:
-                        blocks.append(
-                            {
-                                "x1": int(col_x1),
-                                "y1": int(start_y),
-                                "x2": int(col_x2),
-                                "y2": int(end_y),
-                            }
-                        )
-                in_block = False
-
-    # Caso o bloco continue até o final da imagem
-    if in_block:
-        end_y = h - 1
-        height = end_y - start_y + 1
-        if height >= min_line_height:
-            block_height = height
-            block_width = col_x2 - col_x1 + 1
-            if block_width * block_height >= min_area:
-                blocks.append(
-                    {
-                        "x1": int(col_x1),
-                        "y1": int(start_y),
-                        "x2": int(col_x2),
-                        "y2": int(end_y),
-                    }
-                )
+    # Projeção horizontal: linha "ativa" se tiver algum pixel branco
+    # (equivale a np.sum(col_region > 0, axis=1) > 0, sem a máscara h × w)
+    active = col_region.any(axis=1)
 
-    return blocks
+    # Trechos de linhas ativas: bordas de subida/descida da máscara
+    # (preenchida com 0 nas pontas: bloco até o fim da imagem também fecha)
+    edges = np.diff(np.concatenate(([0], active.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
 
+    heights = ends - starts + 1
+    block_width = col_x2 - col_x1 + 1
+    keep = (heights >= min_line_height) & (block_width * heights >= min_area)
 
-def segment_page_into_blocks(image_path, output_json_path=None):
+    return [
+        {
+            "x1": int(col_x1),
+            "y1": int(y1),
+            "x2": int(col_x2),
+            "y2": int(y2),
+        }
+        for y1, y2 in zip(starts[keep], ends[keep])
+    ]
+
+
+def segment_page_into_blocks(image_path, output_json_path=None, scale=1.0):
     """
     Segmenta uma página em blocos estruturados (coluna + linha).
 
     Entrada:
-        image_path (str): caminho da página (já pré-processada ou não).
+        image_path (str | np.ndarray | PreparedPage): caminho da página (já
+            pré-processada ou não), a página renderizada em memória ou uma
+            PreparedPage compartilhada (binarização memorizada).
         output_json_path (str|None): se definido, salva JSON com os blocos.
+        scale (float): resolução da imagem relativa a 300 DPI
+            (ex.: 100 DPI → 1/3). Os limiares em pixels são ajustados;
+            as coordenadas de saída ficam no espaço da imagem recebida.
 
     Saída (dict):
         {
@@ -298,25 +401,27 @@ def segment_page_into_blocks(image_path, output_json_path=None):
             "error": str|None
         }
     """
+    in_memory = isinstance(image_path, np.ndarray) or is_prepared(image_path)
+
     result = {
         "status": "error",
-        "image_path": image_path,
+        "image_path": None if in_memory else image_path,
         "blocks": [],
         "columns": [],
         "error": None,
     }
 
     try:
-        if not os.path.exists(image_path):
+        if not in_memory and not os.path.exists(image_path):
             result["error"] = f"Imagem não encontrada: {image_path}"
             return result
 
-        bin_img, _ = _load_image_as_binary(image_path)
+        bin_img, _ = _load_image_as_binary(image_path, block_size=_odd(31 * scale))
         h, w = bin_img.shape[:2]
 
         # 1) Componentes conectados → estimativa visual de colunas
-        boxes = _find_connected_components(bin_img)
-        columns = _cluster_columns_from_boxes(boxes, w)
+        boxes = _find_connected_components(bin_img, min_area=max(1, int(30 * scale * scale)))
+        columns = _cluster_columns_from_boxes(boxes, w, min_col_width=max(1, int(250 * scale)))
 
         all_blocks = []
         block_id = 0
@@ -327,6 +432,8 @@ def segment_page_into_blocks(image_path, output_json_path=None):
                 bin_img,
                 col_x1=col["x1"],
                 col_x2=col["x2"],
+                min_line_height=max(1, int(round(20 * scale))),
+                min_area=max(1, int(100 * scale * scale)),
             )
             for b in col_blocks:
                 all_blocks.append(
@@ -350,7 +457,7 @@ def segment_page_into_blocks(image_path, output_json_path=None):
             with open(output_json_path, "w", encoding="utf-8") as f:
                 json.dump(
                     {
-                        "image": os.path.basename(image_path),
+                        "image": None if in_memory else os.path.basename(image_path),
                         "width": w,
                         "height": h,
                         "columns": columns,
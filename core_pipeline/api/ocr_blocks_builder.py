@@ -6,7 +6,7 @@ gerando core_pipeline/outputs/ocr_page_XX.json.
 Compatível com qualquer versão de pytesseract (conf como str/int/float).
 """
 
-import os, json, pytesseract
+import os, sys, json
 from pathlib import Path
 from PIL import Image
 from datetime import datetime
@@ -19,12 +19,17 @@ DATA_DIR = BASE_DIR / "core_pipeline" / "data" / "TTBRASIL_20251112" / "outputs"
 OUT_DIR = BASE_DIR / "core_pipeline" / "outputs"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from core_pipeline.api.ocr_cache import tesseract_image_to_data
+
 # ============================================================
 # 🔹 Função principal
 # ============================================================
 def processar_pagina(num: int):
     """
-    Executa pytesseract.image_to_data e gera JSON de blocos OCR.
+    Executa pytesseract.image_to_data (via ocr_cache) e gera JSON de blocos OCR.
     """
     img_path = DATA_DIR / f"page_{num:02d}.jpg"
     if not img_path.exists():
@@ -34,7 +39,7 @@ def processar_pagina(num: int):
     print(f"📄 Página {num:02d} → executando OCR (com coordenadas)...")
 
     img = Image.open(img_path)
-    data = pytesseract.image_to_data(img, lang="por+eng", output_type=pytesseract.Output.DICT)
+    data = tesseract_image_to_data(img, lang="por+eng")
 
     blocks = []
     for i in range(len(data["text"])):
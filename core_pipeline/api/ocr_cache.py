@@ -0,0 +1,288 @@
+"""
+Garimpo ML – Cache de resultados de OCR
+---------------------------------------
+As mesmas imagens passam pelo OCR em vários pontos de entrada
+(calibra_full, ocr_blocks_builder, extractors/ocr_page_processor,
+pipeline_detectron_ocr, page_merge_pipeline, utils_calibra.ocr_duplo,
+roi_ocr, ocr_service) e de novo a cada reexecução.
+
+Todos passam por este cache, endereçado por:
+    (hash do conteúdo da imagem entregue ao motor, motor, config
+     psm/oem, idioma, variante de pré-processamento)
+
+A saída bruta do motor é gravada em JSON compactado (gzip).
+
+Layout em disco:
+    <CACHE_ROOT>/<key[:2]>/<key>.json.gz
+    <CACHE_ROOT>/stats.json   (contadores acumulados de hit/miss)
+
+Tamanho limitado por OCR_CACHE_MAX_BYTES com evicção LRU
+(o mtime do arquivo é atualizado a cada hit).
+"""
+
+import os
+import gzip
+import json
+import atexit
+import hashlib
+import threading
+
+import numpy as np
+
+from core_pipeline.api import tesseract_engine
+
+
+OCR_CACHE_ROOT = os.environ.get(
+    "GARIMPO_OCR_CACHE", "/home/ubuntu/garimpo-ml/core_pipeline/cache/ocr"
+)
+OCR_CACHE_MAX_BYTES = int(os.environ.get("GARIMPO_OCR_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+OCR_CACHE_ENABLED = os.environ.get("GARIMPO_OCR_CACHE_ENABLED", "1") == "1"
+
+# A cada quantas gravações o cache verifica o limite de tamanho
+EVICT_EVERY_PUTS = 500
+
+
+def image_hash(img) -> str:
+    """
+    Hash do conteúdo da imagem exatamente como vai para o motor
+    (np.ndarray ou PIL.Image): shape + dtype + pixels.
+    """
+    arr = np.ascontiguousarray(np.asarray(img))
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{arr.shape}|{arr.dtype}".encode("ascii"))
+    h.update(memoryview(arr).cast("B"))
+    return h.hexdigest()
+
+
+class OcrCache:
+    """
+    Cache LRU de saídas de OCR, com contadores de hit/miss.
+
+    Uso:
+        cache = OcrCache()
+        key = cache.key(img, engine="tesseract", config="--psm 6", lang="por")
+        data = cache.get(key)
+        if data is None:
+            data = pytesseract.image_to_data(img, ...)
+            cache.put(key, data)
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = str(root or OCR_CACHE_ROOT)
+        self.max_bytes = OCR_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Chaves e caminhos
+    # -----------------------------
+    @staticmethod
+    def key(img, engine, config="", lang="", variant="") -> str:
+        parts = [image_hash(img), str(engine), str(config or ""), str(lang or ""), str(variant or "")]
+        return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+    def path_for(self, key) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json.gz")
+
+    # -----------------------------
+    # Operações
+    # -----------------------------
+    def get(self, key):
+        """
+        Saída gravada do motor (e marca como usada) ou None.
+        """
+        path = self.path_for(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError, EOFError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path, None)  # LRU: último uso
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """
+        Grava a saída do motor. Escrita atômica; falhas são ignoradas.
+        """
+        path = self.path_for(key)
+        tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return None
+
+        with self._lock:
+            self._puts += 1
+            check = self._puts % EVICT_EVERY_PUTS == 0
+        if check:
+            self.evict()
+        return path
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(".json.gz"):
+                    continue
+                fpath = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(fpath)
+                except OSError:
+                    continue
+                yield fpath, st.st_size, st.st_mtime
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Remove as entradas menos usadas até o cache caber em max_bytes.
+        Retorna quantos arquivos foram removidos.
+        """
+        if self.max_bytes <= 0 or not os.path.isdir(self.root):
+            return 0
+
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for fpath, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(fpath)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    # -----------------------------
+    # Estatísticas
+    # -----------------------------
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def flush_stats(self):
+        """
+        Soma os contadores desta instância em <root>/stats.json e zera-os.
+        """
+        with self._lock:
+            delta = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+            self.hits = self.misses = self.evictions = 0
+
+        if not any(delta.values()):
+            return delta
+
+        stats_path = os.path.join(self.root, "stats.json")
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            data = {}
+            if os.path.exists(stats_path):
+                with open(stats_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            for k, v in delta.items():
+                data[k] = int(data.get(k, 0)) + v
+            with open(stats_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        except Exception:
+            # Estatística nunca derruba o pipeline
+            pass
+        return delta
+
+
+# =========================================================
+# 🔹 Instância do processo + wrappers dos motores
+# =========================================================
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def _close_default_cache():
+    if _default_cache is not None:
+        _default_cache.evict()
+        _default_cache.flush_stats()
+
+
+def get_ocr_cache():
+    """
+    Cache compartilhado do processo (None se GARIMPO_OCR_CACHE_ENABLED=0).
+    Estatísticas e evicção são gravadas ao fim do processo.
+    """
+    global _default_cache
+    if not OCR_CACHE_ENABLED:
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = OcrCache()
+            atexit.register(_close_default_cache)
+        return _default_cache
+
+
+def cached_ocr(img, engine, run, config="", lang="", variant="", cache=None):
+    """
+    Executa run() (a chamada real ao motor) só se a saída ainda não estiver
+    em cache. img deve ser exatamente a imagem entregue ao motor.
+    """
+    cache = cache or get_ocr_cache()
+    if cache is None:
+        return run()
+
+    key = cache.key(img, engine, config=config, lang=lang, variant=variant)
+    data = cache.get(key)
+    if data is None:
+        data = run()
+        cache.put(key, data)
+    return data
+
+
+def tesseract_image_to_data(img, lang=None, config="", variant="", cache=None):
+    """
+    pytesseract.image_to_data (Output.DICT) com cache.
+    lang=None → idioma padrão do Tesseract (como na chamada original).
+    O backend (pytesseract / tesserocr) vem de GARIMPO_TESSERACT_BACKEND.
+    """
+    backend = tesseract_engine.active_backend()
+    return cached_ocr(
+        img, f"tesseract:data:{backend}",
+        lambda: tesseract_engine.image_to_data(img, lang=lang, config=config, backend=backend),
+        config=config, lang=lang, variant=variant, cache=cache,
+    )
+
+
+def tesseract_image_to_string(img, lang=None, config="", variant="", cache=None):
+    """
+    pytesseract.image_to_string com cache.
+    """
+    backend = tesseract_engine.active_backend()
+    return cached_ocr(
+        img, f"tesseract:string:{backend}",
+        lambda: tesseract_engine.image_to_string(img, lang=lang, config=config, backend=backend),
+        config=config, lang=lang, variant=variant, cache=cache,
+    )
@@ -0,0 +1,227 @@
+"""
+Garimpo ML – OCR em cascata guiado por confiança
+------------------------------------------------
+Em vez de sempre rodar duas passadas (ocr_duplo) ou descartar a confiança
+(ocr_page_processor), cada região sobe de nível só enquanto o resultado
+for fraco:
+
+    nível 0  "fast"      → cinza, resolução reduzida (0.5×)
+    nível 1  "enhanced"  → contraste + CLAHE + binarização adaptativa
+    nível 2  "upscaled"  → mesmo pré-processamento em 2× (texto pequeno)
+    nível 3  "paddle"    → motor alternativo (ocr_service), se disponível
+
+Com color_first=True, antes deles roda o nível "color": recorte original
+(colorido), resolução cheia, sem pré-processamento. É o caminho que o
+ocr_duplo usava para recortes claros (fundo branco, texto nítido).
+
+Uma passada é aceita quando a confiança média das palavras atinge
+CASCADE_MIN_CONF e, se pedido, os campos do produto (código CTxxxx e
+preço R$) foram encontrados. Se nenhum nível for aceito, fica o melhor.
+
+Contadores por nível (execuções / aceitas) vão para o relatório do job:
+    {"regions": int, "unresolved": int,
+     "levels": {"fast": {"runs": int, "accepted": int}, ...}}
+"""
+
+import os
+import re
+
+import cv2
+import numpy as np
+
+from core_pipeline.api.ocr_cache import tesseract_image_to_data
+from core_pipeline.calibra_p10.utils_calibra import enhance_for_ocr
+
+
+CASCADE_MIN_CONF = float(os.environ.get("GARIMPO_CASCADE_MIN_CONF", "70"))
+
+LEVELS = [
+    {"name": "fast", "scale": 0.5, "prep": "gray"},
+    {"name": "enhanced", "scale": 1.0, "prep": "enhance"},
+    {"name": "upscaled", "scale": 2.0, "prep": "enhance"},
+    {"name": "paddle", "engine": "paddle"},
+]
+COLOR_LEVEL = {"name": "color", "scale": 1.0, "prep": "color"}
+
+# Abaixo disso (altura em px após a escala) o texto fica ilegível
+MIN_SCALED_HEIGHT = 24
+
+RE_CODE = re.compile(r"\bCT\d{3,6}\b", re.I)
+RE_PRICE = re.compile(r"R\$ ?[\d\.,]+", re.I)
+
+
+# =========================================================
+# 🔹 Estatísticas
+# =========================================================
+def new_cascade_stats() -> dict:
+    return {
+        "regions": 0,
+        "unresolved": 0,
+        "levels": {lvl["name"]: {"runs": 0, "accepted": 0} for lvl in LEVELS},
+    }
+
+
+def record_level(stats, name, accepted):
+    if stats is None:
+        return
+    level = stats["levels"].setdefault(name, {"runs": 0, "accepted": 0})
+    level["runs"] += 1
+    if accepted:
+        level["accepted"] += 1
+
+
+def merge_cascade_stats(total, part):
+    """
+    Soma os contadores de part em total (ex.: páginas → job).
+    """
+    total["regions"] += part.get("regions", 0)
+    total["unresolved"] += part.get("unresolved", 0)
+    for name, counts in part.get("levels", {}).items():
+        level = total["levels"].setdefault(name, {"runs": 0, "accepted": 0})
+        level["runs"] += counts.get("runs", 0)
+        level["accepted"] += counts.get("accepted", 0)
+    return total
+
+
+# =========================================================
+# 🔹 Passadas
+# =========================================================
+def _tesseract_pass(gray, level, lang, psm):
+    scale = level["scale"]
+    if scale < 1.0 and gray.shape[0] * scale < MIN_SCALED_HEIGHT:
+        scale = 1.0
+
+    img = gray
+    if scale != 1.0:
+        interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+        img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=interp)
+    if level["prep"] == "enhance":
+        img = enhance_for_ocr(img)
+
+    data = tesseract_image_to_data(
+        img, lang=lang, config=f"--oem 3 --psm {psm}", variant=f"cascade_{level['name']}"
+    )
+
+    tokens = []
+    for i in range(len(data["text"])):
+        text = (data["text"][i] or "").strip()
+        if not text:
+            continue
+        try:
+            conf = float(data["conf"][i])
+        except (TypeError, ValueError):
+            conf = -1.0
+        if conf < 0:
+            continue
+        x1 = int(data["left"][i] / scale)
+        y1 = int(data["top"][i] / scale)
+        x2 = int((data["left"][i] + data["width"][i]) / scale)
+        y2 = int((data["top"][i] + data["height"][i]) / scale)
+        line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        tokens.append({"text": text, "conf": conf, "bbox": [x1, y1, x2, y2], "line": line})
+    return tokens
+
+
+def _paddle_pass(gray):
+    from core_pipeline.api.ocr_service import paddle_ocr_blocks
+
+    tokens = []
+    bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+    for idx, block in enumerate(paddle_ocr_blocks(bgr)["blocks"]):
+        xs = [p[0] for p in block["bbox"]]
+        ys = [p[1] for p in block["bbox"]]
+        tokens.append({
+            "text": block["text"],
+            "conf": round(float(block.get("conf", 1.0)) * 100, 2),
+            "bbox": [int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))],
+            "line": (idx,),
+        })
+    return tokens
+
+
+def _join_tokens(tokens):
+    lines, current, last = [], [], None
+    for tok in tokens:
+        if last is not None and tok["line"] != last:
+            lines.append(" ".join(current))
+            current = []
+        current.append(tok["text"])
+        last = tok["line"]
+    if current:
+        lines.append(" ".join(current))
+    return "\n".join(lines)
+
+
+def _evaluate(tokens, min_conf, require_fields):
+    text = _join_tokens(tokens)
+    conf = float(np.mean([t["conf"] for t in tokens])) if tokens else 0.0
+    complete = bool(RE_CODE.search(text) and RE_PRICE.search(text)) if require_fields else bool(text)
+    accepted = bool(tokens) and conf >= min_conf and complete
+    return {"text": text, "conf": round(conf, 2), "complete": complete, "accepted": accepted}
+
+
+# =========================================================
+# 🔹 API
+# =========================================================
+def cascade_ocr(img, lang="por", min_conf=None, require_fields=False,
+                start_level=0, psm=6, stats=None, color_first=False):
+    """
+    OCR de uma região subindo de nível só enquanto o resultado for fraco.
+
+    Args:
+        img (np.ndarray): região (BGR ou cinza).
+        min_conf (float): confiança média mínima (padrão CASCADE_MIN_CONF).
+        require_fields (bool): exige código e preço para aceitar.
+        start_level (int): primeiro nível (ex.: 1 quando a passada rápida
+            já foi feita pelo chamador).
+        psm (int): modo de segmentação do Tesseract (6 bloco, 7 linha).
+        stats (dict | None): contadores de new_cascade_stats().
+        color_first (bool): tenta antes o nível "color" (imagem recebida,
+            resolução cheia).
+
+    Returns:
+        {"text", "tokens", "conf", "level", "accepted"}
+        (bbox dos tokens em coordenadas da região recebida)
+    """
+    min_conf = CASCADE_MIN_CONF if min_conf is None else min_conf
+    best = {"text": "", "tokens": [], "conf": 0.0, "level": None, "accepted": False}
+    best_score = (False, -1.0)
+
+    if img is None or img.size == 0:
+        return best
+
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    if stats is not None:
+        stats["regions"] += 1
+
+    levels = ([COLOR_LEVEL] if color_first else []) + LEVELS[start_level:]
+    for level in levels:
+        if level.get("prep") == "color":
+            tokens = _tesseract_pass(img, level, lang, psm)
+        elif level.get("engine") == "paddle":
+            from core_pipeline.api.ocr_service import paddle_available
+            if not paddle_available():
+                continue
+            tokens = _paddle_pass(gray)
+        else:
+            tokens = _tesseract_pass(gray, level, lang, psm)
+
+        ev = _evaluate(tokens, min_conf, require_fields)
+        record_level(stats, level["name"], ev["accepted"])
+
+        score = (ev["complete"], ev["conf"])
+        if score > best_score:
+            best_score = score
+            best = {
+                "text": ev["text"],
+                "tokens": tokens,
+                "conf": ev["conf"],
+                "level": level["name"],
+                "accepted": ev["accepted"],
+            }
+        if ev["accepted"]:
+            return best
+
+    if stats is not None:
+        stats["unresolved"] += 1
+    return best
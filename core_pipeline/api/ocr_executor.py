@@ -0,0 +1,390 @@
+"""
+Garimpo ML – Executor de OCR em pool de processos
+-------------------------------------------------
+O OCR é a etapa mais longa do pipeline e roda página a página em um único
+processo. O OcrExecutor distribui as páginas entre processos; cada worker
+importa o motor de OCR uma vez e o mantém aquecido entre as páginas
+(PaddleOCR / Tesseract carregados no primeiro uso, não a cada página).
+
+Para evitar oversubscription (N workers × M threads do OpenMP/BLAS), cada
+worker limita as próprias threads a OCR_THREADS_PER_WORKER antes de
+importar o motor.
+
+Os resultados voltam na ordem das páginas, independentemente de qual
+worker terminar primeiro.
+
+Configuração:
+    GARIMPO_OCR_WORKERS   → processos (padrão: nº de CPUs; 1 = sem pool)
+    GARIMPO_OCR_THREADS   → threads por worker (padrão: 1)
+    GARIMPO_OCR_MP_START  → método de início dos processos (padrão: spawn)
+
+Tarefas são referenciadas como "modulo:funcao" para serem importadas
+dentro do worker (depois dos limites de threads), nunca serializadas.
+
+Modo protegido (timeout= e/ou max_rss_mb=):
+    Uma página malformada pode travar o Tesseract ou estourar a memória do
+    PaddleOCR. Nesse modo cada worker é um processo próprio (grupo de
+    processos separado, incluindo o `tesseract` filho) vigiado pelo
+    processo principal: passou do tempo de parede ou do RSS → o grupo é
+    morto, um worker novo sobe e a página é refeita com a configuração
+    degradada de degrade(args, tentativa). Esgotadas as tentativas, a
+    página volta com "failure" preenchido e o job segue. Exceções da
+    própria tarefa (failure "error") não são refeitas.
+
+    GARIMPO_OCR_PAGE_TIMEOUT    → segundos por página (padrão: 300; 0 = sem limite)
+    GARIMPO_OCR_PAGE_MAX_RSS_MB → RSS máximo do worker (padrão: 4096; 0 = sem limite)
+    GARIMPO_OCR_PAGE_RETRIES    → novas tentativas por página (padrão: 1)
+"""
+
+import os
+import time
+import signal
+import importlib
+import traceback
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+from concurrent.futures import ProcessPoolExecutor
+
+
+OCR_WORKERS = int(os.environ.get("GARIMPO_OCR_WORKERS", os.cpu_count() or 1))
+OCR_THREADS_PER_WORKER = int(os.environ.get("GARIMPO_OCR_THREADS", "1"))
+OCR_MP_START = os.environ.get("GARIMPO_OCR_MP_START", "spawn")
+
+OCR_PAGE_TIMEOUT_S = float(os.environ.get("GARIMPO_OCR_PAGE_TIMEOUT", "300"))
+OCR_PAGE_MAX_RSS_MB = int(os.environ.get("GARIMPO_OCR_PAGE_MAX_RSS_MB", "4096"))
+OCR_PAGE_RETRIES = int(os.environ.get("GARIMPO_OCR_PAGE_RETRIES", "1"))
+
+# Intervalo de verificação de tempo/memória dos workers protegidos
+GUARD_POLL_S = 0.5
+
+# Variáveis lidas por OpenMP (Tesseract), BLAS e Paddle no import
+_THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OMP_THREAD_LIMIT",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "FLAGS_cpu_math_library_num_threads",
+)
+
+# Cache de tarefas resolvidas (por processo)
+_resolved = {}
+
+
+def resolve_task(spec):
+    """
+    "pacote.modulo:funcao" → função. Aceita também um callable direto.
+    """
+    if callable(spec):
+        return spec
+    if spec not in _resolved:
+        module_name, _, attr = spec.partition(":")
+        _resolved[spec] = getattr(importlib.import_module(module_name), attr)
+    return _resolved[spec]
+
+
+def limit_threads(threads):
+    """
+    Limita as threads nativas deste processo (antes de importar o motor).
+    """
+    threads = str(max(1, int(threads)))
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = threads
+    try:
+        import cv2
+        cv2.setNumThreads(int(threads))
+    except Exception:
+        pass
+
+
+def _init_worker(task_spec, threads, warmup_spec):
+    limit_threads(threads)
+    # Importa o motor uma única vez por worker
+    resolve_task(task_spec)
+    if warmup_spec:
+        resolve_task(warmup_spec)()
+
+
+def _run_task(task_spec, args):
+    t0 = time.perf_counter()
+    try:
+        result = resolve_task(task_spec)(*args)
+        return {"result": result, "seconds": time.perf_counter() - t0, "error": None}
+    except Exception as e:
+        return {
+            "result": None,
+            "seconds": time.perf_counter() - t0,
+            "error": f"{e}\n{traceback.format_exc()}",
+        }
+
+
+# =========================================================
+# 🔹 Workers protegidos (tempo de parede + RSS)
+# =========================================================
+# Falhas que justificam nova tentativa (exceção da tarefa é determinística)
+RETRY_FAILURES = ("timeout", "rss", "crash")
+
+
+def _rss_by_group(pgids):
+    """
+    {pgid: RSS somado (MB)} dos grupos pedidos, numa única varredura de
+    /proc. None se /proc não estiver disponível (sem proteção de memória).
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    page_kb = os.sysconf("SC_PAGE_SIZE") // 1024
+    total_kb = dict.fromkeys(pgids, 0)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                stat = f.read().decode("ascii", "replace")
+        except OSError:
+            continue
+        # campos após o nome do processo (que pode ter espaços/parênteses)
+        fields = stat[stat.rfind(")") + 2:].split()
+        pgid = int(fields[2])
+        if pgid in total_kb:
+            total_kb[pgid] += int(fields[21]) * page_kb
+    return {pgid: kb / 1024.0 for pgid, kb in total_kb.items()}
+
+
+def _guarded_main(conn, task_spec, threads, warmup_spec):
+    # Grupo próprio: o kill alcança também o `tesseract` filho
+    os.setpgrp()
+    _init_worker(task_spec, threads, warmup_spec)
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+        conn.send(_run_task(task_spec, msg))
+
+
+class _GuardedWorker:
+    """
+    Processo de OCR de longa duração (motor aquecido) que pode ser morto.
+    """
+
+    def __init__(self, ctx, task, threads, warmup):
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(
+            target=_guarded_main, args=(child_conn, task, threads, warmup), daemon=True
+        )
+        self.proc.start()
+        child_conn.close()
+        self.job = None          # (idx, attempt, args)
+        self.started_at = 0.0
+
+    def submit(self, job):
+        self.job = job
+        self.started_at = time.monotonic()
+        self.conn.send(job[2])
+
+    def kill(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError, AttributeError):
+            self.proc.kill()
+        self.proc.join(timeout=5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, EOFError):
+            pass
+        self.proc.join(timeout=5)
+        if self.proc.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class OcrExecutor:
+    """
+    Pool de OCR com motor aquecido por worker e resultados em ordem.
+
+    Uso:
+        with OcrExecutor("core_pipeline.api.ocr_page_processor:run_ocr") as ex:
+            for item in ex.map([(str(p),) for p in page_files], keys=page_nums):
+                item["key"], item["result"], item["seconds"], item["error"]
+
+    Com workers=1 as tarefas rodam no próprio processo (sem pool), exceto
+    no modo protegido (timeout / max_rss_mb), que sempre usa processos.
+    """
+
+    def __init__(self, task, workers=None, threads_per_worker=None, warmup=None,
+                 timeout=None, max_rss_mb=None, retries=None):
+        self.task = task
+        self.workers = max(1, int(workers or OCR_WORKERS))
+        self.threads_per_worker = threads_per_worker or OCR_THREADS_PER_WORKER
+        self.warmup = warmup
+        self.timeout = timeout or None
+        self.max_rss_mb = max_rss_mb or None
+        self.retries = OCR_PAGE_RETRIES if retries is None else max(0, int(retries))
+        self._pool = None
+        self._guarded = []
+
+        if self.timeout or self.max_rss_mb:
+            if not isinstance(task, str) or (warmup is not None and not isinstance(warmup, str)):
+                raise ValueError("No modo protegido, task/warmup devem ser 'modulo:funcao'")
+            self._ctx = multiprocessing.get_context(OCR_MP_START)
+        elif self.workers > 1:
+            if not isinstance(task, str) or (warmup is not None and not isinstance(warmup, str)):
+                raise ValueError("Com pool de processos, task/warmup devem ser 'modulo:funcao'")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(OCR_MP_START),
+                initializer=_init_worker,
+                initargs=(task, self.threads_per_worker, warmup),
+            )
+
+    def map(self, args_list, keys=None, degrade=None):
+        """
+        Executa a tarefa para cada tupla de argumentos e gera, NA ORDEM de
+        entrada: {"key", "result", "seconds", "error"}.
+        No máximo 2 × workers tarefas ficam pendentes por vez.
+
+        No modo protegido os itens trazem também "attempts" e "failure"
+        (None | "timeout" | "rss" | "crash" | "error"); degrade(args, n)
+        devolve os argumentos da n-ésima nova tentativa (None = não tentar).
+        Só "timeout", "rss" e "crash" são refeitos.
+        """
+        args_list = list(args_list)
+        keys = list(keys) if keys is not None else list(range(len(args_list)))
+
+        if self.timeout or self.max_rss_mb:
+            yield from self._map_guarded(args_list, keys, degrade)
+            return
+
+        if self._pool is None:
+            for key, args in zip(keys, args_list):
+                item = _run_task(self.task, args)
+                item["key"] = key
+                yield item
+            return
+
+        window = deque()
+        pending = iter(zip(keys, args_list))
+        for key, args in pending:
+            window.append((key, self._pool.submit(_run_task, self.task, args)))
+            if len(window) >= 2 * self.workers:
+                break
+
+        while window:
+            key, future = window.popleft()
+            item = future.result()
+            item["key"] = key
+            nxt = next(pending, None)
+            if nxt is not None:
+                window.append((nxt[0], self._pool.submit(_run_task, self.task, nxt[1])))
+            yield item
+
+    def run(self, args, key=None, degrade=None):
+        """
+        Uma única tarefa (ex.: página do modo streaming); mesmo item de map().
+        """
+        return next(self.map([args], keys=[key], degrade=degrade))
+
+    def _spawn(self):
+        return _GuardedWorker(self._ctx, self.task, self.threads_per_worker, self.warmup)
+
+    def _check(self, worker, rss_map):
+        """
+        Motivo para matar o worker (ou None se a tarefa pode continuar).
+        rss_map: {pgid: MB} da varredura desta verificação (ou None).
+        """
+        if not worker.proc.is_alive():
+            return "crash"
+        if self.timeout and time.monotonic() - worker.started_at > self.timeout:
+            return "timeout"
+        if rss_map:
+            rss = rss_map.get(worker.proc.pid)
+            if rss is not None and rss > self.max_rss_mb:
+                return "rss"
+        return None
+
+    def _map_guarded(self, args_list, keys, degrade):
+        if not self._guarded:
+            self._guarded = [self._spawn() for _ in range(min(self.workers, max(1, len(args_list))))]
+
+        todo = deque((i, 0, args) for i, args in enumerate(args_list))
+        done = {}
+        next_out = 0
+
+        while next_out < len(args_list):
+            for w in self._guarded:
+                if w.job is None and todo:
+                    w.submit(todo.popleft())
+
+            busy = [w for w in self._guarded if w.job is not None]
+            ready = wait([w.conn for w in busy], timeout=GUARD_POLL_S)
+
+            # uma varredura de /proc por verificação, para todos os workers
+            rss_map = None
+            if self.max_rss_mb:
+                waiting = [w.proc.pid for w in busy if w.conn not in ready]
+                rss_map = _rss_by_group(waiting) if waiting else None
+
+            for pos, w in enumerate(self._guarded):
+                if w.job is None:
+                    continue
+                idx, attempt, args = w.job
+                item, failure = None, None
+
+                if w.conn in ready:
+                    try:
+                        item = w.conn.recv()
+                        failure = "error" if item["error"] else None
+                    except (EOFError, OSError):
+                        failure = "crash"
+                else:
+                    failure = self._check(w, rss_map)
+                    if failure is None:
+                        continue
+
+                if item is None:
+                    # worker morto (ou morreu): descarta e sobe outro
+                    w.kill()
+                    self._guarded[pos] = self._spawn()
+                    item = {
+                        "result": None,
+                        "seconds": time.monotonic() - w.started_at,
+                        "error": f"OCR interrompido ({failure})",
+                    }
+                else:
+                    w.job = None
+
+                retry_args = None
+                if failure in RETRY_FAILURES and attempt < self.retries:
+                    retry_args = degrade(args_list[idx], attempt + 1) if degrade else args_list[idx]
+                if retry_args is not None:
+                    todo.appendleft((idx, attempt + 1, retry_args))
+                    continue
+
+                item["key"] = keys[idx]
+                item["attempts"] = attempt + 1
+                item["failure"] = failure
+                done[idx] = item
+
+            while next_out in done:
+                yield done.pop(next_out)
+                next_out += 1
+
+    def close(self):
+        for w in self._guarded:
+            w.stop()
+        self._guarded = []
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -2,7 +2,22 @@ import os
 import json
 import time
 import subprocess
-from paddleocr import PaddleOCR
+
+from core_pipeline.api.ocr_service import paddle_ocr_blocks, normalize_paddleocr_output
+from core_pipeline.api.page_cache import PageCache, PAGE_CACHE_ENABLED, temp_sibling
+from core_pipeline.api.pdf_renderer import PdfDocument, PagePrefetcher, has_inprocess_backend, load_image
+from core_pipeline.api.pdf_to_jpg_converter import _get_page_count
+from core_pipeline.api.paddle_batch import OCR_BATCH_MODE, BatchRecognizer, batch_supported
+from core_pipeline.api.page_orientation import (
+    PAGE_ORIENT_MODE, orient_page, unmap_blocks, summarize_orientation,
+)
+
+# Mesmo identificador usado por pdf_to_jpg_converter (pdftoppm -jpeg)
+CACHE_RENDERER = "pdftoppm-jpeg"
+
+OCR_RENDER_DPI = 200
+# Quantas páginas renderizar à frente enquanto a atual passa pelo OCR
+PREFETCH_PAGES = int(os.environ.get("GARIMPO_PREFETCH_PAGES", "2"))
 
 def update_progress_file(progress_file, supplier, status, progress, step):
     data = {
@@ -15,71 +30,177 @@ def update_progress_file(progress_file, supplier, status, progress, step):
     with open(progress_file, "w") as f:
         json.dump(data, f, indent=2)
 
-def normalize_paddleocr_output(raw_ocr):
-    blocks = []
-    for line_group in raw_ocr:
-        for line in line_group:
-            bbox = line[0]
-            text = line[1][0]
-            blocks.append({"text": text, "bbox": bbox})
-    return {"blocks": blocks}
-
-def _pdftoppm_image(pdf_path, page_number, output_path):
+def _pdftoppm_image(pdf_path, page_number, output_path, dpi=200, cache=None):
     """
     Gera imagem JPG usando o pdftoppm (100% compatível com Poppler).
+    Se a página já estiver no cache compartilhado, reaproveita via hardlink.
     """
+    final = f"{output_path}-{page_number}.jpg"
+
+    key = None
+    if cache is not None:
+        key = cache.key(pdf_path, page_number, dpi, CACHE_RENDERER)
+        if cache.fetch(key, final):
+            return final
+
+    # -singlefile: nome fixo, independente do padding de página do pdftoppm.
+    # Renderiza num temporário e troca: `final` pode ser hardlink do cache.
+    rendered = temp_sibling(final)
     cmd = [
         "pdftoppm",
         "-jpeg",
-        "-r", "200",
+        "-r", str(dpi),
         "-f", str(page_number),
         "-l", str(page_number),
+        "-singlefile",
         pdf_path,
-        output_path
+        os.path.splitext(rendered)[0]
     ]
-    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        os.replace(rendered, final)
+    finally:
+        if os.path.exists(rendered):
+            os.remove(rendered)
 
-    final = f"{output_path}-{page_number}.jpg"
+    if key is not None:
+        cache.store(key, final)
     return final
 
+def _save_page_json(output_dir, page_number, normalized):
+    json_path = os.path.join(output_dir, f"ocr_page_{page_number:02d}.json")
+    with open(json_path, "w", encoding="utf-8") as jf:
+        json.dump(normalized, jf, ensure_ascii=False, indent=2)
+
+def _orient(img, page_number, orientations):
+    """
+    GARIMPO_PAGE_ORIENT=1: endireita a página antes do OCR.
+    Retorna (imagem, info | None); info["cls"] diz se o classificador de
+    ângulo por linha ainda é necessário (estimativa ambígua).
+    """
+    if not PAGE_ORIENT_MODE:
+        return img, None
+    if isinstance(img, str):
+        img = load_image(img)
+    img, info = orient_page(img, page_number)
+    orientations.append(info)
+    return img, info
+
+def _save_orientation(output_dir, orientations):
+    if not orientations:
+        return
+    path = os.path.join(output_dir, "ocr_orientation.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summarize_orientation(orientations), "pages": orientations},
+                  f, indent=2)
+
+def _run_batched(render, total_pages, output_dir, progress_file, supplier):
+    """
+    GARIMPO_PADDLE_BATCH=1: detecção página a página (com prefetch) e
+    reconhecimento de todas as linhas do job em lotes (paddle_batch).
+    O progresso vai até 50% na detecção; o restante cobre o reconhecimento.
+    """
+    batch = BatchRecognizer(cls=True)
+    orientations, page_orient = [], {}
+
+    with PagePrefetcher(render, range(1, total_pages + 1), depth=PREFETCH_PAGES) as pages:
+        for i, img in pages:
+            if isinstance(img, str):
+                img = load_image(img)
+            img, orient = _orient(img, i, orientations)
+            page_orient[i] = orient
+            batch.add_page(i, img, cls=orient["cls"] if orient else None)
+            progress = 5 + int((i / total_pages) * 45)
+            update_progress_file(progress_file, supplier, "running", progress,
+                                 f"Detecção de texto página {i}/{total_pages}")
+
+    update_progress_file(progress_file, supplier, "running", 50,
+                         f"Reconhecimento em lote ({batch.pending_lines} linhas)")
+    results = batch.finish()
+
+    for i in range(1, total_pages + 1):
+        normalized = results.get(i, {"blocks": []})
+        if page_orient.get(i):
+            normalized = unmap_blocks(normalized, page_orient[i])
+        _save_page_json(output_dir, i, normalized)
+    _save_orientation(output_dir, orientations)
+
+    stats_path = os.path.join(output_dir, "ocr_batch_stats.json")
+    with open(stats_path, "w", encoding="utf-8") as f:
+        json.dump(batch.stats, f, indent=2)
+
+    update_progress_file(progress_file, supplier, "running", 99,
+                         f"OCR em lote: {batch.stats['lines']} linhas, "
+                         f"{batch.stats['batches']} lotes")
+
 def run_ocr_pages(pdf_path, output_dir, progress_file, supplier):
     """
-    Agora totalmente baseado em Poppler → SEM FITZ.
+    Renderizador persistente: o PDF é aberto uma vez por job (pypdfium2 /
+    PyMuPDF) e as páginas vão em memória direto para o PaddleOCR, com as
+    próximas PREFETCH_PAGES sendo renderizadas durante o OCR da atual.
+    Sem backend em memória, cai para o pdftoppm por página (com cache),
+    também com prefetch.
+    O PaddleOCR é o do serviço residente (ocr_service) quando estiver no
+    ar; senão, a instância única do processo.
+    Cada página é endireitada antes do OCR (page_orientation); o
+    classificador de ângulo por linha só roda nas páginas de orientação
+    ambígua. Os bbox gravados continuam nas coordenadas da página
+    renderizada; o resumo vai para ocr_orientation.json.
+    Com GARIMPO_PADDLE_BATCH=1 (e PaddleOCR em processo), as linhas de
+    todas as páginas são reconhecidas juntas em lotes (paddle_batch).
     """
+    os.makedirs(output_dir, exist_ok=True)
+
+    doc = PdfDocument(pdf_path) if has_inprocess_backend() else None
+    page_cache = None
+
+    if doc is not None:
+        total_pages = doc.page_count
+
+        def render(page_number):
+            return doc.render_page(page_number, dpi=OCR_RENDER_DPI)
+    else:
+        # Obtém número de páginas REAL via pdfinfo
+        total_pages = _get_page_count(pdf_path)
+        page_cache = PageCache() if PAGE_CACHE_ENABLED else None
 
-    # Obtém número de páginas REAL via pdfinfo
-    info_cmd = ["pdfinfo", pdf_path]
-    raw = subprocess.check_output(info_cmd).decode("utf-8")
-    total_pages = 0
-    for line in raw.split("\n"):
-        if line.startswith("Pages:"):
-            total_pages = int(line.split(":")[1].strip())
-            break
+        def render(page_number):
+            # --- Renderizar imagem com Poppler ---
+            raw_img = os.path.join(output_dir, "render")
+            return _pdftoppm_image(pdf_path, page_number, raw_img,
+                                   dpi=OCR_RENDER_DPI, cache=page_cache)
 
     update_progress_file(progress_file, supplier, "running", 5,
                          f"OCR iniciado ({total_pages} páginas)")
 
-    os.makedirs(output_dir, exist_ok=True)
-    ocr = PaddleOCR(use_angle_cls=True, lang="pt", show_log=False)
-
-    for i in range(1, total_pages + 1):
-        step_desc = f"OCR página {i}/{total_pages}"
+    try:
+        if OCR_BATCH_MODE and batch_supported():
+            _run_batched(render, total_pages, output_dir, progress_file, supplier)
+        else:
+            orientations = []
+            with PagePrefetcher(render, range(1, total_pages + 1), depth=PREFETCH_PAGES) as pages:
+                for i, img in pages:
+                    step_desc = f"OCR página {i}/{total_pages}"
 
-        # --- Renderizar imagem com Poppler ---
-        raw_img = os.path.join(output_dir, "render")
-        img_path = _pdftoppm_image(pdf_path, i, raw_img)
+                    # --- Orientação da página (uma vez, em baixa resolução) ---
+                    img, orient = _orient(img, i, orientations)
 
-        # --- OCR ---
-        raw_result = ocr.ocr(img_path, cls=True)
-        normalized = normalize_paddleocr_output(raw_result)
+                    # --- OCR (caminho do JPG ou array em memória) ---
+                    normalized = paddle_ocr_blocks(img, cls=orient["cls"] if orient else True)
+                    if orient:
+                        normalized = unmap_blocks(normalized, orient)
+                    _save_page_json(output_dir, i, normalized)
 
-        # --- Salvar JSON ---
-        json_path = os.path.join(output_dir, f"ocr_page_{i:02d}.json")
-        with open(json_path, "w", encoding="utf-8") as jf:
-            json.dump(normalized, jf, ensure_ascii=False, indent=2)
+                    progress = int((i / total_pages) * 100)
+                    update_progress_file(progress_file, supplier, "running", progress, step_desc)
+            _save_orientation(output_dir, orientations)
+    finally:
+        if doc is not None:
+            doc.close()
 
-        progress = int((i / total_pages) * 100)
-        update_progress_file(progress_file, supplier, "running", progress, step_desc)
+    if page_cache is not None:
+        page_cache.evict()
+        page_cache.flush_stats()
 
     update_progress_file(progress_file, supplier, "done", 100,
                          "OCR concluído com sucesso")
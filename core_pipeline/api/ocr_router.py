@@ -0,0 +1,144 @@
+"""
+Garimpo ML – Roteador de motores de OCR por página
+--------------------------------------------------
+eval_accuracy_hybrid.py mostrou (offline) que escolher o motor por página
+rende mais do que um motor fixo. Este módulo faz a escolha em produção:
+
+    1. toda página passa pelo motor rápido (Tesseract) + extrator de
+       produtos;
+    2. sinais baratos comparam o que foi extraído com o que a página
+       aparenta ter:
+           - caixas de produto detectadas (find_boxes em baixa resolução)
+           - âncoras de código (CTxxxx) encontradas
+           - códigos com preço (produto completo)
+    3. só as páginas de baixo rendimento ou com campos faltando são
+       refeitas com o PaddleOCR; fica o resultado com mais produtos
+       completos.
+
+Decisão por página (gravada no log do job):
+    {
+        "page": int,
+        "engine": "fast" | "paddle",
+        "reason": "ok" | "low_yield" | "incomplete" | "...:paddle_unavailable",
+        "signals": {"boxes", "codes", "complete", "products"},
+        "paddle_signals": {...} | None,
+        "seconds": {"fast": float, "layout": float, "paddle": float}
+    }
+"""
+
+import os
+import time
+
+from core_pipeline.api.two_pass_render import detect_layout_boxes
+from core_pipeline.api.page_prep import PreparedPage
+
+
+OCR_ROUTER_MODE = os.environ.get("GARIMPO_OCR_ROUTER", "1") == "1"
+
+# Página de baixo rendimento: códigos < MIN_CODE_RATIO × caixas detectadas
+MIN_CODE_RATIO = float(os.environ.get("GARIMPO_ROUTER_MIN_CODE_RATIO", "0.6"))
+# Página incompleta: códigos com preço < MIN_COMPLETE_RATIO × códigos
+MIN_COMPLETE_RATIO = float(os.environ.get("GARIMPO_ROUTER_MIN_COMPLETE_RATIO", "0.5"))
+
+# Detecção de caixas em 100 DPI (1/3 da página de 300 DPI)
+LAYOUT_SCALE = 1 / 3
+
+
+def page_signals(produtos, boxes=None) -> dict:
+    codes = {p["codigo"] for p in produtos if p.get("codigo")}
+    complete = {p["codigo"] for p in produtos if p.get("codigo") and p.get("preco")}
+    return {
+        "boxes": boxes,
+        "codes": len(codes),
+        "complete": len(complete),
+        "products": len(produtos),
+    }
+
+
+def count_product_boxes(page) -> int:
+    """
+    Caixas de produto (find_boxes) na página reduzida a LAYOUT_SCALE.
+    page: PreparedPage (reaproveita a redução) ou np.ndarray.
+    """
+    small = PreparedPage.wrap(page).scaled(LAYOUT_SCALE)
+    return len(detect_layout_boxes(small, "find_boxes", scale=LAYOUT_SCALE))
+
+
+def needs_paddle(sig):
+    """
+    (refazer?, motivo) a partir dos sinais do motor rápido.
+    """
+    if sig["boxes"] and sig["codes"] < MIN_CODE_RATIO * sig["boxes"]:
+        return True, "low_yield"
+    if sig["codes"] and sig["complete"] < MIN_COMPLETE_RATIO * sig["codes"]:
+        return True, "incomplete"
+    return False, "ok"
+
+
+def _score(sig):
+    return (sig["complete"], sig["codes"], sig["products"])
+
+
+def route_page(page, page_num, fast, paddle):
+    """
+    Roda fast() e, se os sinais pedirem, paddle(); devolve
+    (produtos escolhidos, decisão).
+
+    Args:
+        page (PreparedPage | np.ndarray): página (300 DPI), para contar caixas.
+        fast / paddle (callable): () → lista de produtos da página.
+    """
+    from core_pipeline.api.ocr_service import paddle_available
+
+    t0 = time.perf_counter()
+    produtos = fast()
+    t_fast = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    try:
+        boxes = count_product_boxes(page)
+    except Exception:
+        boxes = None
+    t_layout = time.perf_counter() - t0
+
+    sig = page_signals(produtos, boxes)
+    rerun, reason = needs_paddle(sig)
+    decision = {
+        "page": page_num,
+        "engine": "fast",
+        "reason": reason,
+        "signals": sig,
+        "paddle_signals": None,
+        "seconds": {"fast": round(t_fast, 3), "layout": round(t_layout, 3), "paddle": 0.0},
+    }
+
+    if not rerun:
+        return produtos, decision
+    if not paddle_available():
+        decision["reason"] = f"{reason}:paddle_unavailable"
+        return produtos, decision
+
+    t0 = time.perf_counter()
+    paddle_produtos = paddle()
+    decision["seconds"]["paddle"] = round(time.perf_counter() - t0, 3)
+
+    psig = page_signals(paddle_produtos, boxes)
+    decision["paddle_signals"] = psig
+    if _score(psig) > _score(sig):
+        decision["engine"] = "paddle"
+        return paddle_produtos, decision
+    return produtos, decision
+
+
+def summarize_decisions(decisions) -> dict:
+    """
+    Resumo do job: páginas por motor/motivo e tempo total de cada motor.
+    """
+    summary = {"pages": len(decisions), "engine": {}, "reason": {},
+               "seconds": {"fast": 0.0, "layout": 0.0, "paddle": 0.0}}
+    for d in decisions:
+        summary["engine"][d["engine"]] = summary["engine"].get(d["engine"], 0) + 1
+        summary["reason"][d["reason"]] = summary["reason"].get(d["reason"], 0) + 1
+        for k, v in d["seconds"].items():
+            summary["seconds"][k] = round(summary["seconds"][k] + v, 3)
+    return summary
@@ -0,0 +1,319 @@
+"""
+Garimpo ML – Serviço PaddleOCR residente
+----------------------------------------
+Carregar o PaddleOCR (detecção + classificação de ângulo + reconhecimento)
+custa alguns segundos e centenas de MB. Antes isso acontecia a cada job.
+
+Este módulo tem dois lados:
+
+1) Serviço (processo de longa duração, modelos carregados uma vez):
+       python3 -m core_pipeline.api.ocr_service --port 8765
+
+   Rotas (somente localhost):
+       GET  /health        → {"status": "ok", "engines": int, "requests": int}
+       POST /ocr?cls=1     → corpo: imagem .npy (application/x-npy, sem perda)
+                             ou JPG/PNG (image/*)
+                             resposta: {"status", "blocks", "seconds", "error"}
+
+   Jobs simultâneos compartilham o(s) mesmo(s) modelo(s) aquecido(s)
+   (GARIMPO_OCR_SERVICE_ENGINES instâncias, padrão 1).
+
+2) Cliente (qualquer etapa do pipeline):
+       from core_pipeline.api.ocr_service import paddle_ocr_blocks
+       result = paddle_ocr_blocks(img)   # página ou região, np.ndarray/caminho
+
+   Usa o serviço se estiver no ar (GARIMPO_OCR_SERVICE_URL); senão cai
+   para um PaddleOCR em processo, criado uma única vez por processo.
+
+Formato de saída (normalize_paddleocr_output):
+    {"blocks": [{"text": str, "bbox": [[x, y] x4], "conf": float}, ...]}
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import traceback
+import urllib.request
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cv2
+import numpy as np
+
+try:
+    from paddleocr import PaddleOCR
+except ImportError:  # dependência opcional (o cliente pode usar só o serviço)
+    PaddleOCR = None
+
+# Permite rodar como script/serviço a partir de qualquer diretório
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api.pdf_renderer import load_image
+from core_pipeline.api.ocr_cache import cached_ocr
+
+
+OCR_SERVICE_HOST = "127.0.0.1"
+OCR_SERVICE_PORT = int(os.environ.get("GARIMPO_OCR_SERVICE_PORT", "8765"))
+OCR_SERVICE_URL = os.environ.get(
+    "GARIMPO_OCR_SERVICE_URL", f"http://{OCR_SERVICE_HOST}:{OCR_SERVICE_PORT}"
+)
+# "auto" → serviço se disponível; "off" → sempre em processo; "required" → só serviço
+OCR_SERVICE_MODE = os.environ.get("GARIMPO_OCR_SERVICE", "auto")
+OCR_SERVICE_ENGINES = int(os.environ.get("GARIMPO_OCR_SERVICE_ENGINES", "1"))
+OCR_SERVICE_TIMEOUT = float(os.environ.get("GARIMPO_OCR_SERVICE_TIMEOUT", "120"))
+
+# Limite do corpo da requisição (página 300 DPI BGR ≈ 26 MB)
+MAX_BODY_BYTES = 256 * 1024 * 1024
+# Por quanto tempo o cliente confia no último /health
+HEALTH_TTL_S = 30
+
+PADDLE_KWARGS = {"use_angle_cls": True, "lang": "pt", "show_log": False}
+
+
+# =========================================================
+# 🔹 Normalização
+# =========================================================
+def normalize_paddleocr_output(raw_ocr):
+    blocks = []
+    for line_group in raw_ocr or []:
+        for line in line_group or []:
+            bbox = [[float(x), float(y)] for x, y in line[0]]
+            text = line[1][0]
+            blocks.append({"text": text, "bbox": bbox, "conf": float(line[1][1])})
+    return {"blocks": blocks}
+
+
+# =========================================================
+# 🔹 Motor em processo (um por processo, criado sob demanda)
+# =========================================================
+_local_engine = None
+_local_lock = threading.Lock()
+
+
+def get_local_engine():
+    """
+    PaddleOCR do processo atual, criado uma única vez.
+    """
+    global _local_engine
+    with _local_lock:
+        if _local_engine is None:
+            if PaddleOCR is None:
+                raise RuntimeError("paddleocr não instalado e serviço de OCR indisponível")
+            _local_engine = PaddleOCR(**PADDLE_KWARGS)
+        return _local_engine
+
+
+def _run_local(img, cls):
+    engine = get_local_engine()
+    # O PaddleOCR não é thread-safe: serializa dentro do processo
+    with _local_lock:
+        raw = engine.ocr(img, cls=cls)
+    return normalize_paddleocr_output(raw)
+
+
+# =========================================================
+# 🔹 Cliente
+# =========================================================
+_health = {"ok": None, "checked_at": 0.0}
+
+
+def service_available(url=None) -> bool:
+    """
+    True se o serviço responder /health (resultado memorizado por HEALTH_TTL_S).
+    """
+    now = time.monotonic()
+    if _health["ok"] is not None and now - _health["checked_at"] < HEALTH_TTL_S:
+        return _health["ok"]
+
+    ok = False
+    try:
+        with urllib.request.urlopen(f"{url or OCR_SERVICE_URL}/health", timeout=1.0) as resp:
+            ok = json.loads(resp.read().decode("utf-8")).get("status") == "ok"
+    except Exception:
+        ok = False
+
+    _health.update(ok=ok, checked_at=now)
+    return ok
+
+
+def paddle_available() -> bool:
+    """
+    True se há PaddleOCR para usar: em processo ou via serviço residente.
+    """
+    if OCR_SERVICE_MODE != "required" and PaddleOCR is not None:
+        return True
+    return OCR_SERVICE_MODE != "off" and service_available()
+
+
+def _encode_npy(img) -> bytes:
+    buf = io.BytesIO()
+    np.save(buf, np.ascontiguousarray(img), allow_pickle=False)
+    return buf.getvalue()
+
+
+def _run_remote(img, cls, url=None):
+    req = urllib.request.Request(
+        f"{url or OCR_SERVICE_URL}/ocr?cls={1 if cls else 0}",
+        data=_encode_npy(img),
+        headers={"Content-Type": "application/x-npy"},
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=OCR_SERVICE_TIMEOUT) as resp:
+        payload = json.loads(resp.read().decode("utf-8"))
+    if payload.get("status") != "success":
+        raise RuntimeError(payload.get("error") or "Falha no serviço de OCR")
+    return {"blocks": payload["blocks"]}
+
+
+def paddle_ocr_blocks(img, cls=True, mode=None):
+    """
+    OCR PaddleOCR de uma página ou região (np.ndarray ou caminho).
+    Usa o serviço residente quando disponível; senão (ou se a chamada
+    falhar) roda no próprio processo. Resultados passam pelo ocr_cache.
+    Retorna {"blocks": [...]}.
+    """
+    arr = load_image(img)
+    if arr is None:
+        raise ValueError(f"Falha ao carregar imagem: {img}")
+
+    return cached_ocr(
+        arr, "paddleocr", lambda: _paddle_ocr_uncached(arr, cls, mode or OCR_SERVICE_MODE),
+        config=f"cls={int(bool(cls))}", lang=PADDLE_KWARGS["lang"],
+    )
+
+
+def _paddle_ocr_uncached(arr, cls, mode):
+    """
+    Serviço residente quando disponível; senão PaddleOCR em processo.
+    """
+    if mode != "off" and service_available():
+        try:
+            return _run_remote(arr, cls)
+        except Exception:
+            if mode == "required":
+                raise
+            # serviço caiu no meio do job → marca e segue em processo
+            _health.update(ok=False, checked_at=time.monotonic())
+    elif mode == "required":
+        raise RuntimeError(f"Serviço de OCR indisponível em {OCR_SERVICE_URL}")
+
+    return _run_local(arr, cls)
+
+
+# =========================================================
+# 🔹 Serviço
+# =========================================================
+class _EnginePool:
+    """
+    N instâncias do PaddleOCR; cada requisição pega uma emprestada.
+    """
+
+    def __init__(self, size):
+        self.size = max(1, int(size))
+        self._engines = queue.Queue()
+        for _ in range(self.size):
+            self._engines.put(PaddleOCR(**PADDLE_KWARGS))
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def ocr(self, img, cls):
+        engine = self._engines.get()
+        try:
+            raw = engine.ocr(img, cls=cls)
+        finally:
+            self._engines.put(engine)
+        with self._lock:
+            self.requests += 1
+        return normalize_paddleocr_output(raw)
+
+
+def _decode_body(body, content_type):
+    if content_type.startswith("application/x-npy"):
+        return np.load(io.BytesIO(body), allow_pickle=False)
+    img = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Imagem inválida no corpo da requisição")
+    return img
+
+
+class _Handler(BaseHTTPRequestHandler):
+    pool = None
+
+    def _send(self, code, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            return self._send(404, {"status": "error", "error": "rota inexistente"})
+        self._send(200, {"status": "ok", "engines": self.pool.size, "requests": self.pool.requests})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/ocr":
+            return self._send(404, {"status": "error", "error": "rota inexistente"})
+
+        result = {"status": "error", "blocks": [], "seconds": 0.0, "error": None}
+        t0 = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_BODY_BYTES:
+                result["error"] = f"Tamanho de corpo inválido: {length}"
+                return self._send(400, result)
+
+            img = _decode_body(self.rfile.read(length), self.headers.get("Content-Type", ""))
+            cls = parse_qs(url.query).get("cls", ["1"])[0] != "0"
+
+            result["blocks"] = self.pool.ocr(img, cls)["blocks"]
+            result["status"] = "success"
+            result["seconds"] = round(time.perf_counter() - t0, 3)
+            return self._send(200, result)
+        except Exception as e:
+            result["error"] = str(e)
+            result["traceback"] = traceback.format_exc()
+            return self._send(500, result)
+
+    def log_message(self, fmt, *args):
+        # Sem log por requisição no stderr
+        pass
+
+
+def serve(host=OCR_SERVICE_HOST, port=OCR_SERVICE_PORT, engines=OCR_SERVICE_ENGINES):
+    """
+    Carrega os modelos uma vez e atende até ser interrompido.
+    """
+    if PaddleOCR is None:
+        raise SystemExit("paddleocr não instalado.")
+
+    t0 = time.perf_counter()
+    _Handler.pool = _EnginePool(engines)
+    print(f"[OK] {engines} PaddleOCR carregado(s) em {time.perf_counter() - t0:.1f}s")
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    print(f"[OK] Serviço de OCR em http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serviço PaddleOCR residente (localhost)")
+    parser.add_argument("--host", default=OCR_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=OCR_SERVICE_PORT)
+    parser.add_argument("--engines", type=int, default=OCR_SERVICE_ENGINES)
+    args = parser.parse_args()
+    serve(args.host, args.port, args.engines)
@@ -0,0 +1,230 @@
+"""
+Garimpo ML – PaddleOCR em duas fases (detecção por página, reconhecimento em lote)
+---------------------------------------------------------------------------------
+`ocr.ocr(img, cls=True)` detecta e reconhece página a página: o
+reconhecedor recebe lotes pequenos e de larguras desiguais (padding
+desperdiçado), o que rende pouco em CPU.
+
+Aqui o job é dividido em duas fases:
+
+    1. detecção: cada página passa só pelo detector; os recortes das
+       linhas (com correção de perspectiva) ficam guardados e a página
+       é liberada;
+    2. reconhecimento: todos os recortes do job são ordenados por razão
+       de aspecto e reconhecidos em lotes fixos de REC_BATCH_SIZE
+       (classificador de ângulo antes, só nas linhas das páginas com
+       cls=True).
+
+O resultado volta para cada página no formato de normalize_paddleocr_output:
+    {"blocks": [{"text": str, "bbox": [[x, y] x4], "conf": float}, ...]}
+
+Requer a API 2.x do PaddleOCR (text_detector / text_classifier /
+text_recognizer). Sem ela, batch_supported() retorna False e o chamador
+segue pelo caminho por página (ocr_service.paddle_ocr_blocks).
+
+Uso:
+    batch = BatchRecognizer(cls=True)
+    for page, img in pages:
+        batch.add_page(page, img)          # ou cls=False: página já em pé
+    results = batch.finish()   # {page: {"blocks": [...]}}
+"""
+
+import os
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from core_pipeline.api.ocr_cache import get_ocr_cache
+from core_pipeline.api.ocr_service import PaddleOCR, PADDLE_KWARGS
+
+
+OCR_BATCH_MODE = os.environ.get("GARIMPO_PADDLE_BATCH", "0") == "1"
+REC_BATCH_SIZE = int(os.environ.get("GARIMPO_PADDLE_REC_BATCH", "32"))
+
+# Mesmo corte de score que o PaddleOCR aplica no modo por página
+DROP_SCORE = 0.5
+
+CACHE_ENGINE = "paddleocr:batch"
+
+
+# =========================================================
+# 🔹 Motor (um por processo, com lote de reconhecimento grande)
+# =========================================================
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_batch_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            if PaddleOCR is None:
+                raise RuntimeError("paddleocr não instalado")
+            _engine = PaddleOCR(**PADDLE_KWARGS, rec_batch_num=REC_BATCH_SIZE)
+        return _engine
+
+
+def batch_supported() -> bool:
+    """
+    True se o PaddleOCR em processo expõe detector e reconhecedor separados.
+    """
+    if PaddleOCR is None:
+        return False
+    try:
+        engine = get_batch_engine()
+    except Exception:
+        return False
+    return hasattr(engine, "text_detector") and hasattr(engine, "text_recognizer")
+
+
+# =========================================================
+# 🔹 Recortes
+# =========================================================
+def sort_boxes(dt_boxes):
+    """
+    Ordem de leitura (de cima para baixo, esquerda para direita), igual
+    à do PaddleOCR: caixas na mesma faixa de 10 px ordenadas por x.
+    """
+    boxes = sorted(dt_boxes, key=lambda b: (b[0][1], b[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def crop_line(img, box):
+    """
+    Recorte retificado de uma linha (quadrilátero → retângulo); linhas
+    verticais (altura ≥ 1.5× largura) são giradas 90°.
+    """
+    pts = np.asarray(box, dtype=np.float32)
+    w = int(max(np.linalg.norm(pts[0] - pts[1]), np.linalg.norm(pts[2] - pts[3])))
+    h = int(max(np.linalg.norm(pts[0] - pts[3]), np.linalg.norm(pts[1] - pts[2])))
+    w, h = max(w, 1), max(h, 1)
+
+    dst = np.float32([[0, 0], [w, 0], [w, h], [0, h]])
+    M = cv2.getPerspectiveTransform(pts, dst)
+    crop = cv2.warpPerspective(img, M, (w, h), borderMode=cv2.BORDER_REPLICATE,
+                               flags=cv2.INTER_CUBIC)
+    if h / float(w) >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+# =========================================================
+# 🔹 Lote
+# =========================================================
+class BatchRecognizer:
+    """
+    Acumula as linhas detectadas de várias páginas e reconhece tudo no fim.
+    Páginas já presentes no ocr_cache não passam pelo detector.
+    """
+
+    def __init__(self, cls=True, batch_size=REC_BATCH_SIZE, cache=None):
+        self.cls = cls
+        self.batch_size = max(1, int(batch_size))
+        self.engine = get_batch_engine()
+        self.cache = cache or get_ocr_cache()
+
+        self._crops = []        # recortes de todas as páginas
+        self._owners = []       # (page_key, box) de cada recorte
+        self._cls = []          # classificador de ângulo em cada recorte?
+        self._pages = {}        # page_key → cache key (ou None)
+        self._results = {}      # page_key → {"blocks": [...]} (hits do cache)
+        self.stats = {"pages": 0, "cached_pages": 0, "lines": 0, "cls_lines": 0,
+                      "batches": 0, "det_seconds": 0.0, "rec_seconds": 0.0}
+
+    def add_page(self, page_key, img, cls=None):
+        """
+        Fase 1: detecta as linhas da página e guarda apenas os recortes.
+        cls: classificador de ângulo nas linhas desta página (padrão self.cls).
+        """
+        cls = self.cls if cls is None else bool(cls)
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        self.stats["pages"] += 1
+
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(img, CACHE_ENGINE, config=f"cls={int(cls)}",
+                                 lang=PADDLE_KWARGS["lang"])
+            data = self.cache.get(key)
+            if data is not None:
+                self._results[page_key] = data
+                self.stats["cached_pages"] += 1
+                return
+        self._pages[page_key] = key
+
+        t0 = time.perf_counter()
+        dt_boxes, _ = self.engine.text_detector(img)
+        self.stats["det_seconds"] += time.perf_counter() - t0
+
+        if dt_boxes is None:
+            return
+        for box in sort_boxes(list(dt_boxes)):
+            self._crops.append(crop_line(img, box))
+            self._owners.append((page_key, box))
+            self._cls.append(cls)
+
+    @property
+    def pending_lines(self) -> int:
+        return len(self._crops)
+
+    def _recognize(self, crops, cls_flags):
+        idx = [i for i, flag in enumerate(cls_flags) if flag]
+        if idx and getattr(self.engine, "use_angle_cls", False):
+            fixed, _, _ = self.engine.text_classifier([crops[i] for i in idx])
+            for i, crop in zip(idx, fixed):
+                crops[i] = crop
+            self.stats["cls_lines"] += len(idx)
+        rec_res, _ = self.engine.text_recognizer(crops)
+        return rec_res
+
+    def finish(self):
+        """
+        Fase 2: reconhece todos os recortes em lotes ordenados por largura
+        relativa e devolve {page_key: {"blocks": [...]}} na ordem de leitura.
+        """
+        n = len(self._crops)
+        self.stats["lines"] = n
+
+        # Lotes homogêneos: pouco padding dentro de cada lote
+        order = sorted(range(n), key=lambda i: self._crops[i].shape[1] / float(self._crops[i].shape[0]))
+        texts = [None] * n
+
+        t0 = time.perf_counter()
+        for start in range(0, n, self.batch_size):
+            idx = order[start:start + self.batch_size]
+            rec_res = self._recognize([self._crops[i] for i in idx], [self._cls[i] for i in idx])
+            for i, res in zip(idx, rec_res):
+                texts[i] = res
+            self.stats["batches"] += 1
+        self.stats["rec_seconds"] += time.perf_counter() - t0
+
+        results = {page_key: {"blocks": []} for page_key in self._pages}
+        for (page_key, box), res in zip(self._owners, texts):
+            text, score = res
+            if score < DROP_SCORE:
+                continue
+            results[page_key]["blocks"].append({
+                "text": text,
+                "bbox": [[float(x), float(y)] for x, y in box],
+                "conf": float(score),
+            })
+
+        if self.cache is not None:
+            for page_key, key in self._pages.items():
+                if key is not None:
+                    self.cache.put(key, results[page_key])
+
+        results.update(self._results)
+        self.stats["det_seconds"] = round(self.stats["det_seconds"], 3)
+        self.stats["rec_seconds"] = round(self.stats["rec_seconds"], 3)
+
+        self._crops, self._owners, self._cls = [], [], []
+        return results
@@ -0,0 +1,274 @@
+"""
+Garimpo ML – Cache de páginas renderizadas
+------------------------------------------
+Cache compartilhado entre jobs, endereçado por conteúdo:
+    (hash SHA-256 do PDF, página, DPI, renderer) → imagem da página
+
+Fornecedores reenviam o mesmo catálogo várias vezes na semana; cada upload
+vira um job novo em data/<SUPPLIER>_<data>/. Com o cache, as páginas já
+renderizadas são reaproveitadas via hardlink (ou cópia, se o hardlink não
+for possível) em vez de chamar o pdftoppm de novo.
+
+Como o job recebe um hardlink, quem grava páginas no job nunca escreve
+sobre o arquivo existente: renderiza num temporário (temp_sibling) e
+troca via os.replace. O cache, por sua vez, guarda cópias próprias.
+
+Layout em disco:
+    <CACHE_ROOT>/<hash[:2]>/<hash>/<renderer>_<dpi>/page_0001.jpg
+    <CACHE_ROOT>/stats.json   (contadores acumulados de hit/miss)
+
+Tamanho limitado por PAGE_CACHE_MAX_BYTES com evicção LRU
+(o mtime do arquivo é atualizado a cada hit).
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+
+PAGE_CACHE_ROOT = os.environ.get(
+    "GARIMPO_PAGE_CACHE", "/home/ubuntu/garimpo-ml/core_pipeline/cache/pages"
+)
+PAGE_CACHE_MAX_BYTES = int(os.environ.get("GARIMPO_PAGE_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+PAGE_CACHE_ENABLED = os.environ.get("GARIMPO_PAGE_CACHE_ENABLED", "1") == "1"
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def pdf_content_hash(pdf_path) -> str:
+    """
+    SHA-256 do conteúdo do PDF (memoizado por caminho + tamanho + mtime).
+    """
+    pdf_path = str(pdf_path)
+    st = os.stat(pdf_path)
+    memo_key = (os.path.abspath(pdf_path), st.st_size, st.st_mtime_ns)
+
+    with _hash_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+
+    h = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _hash_lock:
+        _hash_memo[memo_key] = digest
+    return digest
+
+
+def temp_sibling(path) -> str:
+    """
+    Caminho temporário único ao lado de path, com a mesma extensão
+    (pdftoppm / cv2.imwrite escolhem o formato por ela).
+    """
+    root, ext = os.path.splitext(str(path))
+    return f"{root}.tmp.{os.getpid()}.{threading.get_ident()}{ext}"
+
+
+def replace_with(path, write):
+    """
+    write(tmp) grava num temporário que depois substitui path (os.replace).
+    Um hardlink que já estivesse em path (ex.: entrada do cache) não é
+    truncado. Retorna o valor de write.
+    """
+    path = str(path)
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp = temp_sibling(path)
+    try:
+        ok = write(tmp)
+        if ok is not False and os.path.exists(tmp):
+            os.replace(tmp, path)
+        return ok
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def link_or_copy(src, dst):
+    """
+    Materializa src em dst via hardlink; cai para cópia entre filesystems.
+    """
+    dst = str(dst)
+    out_dir = os.path.dirname(dst)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class PageCache:
+    """
+    Cache LRU de páginas renderizadas, com contadores de hit/miss.
+
+    Uso:
+        cache = PageCache()
+        key = cache.key(pdf_path, page=3, dpi=300, renderer="pdftoppm-jpeg")
+        if not cache.fetch(key, "out/page_03.jpg"):
+            ... renderiza out/page_03.jpg ...
+            cache.store(key, "out/page_03.jpg")
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = str(root or PAGE_CACHE_ROOT)
+        self.max_bytes = PAGE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Chaves e caminhos
+    # -----------------------------
+    @staticmethod
+    def key(pdf_path, page, dpi, renderer, ext="jpg"):
+        return (pdf_content_hash(pdf_path), int(page), int(dpi), str(renderer), ext)
+
+    def path_for(self, key) -> str:
+        pdf_hash, page, dpi, renderer, ext = key
+        return os.path.join(
+            self.root, pdf_hash[:2], pdf_hash, f"{renderer}_{dpi}", f"page_{page:04d}.{ext}"
+        )
+
+    # -----------------------------
+    # Operações
+    # -----------------------------
+    def lookup(self, key):
+        """
+        Retorna o caminho em cache (e marca como usado) ou None.
+        """
+        path = self.path_for(key)
+        if os.path.exists(path):
+            try:
+                os.utime(path, None)  # LRU: último uso
+            except OSError:
+                pass
+            with self._lock:
+                self.hits += 1
+            return path
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def fetch(self, key, dest) -> bool:
+        """
+        Se a página estiver em cache, materializa em dest e retorna True.
+        """
+        path = self.lookup(key)
+        if path is None:
+            return False
+        try:
+            link_or_copy(path, dest)
+            return True
+        except OSError:
+            return False
+
+    def store(self, key, src):
+        """
+        Registra src (já renderizado) no cache. Escrita atômica, sempre por
+        cópia: um hardlink deixaria a entrada à mercê de regravações do job.
+        """
+        if not os.path.exists(src):
+            return None
+
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = temp_sibling(path)
+        try:
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return None
+        return path
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name == "stats.json" or ".tmp." in name:
+                    continue
+                fpath = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(fpath)
+                except OSError:
+                    continue
+                yield fpath, st.st_size, st.st_mtime
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        """
+        Remove as páginas menos usadas até o cache caber em max_bytes.
+        Retorna quantos arquivos foram removidos.
+        """
+        if self.max_bytes <= 0 or not os.path.isdir(self.root):
+            return 0
+
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for fpath, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(fpath)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    # -----------------------------
+    # Estatísticas
+    # -----------------------------
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def flush_stats(self):
+        """
+        Soma os contadores desta instância em <root>/stats.json e zera-os.
+        """
+        with self._lock:
+            delta = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+            self.hits = self.misses = self.evictions = 0
+
+        stats_path = os.path.join(self.root, "stats.json")
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            data = {}
+            if os.path.exists(stats_path):
+                with open(stats_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            for k, v in delta.items():
+                data[k] = int(data.get(k, 0)) + v
+            with open(stats_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        except Exception:
+            # Estatística nunca derruba o pipeline
+            pass
+        return delta
@@ -0,0 +1,255 @@
+"""
+Garimpo ML – Reaproveitamento de páginas entre versões do catálogo
+-----------------------------------------------------------------
+Fornecedores reenviam o catálogo toda semana com poucas páginas alteradas
+(atualização de preço). Aqui cada página renderizada recebe:
+
+    - phash: hash perceptual de 64 bits (DCT 32x32) → busca rápida de
+      candidatas entre as páginas já processadas do fornecedor;
+    - assinatura de blocos: média de cinza em blocos de ~16 px (a 300 DPI)
+      → confirma que nada mudou, nem um dígito de preço.
+
+Uma página só é reaproveitada se as DUAS comparações ficarem dentro dos
+limites. Nesse caso o OCR é dispensado e as linhas gravadas da versão
+anterior são reutilizadas (marcadas como "reused" na saída).
+
+Layout em disco:
+    <PAGE_INDEX_ROOT>/<SUPPLIER>/index.json        (entradas por página)
+    <PAGE_INDEX_ROOT>/<SUPPLIER>/sig/<entry>.npy   (assinaturas de blocos)
+    <PAGE_INDEX_ROOT>/<SUPPLIER>/index.lock        (flock durante save)
+
+Jobs do mesmo fornecedor podem rodar ao mesmo tempo: save() relê o
+índice em disco sob o lock e funde as entradas antes de gravar.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+import cv2
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # sem flock (Windows): save sem lock entre processos
+    fcntl = None
+
+from core_pipeline.api.pdf_renderer import load_image
+
+
+PAGE_INDEX_ROOT = os.environ.get(
+    "GARIMPO_PAGE_INDEX", "/home/ubuntu/garimpo-ml/core_pipeline/cache/page_index"
+)
+PAGE_REUSE_ENABLED = os.environ.get("GARIMPO_PAGE_REUSE", "1") == "1"
+
+# Distância de Hamming máxima entre phashes (de 64 bits)
+PHASH_MAX_DISTANCE = int(os.environ.get("GARIMPO_PHASH_MAX_DISTANCE", "6"))
+# Diferença máxima (0-255) na média de qualquer bloco da assinatura
+TILE_MAX_DIFF = float(os.environ.get("GARIMPO_TILE_MAX_DIFF", "6"))
+# Entradas mantidas por fornecedor (as mais antigas saem primeiro)
+MAX_ENTRIES = int(os.environ.get("GARIMPO_PAGE_INDEX_MAX", "1000"))
+
+# Bloco da assinatura, em pixels a 300 DPI (com 32 px, um 9 → 8 num
+# preço de ~5 pt mudava menos que TILE_MAX_DIFF na média do bloco)
+TILE_PX_300DPI = 16
+
+
+# =========================================================
+# 🔹 Hashes
+# =========================================================
+def _gray(img):
+    gray = load_image(img, grayscale=True)
+    if gray is None:
+        raise ValueError(f"Falha ao carregar imagem: {img}")
+    return gray
+
+
+def page_phash(img) -> str:
+    """
+    pHash clássico: DCT da página reduzida a 32x32, bits dos 8x8
+    coeficientes de baixa frequência acima da mediana. Retorna hex (16).
+    """
+    small = cv2.resize(_gray(img), (32, 32), interpolation=cv2.INTER_AREA)
+    dct = cv2.dct(np.float32(small))[:8, :8]
+    # mediana sem o termo DC (que domina a escala)
+    bits = (dct > np.median(dct.flatten()[1:])).flatten()
+    value = 0
+    for b in bits:
+        value = (value << 1) | int(b)
+    return f"{value:016x}"
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def tile_signature(img, dpi=300):
+    """
+    Média de cinza por bloco de TILE_PX_300DPI (escalado para o dpi da
+    imagem). Sensível a mudanças pequenas e localizadas (dígitos).
+    """
+    gray = _gray(img)
+    tile = max(4, int(round(TILE_PX_300DPI * dpi / 300.0)))
+    h, w = gray.shape[:2]
+    size = (max(1, w // tile), max(1, h // tile))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+
+def signatures_match(a, b, max_diff=TILE_MAX_DIFF) -> bool:
+    if a is None or b is None or a.shape != b.shape:
+        return False
+    diff = cv2.absdiff(a, b)
+    return float(diff.max()) <= max_diff
+
+
+def fingerprint_page(img, dpi=300) -> dict:
+    """
+    {"phash": str, "signature": np.ndarray} de uma página (caminho ou array).
+    """
+    gray = _gray(img)
+    return {"phash": page_phash(gray), "signature": tile_signature(gray, dpi=dpi)}
+
+
+def result_fingerprint(lines) -> str:
+    """
+    SHA-1 do resultado de OCR da página (lista de linhas), para auditoria.
+    """
+    payload = json.dumps(lines, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()
+
+
+# =========================================================
+# 🔹 Índice por fornecedor
+# =========================================================
+class SupplierPageIndex:
+    """
+    Páginas já processadas de um fornecedor, com o resultado do OCR.
+
+    Uso:
+        index = SupplierPageIndex("TTBRASIL")
+        fp = fingerprint_page(img)
+        hit = index.find(fp)            # None → precisa OCR
+        ...
+        index.add(job_id, page, fp, lines, ocr_seconds)
+        index.save()
+    """
+
+    def __init__(self, supplier, root=None):
+        self.supplier = str(supplier).upper()
+        self.root = os.path.join(str(root or PAGE_INDEX_ROOT), self.supplier)
+        self._sig_dir = os.path.join(self.root, "sig")
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self._sig_memo = {}
+
+    def _index_path(self):
+        return os.path.join(self.root, "index.json")
+
+    def _lock_path(self):
+        return os.path.join(self.root, "index.lock")
+
+    def _load(self):
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data.get("entries", [])
+        except (OSError, ValueError):
+            return []
+
+    def _signature(self, entry_id):
+        if entry_id not in self._sig_memo:
+            path = os.path.join(self._sig_dir, f"{entry_id}.npy")
+            try:
+                self._sig_memo[entry_id] = np.load(path, allow_pickle=False)
+            except (OSError, ValueError):
+                self._sig_memo[entry_id] = None
+        return self._sig_memo[entry_id]
+
+    def find(self, fp, max_distance=PHASH_MAX_DISTANCE, max_diff=TILE_MAX_DIFF):
+        """
+        Entrada anterior equivalente à página (ou None).
+        Candidatas por phash (mais próxima primeiro), confirmadas pela
+        assinatura de blocos.
+        """
+        with self._lock:
+            entries = list(self._entries)
+
+        candidates = []
+        for entry in entries:
+            dist = hamming(fp["phash"], entry["phash"])
+            if dist <= max_distance:
+                # a mais recente vence em caso de empate
+                candidates.append((dist, -entry.get("created_at", 0), entry))
+
+        for _, _, entry in sorted(candidates, key=lambda c: (c[0], c[1])):
+            if signatures_match(fp["signature"], self._signature(entry["id"]), max_diff):
+                return entry
+        return None
+
+    def add(self, job_id, page_number, fp, lines, ocr_seconds=0.0):
+        entry_id = f"{job_id}_p{int(page_number):02d}"
+        os.makedirs(self._sig_dir, exist_ok=True)
+        np.save(os.path.join(self._sig_dir, f"{entry_id}.npy"), fp["signature"], allow_pickle=False)
+        self._sig_memo[entry_id] = fp["signature"]
+
+        entry = {
+            "id": entry_id,
+            "job_id": job_id,
+            "page": int(page_number),
+            "phash": fp["phash"],
+            "result_sha1": result_fingerprint(lines),
+            "lines": lines,
+            "ocr_seconds": round(float(ocr_seconds), 3),
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._entries = [e for e in self._entries if e["id"] != entry_id]
+            self._entries.append(entry)
+        return entry
+
+    def save(self):
+        """
+        Grava o índice (atômico) mantendo as MAX_ENTRIES mais recentes.
+        Sob flock: relê o índice em disco e funde com as entradas deste
+        processo (mesmo id → a mais recente vence), para que jobs
+        simultâneos do fornecedor não apaguem as entradas um do outro.
+        """
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            with open(self._lock_path(), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._save_locked()
+        except OSError:
+            # Índice é só otimização: nunca derruba o pipeline
+            pass
+
+    def _save_locked(self):
+        with self._lock:
+            merged = {e["id"]: e for e in self._load()}
+            for entry in self._entries:
+                prev = merged.get(entry["id"])
+                if prev is None or entry.get("created_at", 0) >= prev.get("created_at", 0):
+                    merged[entry["id"]] = entry
+
+            entries = sorted(merged.values(), key=lambda e: e.get("created_at", 0))
+            dropped = entries[:-MAX_ENTRIES] if len(entries) > MAX_ENTRIES else []
+            self._entries = entries[len(dropped):]
+            data = {"supplier": self.supplier, "entries": self._entries}
+
+        for entry in dropped:
+            path = os.path.join(self._sig_dir, f"{entry['id']}.npy")
+            if os.path.exists(path):
+                os.remove(path)
+            self._sig_memo.pop(entry["id"], None)
+
+        tmp = f"{self._index_path()}.tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self._index_path())
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
@@ -5,7 +5,7 @@ Lê as imagens page_XX.jpg, executa OCR com pytesseract, limpa o texto
 e gera JSONs products_page_XX.json prontos para renderização.
 """
 
-import os, re, json, pytesseract
+import os, re, sys, json
 from pathlib import Path
 from PIL import Image
 from datetime import datetime
@@ -18,6 +18,11 @@ DATA_DIR = BASE_DIR / "core_pipeline" / "data" / "TTBRASIL_20251112" / "outputs"
 OUT_DIR = BASE_DIR / "core_pipeline" / "outputs"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from core_pipeline.api.ocr_cache import tesseract_image_to_string
+
 # ============================================================
 # 🔹 Funções utilitárias
 # ============================================================
@@ -73,7 +78,7 @@ def processar_pagina(num: int):
 
     # OCR básico
     img = Image.open(img_path)
-    raw_text = pytesseract.image_to_string(img, lang="por+eng")
+    raw_text = tesseract_image_to_string(img, lang="por+eng")
 
     # Quebra por linhas e aplica parser
     produtos = []
@@ -0,0 +1,297 @@
+"""
+Garimpo ML – Orientação e inclinação da página (pré-passada barata)
+-------------------------------------------------------------------
+O PaddleOCR com use_angle_cls=True roda um classificador de ângulo em
+cada linha de texto, mas páginas de catálogo vêm quase sempre em pé ou,
+no máximo, giradas 90° por inteiro.
+
+Aqui a página é analisada uma vez, em resolução reduzida, e corrigida
+antes do OCR:
+
+    1. máscara de texto: Otsu + componentes conexos do tamanho de
+       caracteres (fotos e fios de tabela ficam de fora);
+    2. em pé × deitada: um fechamento curto na horizontal junta as
+       letras de cada palavra numa página em pé (e na vertical, numa
+       deitada); a razão entre os componentes restantes nas duas
+       direções decide. Listas de preço alinhadas à esquerda enganam o
+       perfil de projeção (colunas de caracteres iguais), não esta
+       razão. Com a razão neutra, vale o perfil do passo 3, e só para
+       manter a página em pé;
+    3. inclinação: o ângulo (±MAX_SKEW_DEG) que deixa o perfil de
+       projeção das linhas mais nítido, na direção escolhida;
+    4. 0° × 180°: em cada linha de texto, tinta acima da faixa central
+       (ascendentes, maiúsculas, dígitos) contra tinta abaixo
+       (descendentes).
+
+Se alguma etapa não for conclusiva (página sem texto, direção incerta,
+votação empatada), a estimativa é marcada como ambígua, a página fica
+como veio (no máximo endireitada, se já estava em pé) e o OCR mantém o
+classificador por linha (info["cls"] = True).
+
+Registro por página:
+    {"page", "rotation": 0|90|180|270, "skew": float, "ratio": float,
+     "merge": float, "votes": int, "ambiguous": bool, "cls": bool, "seconds": float,
+     "matrix": [[...], [...]]}   (original → corrigida)
+"""
+
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+PAGE_ORIENT_MODE = os.environ.get("GARIMPO_PAGE_ORIENT", "1") == "1"
+
+# Lado maior da imagem analisada (máscara de texto / votação 0° × 180°)
+ORIENT_MAX_SIDE = 2048
+# Busca de inclinação feita na metade dessa resolução
+SKEW_SCALE = 0.5
+MAX_SKEW_DEG = 5.0
+# Abaixo disso a página não é girada (o OCR tolera)
+MIN_DESKEW_DEG = 0.3
+
+# Componentes após fechamento vertical / horizontal: acima disso o texto
+# corre na horizontal (em pé), abaixo do inverso, na vertical
+MIN_MERGE_RATIO = 1.5
+# Deitar uma página em pé por engano custa mais que manter uma deitada:
+# 90° só com a razão
+# abaixo de 1/MIN_SIDEWAYS_MERGE, ou abaixo de 1/MIN_MERGE_RATIO com o
+# perfil de projeção concordando
+MIN_SIDEWAYS_MERGE = 2.5
+# Perfis de linhas/colunas: razão mínima para o perfil opinar
+MIN_PROFILE_RATIO = 1.5
+# Mínimo de caracteres na máscara para confiar na estimativa
+MIN_TEXT_COMPONENTS = 30
+# Votação 0° × 180°: margem mínima de linhas; desequilíbrio de tinta
+# contrário acima de MIN_FLIP_MASS anula a votação
+MIN_FLIP_VOTES = 5
+MIN_FLIP_MASS = 0.3
+# Fração mínima da tinta da linha fora da faixa central para ela votar
+# (linhas só de maiúsculas/dígitos quase não têm ascendentes: vírgulas e
+# cifrões decidiriam o voto)
+MIN_LINE_IMBALANCE = 0.06
+
+
+# =========================================================
+# 🔹 Máscara de texto e perfis
+# =========================================================
+def _text_mask(gray):
+    h, w = gray.shape[:2]
+    s = min(1.0, ORIENT_MAX_SIDE / float(max(h, w)))
+    small = cv2.resize(gray, None, fx=s, fy=s, interpolation=cv2.INTER_AREA) if s < 1.0 else gray
+    _, bw = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+
+    n, labels, st, _ = cv2.connectedComponentsWithStats(bw, connectivity=8)
+    side = max(bw.shape)
+    ch, cw, area = st[:, cv2.CC_STAT_HEIGHT], st[:, cv2.CC_STAT_WIDTH], st[:, cv2.CC_STAT_AREA]
+    keep = (ch >= 4) & (ch <= 0.02 * side) & (cw <= 0.06 * side) & (area >= 6)
+    keep[0] = False
+    return (keep[labels] * 255).astype(np.uint8), int(keep.sum())
+
+
+def _profile_sharpness(mask, axis=1):
+    prof = mask.sum(axis=axis, dtype=np.float64) / 255.0
+    return float(np.sum(np.diff(prof) ** 2))
+
+
+def _merge_ratio(mask):
+    """
+    Componentes restantes após fechamento vertical ÷ após horizontal, com
+    comprimento de meio caractere: > 1 → letras emendam na horizontal.
+    """
+    n, _, st, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if n <= 1:
+        return None
+    size = np.maximum(st[1:, cv2.CC_STAT_HEIGHT], st[1:, cv2.CC_STAT_WIDTH])
+    length = max(3, int(round(0.5 * float(np.median(size))))) | 1
+
+    def count(ksize):
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, ksize)
+        closed = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+        return cv2.connectedComponents(closed, connectivity=8)[0] - 1
+
+    return count((1, length)) / float(max(count((length, 1)), 1))
+
+
+def _rotate(img, angle, flags=cv2.INTER_NEAREST, border=cv2.BORDER_CONSTANT):
+    h, w = img.shape[:2]
+    M = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, 1.0)
+    return cv2.warpAffine(img, M, (w, h), flags=flags, borderMode=border)
+
+
+def _estimate_skew(small):
+    """
+    (ângulo, nitidez) do perfil das linhas mais nítido em ±MAX_SKEW_DEG.
+    """
+    def best(angles):
+        scores = [(_profile_sharpness(_rotate(small, a)), a) for a in angles]
+        return max(scores)
+
+    _, coarse = best(np.arange(-MAX_SKEW_DEG, MAX_SKEW_DEG + 1e-6, 0.5))
+    sharpness, fine = best(np.arange(coarse - 0.4, coarse + 0.4 + 1e-6, 0.1))
+    return round(float(fine), 2), sharpness
+
+
+def _flip_votes(mask):
+    """
+    (votos, desequilíbrio de tinta) das linhas de texto: positivo = em pé.
+    """
+    n, _, st, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if n <= 1:
+        return 0, 0.0
+    med_h = float(np.median(st[1:, cv2.CC_STAT_HEIGHT]))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (int(med_h * 1.5) | 1, 1))
+    lines = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+    n, _, st, _ = cv2.connectedComponentsWithStats(lines, connectivity=8)
+    votes, above_total, below_total = 0, 0.0, 0.0
+    for x, y, w, h, _ in st[1:]:
+        if h < 8 or w < 4 * h:
+            continue
+        prof = np.count_nonzero(mask[y:y + h, x:x + w], axis=1).astype(np.float64)
+        core = np.flatnonzero(prof >= 0.5 * prof.max())
+        above = prof[:core[0]].sum()
+        below = prof[core[-1] + 1:].sum()
+        above_total += above
+        below_total += below
+        if abs(above - below) >= MIN_LINE_IMBALANCE * prof.sum():
+            votes += int(above > below) - int(below > above)
+
+    total = above_total + below_total
+    return votes, (above_total - below_total) / total if total else 0.0
+
+
+# =========================================================
+# 🔹 Estimativa / correção
+# =========================================================
+def _rot90_matrix(k, w, h):
+    """
+    Matriz afim (original → np.rot90(img, k)) em coordenadas contínuas.
+    """
+    return {
+        0: np.float64([[1, 0, 0], [0, 1, 0]]),
+        1: np.float64([[0, 1, 0], [-1, 0, w]]),
+        2: np.float64([[-1, 0, w], [0, -1, h]]),
+        3: np.float64([[0, -1, h], [1, 0, 0]]),
+    }[k % 4]
+
+
+def estimate_orientation(img) -> dict:
+    """
+    Rotação (múltiplo de 90°, anti-horária) e inclinação que deixam a
+    página em pé, com o grau de confiança da estimativa.
+    """
+    t0 = time.perf_counter()
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    mask, n_chars = _text_mask(gray)
+
+    info = {"rotation": 0, "skew": 0.0, "ratio": None, "merge": None, "votes": 0,
+            "chars": n_chars, "ambiguous": True}
+
+    if n_chars >= MIN_TEXT_COMPONENTS:
+        merge = _merge_ratio(mask)
+        info["merge"] = round(merge, 3) if merge is not None else None
+
+        small = cv2.resize(mask, None, fx=SKEW_SCALE, fy=SKEW_SCALE, interpolation=cv2.INTER_AREA)
+        skew_rows, rows = _estimate_skew(small)
+        skew_cols, cols = _estimate_skew(np.ascontiguousarray(np.rot90(small, 1)))
+        ratio = rows / cols if cols else float(MIN_PROFILE_RATIO)
+        info["ratio"] = round(ratio, 3)
+
+        k = None
+        if merge is not None and merge >= MIN_MERGE_RATIO:
+            k = 0
+        elif merge is not None and merge <= 1.0 / MIN_MERGE_RATIO:
+            if merge <= 1.0 / MIN_SIDEWAYS_MERGE or ratio <= 1.0 / MIN_PROFILE_RATIO:
+                k = 1
+        elif ratio >= MIN_PROFILE_RATIO:
+            k = 0
+
+        if k is not None:
+            skew = skew_rows if k == 0 else skew_cols
+            if k == 1:
+                mask = np.ascontiguousarray(np.rot90(mask, 1))
+            if abs(skew) >= MIN_DESKEW_DEG:
+                mask = _rotate(mask, skew)
+            votes, mass = _flip_votes(mask)
+            info["votes"] = votes
+
+            upright = None
+            if abs(votes) >= MIN_FLIP_VOTES and not (abs(mass) >= MIN_FLIP_MASS and (mass > 0) != (votes > 0)):
+                upright = votes > 0
+
+            if upright is not None:
+                # 180° em torno do centro comuta com a inclinação
+                info["rotation"] = 90 * ((k + (0 if upright else 2)) % 4)
+                info["skew"] = skew
+                info["ambiguous"] = False
+            elif k == 0:
+                # sentido incerto: a página fica como veio, só endireitada
+                info["skew"] = skew
+
+    info["seconds"] = round(time.perf_counter() - t0, 4)
+    return info
+
+
+def correct_page(img, info):
+    """
+    Aplica a estimativa: np.rot90 (exato) e, se relevante, warpAffine da
+    inclinação. Grava em info["matrix"] a transformação original → corrigida.
+    """
+    h, w = img.shape[:2]
+    k = (info["rotation"] // 90) % 4
+    M = _rot90_matrix(k, w, h)
+    out = np.ascontiguousarray(np.rot90(img, k)) if k else img
+
+    skew = info.get("skew", 0.0)
+    if skew and abs(skew) >= MIN_DESKEW_DEG:
+        oh, ow = out.shape[:2]
+        S = cv2.getRotationMatrix2D((ow / 2.0, oh / 2.0), skew, 1.0)
+        out = cv2.warpAffine(out, S, (ow, oh), flags=cv2.INTER_LINEAR,
+                             borderMode=cv2.BORDER_REPLICATE)
+        M = S @ np.vstack([M, [0, 0, 1]])
+
+    info["matrix"] = M.round(6).tolist()
+    return out
+
+
+def orient_page(img, page_num=None):
+    """
+    Estima e corrige a página. Retorna (imagem corrigida, info); info["cls"]
+    indica se o OCR ainda deve rodar o classificador de ângulo por linha.
+    """
+    info = estimate_orientation(img)
+    info["page"] = page_num
+    out = correct_page(img, info)
+    info["cls"] = info["ambiguous"]
+    return out, info
+
+
+def unmap_blocks(normalized, info):
+    """
+    Leva os bbox de {"blocks": [...]} (OCR da página corrigida) de volta às
+    coordenadas da página original.
+    """
+    M = np.float64(info.get("matrix") or [[1, 0, 0], [0, 1, 0]])
+    if np.allclose(M, [[1, 0, 0], [0, 1, 0]]):
+        return normalized
+    inv = cv2.invertAffineTransform(M)
+    for block in normalized.get("blocks", []):
+        pts = np.float64(block["bbox"])
+        back = pts @ inv[:, :2].T + inv[:, 2]
+        block["bbox"] = [[round(float(x), 2), round(float(y), 2)] for x, y in back]
+    return normalized
+
+
+def summarize_orientation(infos) -> dict:
+    """
+    Resumo do job: páginas giradas, endireitadas e que mantiveram o cls.
+    """
+    return {
+        "pages": len(infos),
+        "rotated": sum(1 for i in infos if i["rotation"]),
+        "deskewed": sum(1 for i in infos if abs(i.get("skew", 0.0)) >= MIN_DESKEW_DEG),
+        "cls_pages": sum(1 for i in infos if i["cls"]),
+        "seconds": round(sum(i["seconds"] for i in infos), 3),
+    }
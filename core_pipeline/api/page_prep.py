@@ -0,0 +1,188 @@
+"""
+Garimpo ML – Preparação de página compartilhada
+-----------------------------------------------
+Cada etapa recarregava a página e refazia cvtColor / blur / threshold com
+parâmetros ligeiramente diferentes (line_segmenter, find_boxes_multi,
+ocr_page_processor, preprocess_image, calibra_p10_engine).
+
+PreparedPage decodifica a página uma vez e calcula sob demanda, uma única
+vez, as variantes nomeadas que as etapas usam:
+
+    gray / bgr         → cinza / colorida
+    bilateral          → bilateralFilter(gray, 9, 75, 75)
+    adaptive_31_2      → adaptativa gaussiana (31, 2) sobre bilateral   [ocr_page_processor]
+    adaptive_inv_31_5  → adaptativa invertida (31, 5) + abertura 3×3    [line_segmenter]
+    blur_5             → GaussianBlur 5×5                                [find_boxes_multi]
+    otsu_inv           → Otsu invertido sobre blur_5                     [find_boxes_multi]
+    clahe              → CLAHE (clip 3.0, 8×8)                           [preprocess_image]
+    gray_nlmeans       → fastNlMeans sobre gray
+    clahe_nlmeans      → fastNlMeans sobre clahe
+    adaptive_31_5      → adaptativa (31, 5) sobre clahe_nlmeans          [preprocess_image, modo "full"]
+    median_3           → mediana 3×3                                     [calibra_p10_engine]
+    th_180             → limiar fixo 180 sobre median_3                  [calibra_p10_engine]
+
+Os tamanhos de janela são para 300 DPI e acompanham `scale` (como nos
+detectores): PreparedPage(img, scale=1/3) usa bloco 11 em vez de 31.
+Variantes próprias de um consumidor usam derive(nome, fn).
+
+Em páginas grandes (tiled_ops.should_tile: pôsteres A3, páginas duplas)
+bilateral / limiares adaptativos / NLMeans / CLAHE rodam em blocos num
+pool de threads.
+
+Uso:
+    page = PreparedPage(img_or_path)
+    th = page.get("otsu_inv")
+    boxes = find_boxes_multi(page)           # aceita PreparedPage
+    small = page.scaled(1 / 3)               # página reduzida, também memorizada
+"""
+
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from core_pipeline.api.pdf_renderer import load_image
+from core_pipeline.api import tiled_ops
+
+
+def _odd(value, minimum=3):
+    v = max(minimum, int(round(value)))
+    return v if v % 2 == 1 else v + 1
+
+
+def _adaptive(src, block, c, inv=False):
+    return tiled_ops.run_local(src, lambda t: cv2.adaptiveThreshold(
+        t, 255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY_INV if inv else cv2.THRESH_BINARY,
+        block, c,
+    ))
+
+
+def _nlmeans(src):
+    return tiled_ops.run_local(src, lambda t: cv2.fastNlMeansDenoising(
+        t, h=10, templateWindowSize=7, searchWindowSize=21
+    ))
+
+
+def _seg_binary(p):
+    block = p.block(31)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+    def fn(t):
+        bin_img = cv2.adaptiveThreshold(t, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                        cv2.THRESH_BINARY_INV, block, 5)
+        return cv2.morphologyEx(bin_img, cv2.MORPH_OPEN, kernel, iterations=1)
+
+    return tiled_ops.run_local(p.get("gray"), fn)
+
+
+VARIANTS = {
+    "gray": lambda p: cv2.cvtColor(p.image, cv2.COLOR_BGR2GRAY) if p.image.ndim == 3 else p.image,
+    "bgr": lambda p: p.image if p.image.ndim == 3 else cv2.cvtColor(p.image, cv2.COLOR_GRAY2BGR),
+    "bilateral": lambda p: tiled_ops.run_local(p.get("gray"), lambda t: cv2.bilateralFilter(t, 9, 75, 75)),
+    "adaptive_31_2": lambda p: _adaptive(p.get("bilateral"), p.block(31), 2),
+    "adaptive_inv_31_5": _seg_binary,
+    "blur_5": lambda p: cv2.GaussianBlur(p.get("gray"), (p.block(5), p.block(5)), 0),
+    "otsu_inv": lambda p: cv2.threshold(p.get("blur_5"), 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)[1],
+    "clahe": lambda p: tiled_ops.clahe(p.get("gray"), clip_limit=3.0, grid=(8, 8)),
+    "gray_nlmeans": lambda p: _nlmeans(p.get("gray")),
+    "clahe_nlmeans": lambda p: _nlmeans(p.get("clahe")),
+    "adaptive_31_5": lambda p: _adaptive(p.get("clahe_nlmeans"), p.block(31), 5),
+    "median_3": lambda p: cv2.medianBlur(p.get("gray"), 3),
+    "th_180": lambda p: cv2.threshold(p.get("median_3"), 180, 255, cv2.THRESH_BINARY)[1],
+}
+
+
+def is_prepared(obj) -> bool:
+    return isinstance(obj, PreparedPage)
+
+
+class PreparedPage:
+    """
+    Página decodificada uma vez + variantes memorizadas (thread-safe).
+    """
+
+    def __init__(self, image, scale=1.0):
+        # arrays entram como estão (BGR ou cinza); caminhos são decodificados
+        img = image if isinstance(image, np.ndarray) else load_image(image)
+        if img is None:
+            raise RuntimeError(f"Falha ao carregar imagem: {image}")
+        self.image = img
+        self.scale = scale
+        self.source = None if isinstance(image, np.ndarray) else str(image)
+        self._variants = {}
+        self._children = {}
+        self._seconds = {}
+        self.hits = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def wrap(cls, image, scale=1.0):
+        """
+        Reaproveita a PreparedPage recebida ou cria uma nova.
+        """
+        return image if isinstance(image, cls) else cls(image, scale=scale)
+
+    @property
+    def gray(self):
+        return self.get("gray")
+
+    @property
+    def bgr(self):
+        return self.get("bgr")
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def block(self, size_300dpi):
+        return _odd(size_300dpi * self.scale)
+
+    def get(self, name):
+        """
+        Variante nomeada (ver VARIANTS), calculada na primeira chamada.
+        """
+        fn = VARIANTS.get(name)
+        if fn is None:
+            raise KeyError(f"Variante desconhecida: {name}")
+        return self.derive(name, fn)
+
+    def derive(self, name, fn):
+        """
+        Variante própria do consumidor: fn(page) → np.ndarray, memorizada em name.
+        """
+        with self._lock:
+            if name in self._variants:
+                self.hits += 1
+                return self._variants[name]
+            t0 = time.perf_counter()
+            out = fn(self)
+            self._variants[name] = out
+            self._seconds[name] = round(time.perf_counter() - t0, 4)
+            return out
+
+    def scaled(self, scale):
+        """
+        Página reduzida/ampliada (relativa a esta), com as próprias variantes.
+        """
+        with self._lock:
+            child = self._children.get(scale)
+            if child is None:
+                interp = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+                small = cv2.resize(self.gray, None, fx=scale, fy=scale, interpolation=interp)
+                child = PreparedPage(small, scale=self.scale * scale)
+                self._children[scale] = child
+            return child
+
+    def release(self, *names):
+        """
+        Libera variantes que não serão mais usadas (memória da página).
+        """
+        with self._lock:
+            for name in names:
+                self._variants.pop(name, None)
+
+    def stats(self) -> dict:
+        return {"computed": dict(self._seconds), "hits": self.hits}
@@ -0,0 +1,159 @@
+"""
+Garimpo ML – Armazém de páginas do job (sem perda)
+--------------------------------------------------
+As etapas internas (OCR, segmentação, pré-processamento, recorte) não
+precisam de JPG: cada gravação em q95 perde qualidade (principalmente nas
+imagens binarizadas) e cada leitura paga a decodificação.
+
+O PageStore guarda páginas e intermediários como arrays uint8 em .npy
+(o cabeçalho do .npy já carrega shape/dtype), abertos via memory-map em
+microssegundos, sem decodificar. JPG fica só para os artefatos servidos
+ao navegador (pages_jpg, recortes).
+
+No modo streaming com renderização em memória (GARIMPO_PAGE_STORE=1,
+padrão), cada página renderizada vai para o armazém e as etapas seguintes
+recebem o caminho do .npy (load_image abre via mmap): worker de OCR,
+impressão digital da página e recorte das imagens dos produtos. Cada
+página A4 a 300 DPI ocupa ~26 MB em BGR; o job chama clear() ao terminar.
+
+Layout em disco (por job):
+    <job>/outputs/page_store/page_05.npy
+    <job>/outputs/page_store/page_05_prep.npy
+    <job>/outputs/page_store/index.json   (shape, dtype e origem de cada item)
+"""
+
+import os
+import json
+import shutil
+import threading
+
+import numpy as np
+
+
+PAGE_STORE_DIRNAME = "page_store"
+PAGE_STORE_ENABLED = os.environ.get("GARIMPO_PAGE_STORE", "1") == "1"
+
+
+def page_name(page_number, variant=None) -> str:
+    """
+    Nome padrão de uma página (ou intermediário) no armazém:
+        page_name(5) → "page_05", page_name(5, "prep") → "page_05_prep"
+    """
+    name = f"page_{int(page_number):02d}"
+    return f"{name}_{variant}" if variant else name
+
+
+class PageStore:
+    """
+    Páginas decodificadas do job, gravadas uma vez e lidas via mmap.
+
+    Uso:
+        store = PageStore(outputs_dir / "page_store")
+        store.put("page_05", img)                 # np.ndarray uint8
+        img = store.get("page_05")                # np.memmap somente leitura
+        store.export_jpg("page_05", "pages_jpg/page_05.jpg")
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    # -----------------------------
+    # Caminhos e índice
+    # -----------------------------
+    def path_for(self, name) -> str:
+        return os.path.join(self.root, f"{name}.npy")
+
+    def _index_path(self) -> str:
+        return os.path.join(self.root, "index.json")
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self._index_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_index(self, name, entry):
+        with self._lock:
+            index = self._read_index()
+            if entry is None:
+                index.pop(name, None)
+            else:
+                index[name] = entry
+            tmp = self._index_path() + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp, self._index_path())
+
+    # -----------------------------
+    # Operações
+    # -----------------------------
+    def has(self, name) -> bool:
+        return os.path.exists(self.path_for(name))
+
+    def put(self, name, img, source=None) -> str:
+        """
+        Grava o array (sem perda) e registra shape/dtype no índice.
+        Escrita atômica: leitores nunca veem um .npy pela metade.
+        """
+        arr = np.ascontiguousarray(img)
+        if arr.dtype != np.uint8:
+            raise ValueError(f"PageStore aceita apenas uint8 (recebido {arr.dtype})")
+
+        path = self.path_for(name)
+        tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp, "wb") as f:
+            np.save(f, arr, allow_pickle=False)
+        os.replace(tmp, path)
+
+        self._update_index(name, {
+            "shape": list(arr.shape),
+            "dtype": str(arr.dtype),
+            "source": source,
+        })
+        return path
+
+    def get(self, name, mmap=True):
+        """
+        Abre a página. mmap=True → np.memmap somente leitura (sem cópia);
+        mmap=False → array em memória, gravável. None se não existir.
+        """
+        path = self.path_for(name)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+
+    def meta(self, name):
+        """
+        shape/dtype/source registrados para o item (ou None).
+        """
+        return self._read_index().get(name)
+
+    def names(self):
+        return sorted(self._read_index())
+
+    def remove(self, name):
+        path = self.path_for(name)
+        if os.path.exists(path):
+            os.remove(path)
+        self._update_index(name, None)
+
+    def export_jpg(self, name, output_path, quality=95):
+        """
+        Gera o JPG de um item (apenas para artefatos servidos ao navegador).
+        """
+        from core_pipeline.api.pdf_renderer import save_page_jpg
+
+        img = self.get(name)
+        if img is None:
+            raise KeyError(f"Página não encontrada no PageStore: {name}")
+        return save_page_jpg(np.asarray(img), output_path, quality=quality)
+
+    def clear(self):
+        """
+        Remove o armazém inteiro (fim do job).
+        """
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
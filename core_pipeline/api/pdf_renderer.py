@@ -0,0 +1,374 @@
+"""
+Garimpo ML – Renderização de PDF em memória
+-------------------------------------------
+Renderiza páginas do PDF diretamente para arrays numpy (BGR ou cinza),
+sem passar por JPG em disco. Os estágios seguintes (OCR, segmentação,
+pré-processamento, recorte) aceitam o array no lugar do caminho da imagem.
+
+Backends (GARIMPO_RENDER_BACKEND):
+    - "pdfium"    → pypdfium2 (opcional)
+    - "fitz"      → PyMuPDF (opcional)
+    - "pdftoppm"  → Poppler via subprocesso (sempre disponível)
+    - "auto"      → pdfium, depois fitz, depois pdftoppm
+
+JPG só é gravado quando explicitamente pedido (save_page_jpg).
+"""
+
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # backend opcional
+    pdfium = None
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # backend opcional
+    fitz = None
+
+from core_pipeline.api.page_cache import replace_with
+from core_pipeline.api.pdf_to_jpg_converter import _find_pdftoppm, _get_page_count
+
+
+RENDER_BACKEND = os.environ.get("GARIMPO_RENDER_BACKEND", "auto")
+
+
+# =========================================================
+# 🔹 Backends
+# =========================================================
+class _PdfiumDocument:
+    name = "pdfium"
+
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self._doc = pdfium.PdfDocument(pdf_path)
+        self.page_count = len(self._doc)
+
+    def render_page(self, page_number, dpi=300, grayscale=False):
+        page = self._doc[page_number - 1]
+        try:
+            bitmap = page.render(scale=dpi / 72.0, grayscale=grayscale)
+            arr = bitmap.to_numpy()
+        finally:
+            page.close()
+
+        if grayscale:
+            return np.ascontiguousarray(arr if arr.ndim == 2 else arr[:, :, 0])
+        # pdfium entrega BGR(A); descarta alfa se existir
+        return np.ascontiguousarray(arr[:, :, :3])
+
+    def page_size(self, page_number):
+        return tuple(self._doc[page_number - 1].get_size())
+
+    def render_region(self, page_number, rect_pt, dpi=300, grayscale=False):
+        page = self._doc[page_number - 1]
+        try:
+            pw, ph = page.get_size()
+            x0, y0, x1, y1 = rect_pt
+            # crop do pdfium = quanto cortar de cada borda (left, bottom, right, top)
+            crop = (x0, ph - y1, pw - x1, y0)
+            bitmap = page.render(scale=dpi / 72.0, crop=crop, grayscale=grayscale)
+            arr = bitmap.to_numpy()
+        finally:
+            page.close()
+
+        if grayscale:
+            return np.ascontiguousarray(arr if arr.ndim == 2 else arr[:, :, 0])
+        return np.ascontiguousarray(arr[:, :, :3])
+
+    def close(self):
+        self._doc.close()
+
+
+class _FitzDocument:
+    name = "fitz"
+
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self._doc = fitz.open(pdf_path)
+        self.page_count = self._doc.page_count
+
+    def render_page(self, page_number, dpi=300, grayscale=False):
+        page = self._doc[page_number - 1]
+        cs = fitz.csGRAY if grayscale else fitz.csRGB
+        pix = page.get_pixmap(dpi=dpi, colorspace=cs, alpha=False)
+        arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+        if grayscale:
+            return arr[:, :, 0].copy()
+        return cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+
+    def page_size(self, page_number):
+        rect = self._doc[page_number - 1].rect
+        return (rect.width, rect.height)
+
+    def render_region(self, page_number, rect_pt, dpi=300, grayscale=False):
+        page = self._doc[page_number - 1]
+        cs = fitz.csGRAY if grayscale else fitz.csRGB
+        pix = page.get_pixmap(dpi=dpi, colorspace=cs, alpha=False, clip=fitz.Rect(*rect_pt))
+        arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+
+        if grayscale:
+            return arr[:, :, 0].copy()
+        return cv2.cvtColor(arr, cv2.COLOR_RGB2BGR)
+
+    def close(self):
+        self._doc.close()
+
+
+class _PdftoppmDocument:
+    """
+    Fallback via Poppler: renderiza cada página para PPM/PGM temporário
+    (sem perda, sem JPG) e devolve o array.
+    """
+    name = "pdftoppm"
+
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self.page_count = _get_page_count(pdf_path)
+        self._bin = _find_pdftoppm()
+
+    def render_page(self, page_number, dpi=300, grayscale=False):
+        return self._render(page_number, dpi, grayscale)
+
+    def page_size(self, page_number):
+        return None
+
+    def render_region(self, page_number, rect_pt, dpi=300, grayscale=False):
+        # -x/-y/-W/-H: recorte em pixels na resolução de renderização
+        s = dpi / 72.0
+        x0, y0, x1, y1 = rect_pt
+        crop = [
+            "-x", str(int(x0 * s)),
+            "-y", str(int(y0 * s)),
+            "-W", str(max(1, int((x1 - x0) * s))),
+            "-H", str(max(1, int((y1 - y0) * s))),
+        ]
+        return self._render(page_number, dpi, grayscale, crop)
+
+    def _render(self, page_number, dpi, grayscale, extra=None):
+        with tempfile.TemporaryDirectory(prefix="garimpo_render_") as tmp:
+            prefix = os.path.join(tmp, "page")
+            cmd = [self._bin]
+            if grayscale:
+                cmd.append("-gray")
+            cmd += [
+                "-r", str(dpi),
+                "-f", str(page_number),
+                "-l", str(page_number),
+                "-singlefile",
+            ]
+            cmd += extra or []
+            cmd += [self.pdf_path, prefix]
+            subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+            ext = ".pgm" if grayscale else ".ppm"
+            flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+            img = cv2.imread(prefix + ext, flag)
+
+        if img is None:
+            raise RuntimeError(f"pdftoppm não gerou a página {page_number}")
+        return img
+
+    def close(self):
+        pass
+
+
+_BACKENDS = {
+    "pdfium": (_PdfiumDocument, lambda: pdfium is not None),
+    "fitz": (_FitzDocument, lambda: fitz is not None),
+    "pdftoppm": (_PdftoppmDocument, lambda: True),
+}
+
+
+def available_backends():
+    """
+    Lista os backends instalados, em ordem de preferência.
+    """
+    return [name for name, (_, ok) in _BACKENDS.items() if ok()]
+
+
+def has_inprocess_backend():
+    """
+    True se pypdfium2 ou PyMuPDF estiverem disponíveis.
+    """
+    return pdfium is not None or fitz is not None
+
+
+# =========================================================
+# 🔹 API pública
+# =========================================================
+class PdfDocument:
+    """
+    Documento PDF aberto uma vez e renderizado página a página em memória.
+
+    Uso:
+        with PdfDocument(pdf_path) as doc:
+            for n in range(1, doc.page_count + 1):
+                img = doc.render_page(n, dpi=300)   # np.ndarray BGR
+    """
+
+    def __init__(self, pdf_path, backend=None):
+        backend = backend or RENDER_BACKEND
+        if backend == "auto":
+            backend = available_backends()[0]
+
+        if backend not in _BACKENDS:
+            raise ValueError(f"Backend de renderização desconhecido: {backend}")
+
+        cls, ok = _BACKENDS[backend]
+        if not ok():
+            raise RuntimeError(f"Backend de renderização não instalado: {backend}")
+
+        self._impl = cls(str(pdf_path))
+        self.backend = backend
+        self.pdf_path = str(pdf_path)
+        self.page_count = self._impl.page_count
+
+    def render_page(self, page_number, dpi=300, grayscale=False):
+        """
+        Renderiza a página (1-based) e devolve np.ndarray uint8
+        (H, W, 3) BGR ou (H, W) cinza.
+        """
+        if page_number < 1 or page_number > self.page_count:
+            raise IndexError(f"Página fora do intervalo: {page_number}/{self.page_count}")
+        return self._impl.render_page(page_number, dpi=dpi, grayscale=grayscale)
+
+    def render_region(self, page_number, bbox, dpi=300, bbox_dpi=None, grayscale=False):
+        """
+        Renderiza só o retângulo bbox = [x1, y1, x2, y2] da página.
+        bbox está em pixels na resolução bbox_dpi (padrão: a própria dpi);
+        o recorte é renderizado em dpi. Usado para detectar o layout em
+        baixa resolução e re-renderizar só as regiões de produto em alta.
+        """
+        if page_number < 1 or page_number > self.page_count:
+            raise IndexError(f"Página fora do intervalo: {page_number}/{self.page_count}")
+
+        to_pt = 72.0 / (bbox_dpi or dpi)
+        x0, y0, x1, y1 = [float(v) * to_pt for v in bbox]
+
+        size = self._impl.page_size(page_number)
+        if size is not None:
+            pw, ph = size
+            x0, x1 = max(0.0, min(x0, pw)), max(0.0, min(x1, pw))
+            y0, y1 = max(0.0, min(y0, ph)), max(0.0, min(y1, ph))
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError(f"Região vazia: {bbox}")
+
+        return self._impl.render_region(page_number, (x0, y0, x1, y1), dpi=dpi, grayscale=grayscale)
+
+    def close(self):
+        self._impl.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PagePrefetcher:
+    """
+    Serve páginas em ordem enquanto renderiza as próximas `depth` em
+    segundo plano (uma única thread de renderização, então o documento
+    nunca é usado por duas threads ao mesmo tempo).
+
+    Uso:
+        with PdfDocument(pdf_path) as doc, \
+             PagePrefetcher(lambda n: doc.render_page(n, dpi=200),
+                            range(1, doc.page_count + 1)) as pages:
+            for page_number, img in pages:
+                ...  # OCR da página atual; as próximas já estão renderizando
+    """
+
+    def __init__(self, render_fn, page_numbers, depth=2):
+        self._render_fn = render_fn
+        self._pages = list(page_numbers)
+        self._depth = max(0, int(depth))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="garimpo_prefetch")
+        self._futures = {}
+
+    def _schedule(self, idx):
+        if idx < len(self._pages) and idx not in self._futures:
+            self._futures[idx] = self._executor.submit(self._render_fn, self._pages[idx])
+
+    def __iter__(self):
+        for idx, page_number in enumerate(self._pages):
+            for ahead in range(idx, idx + self._depth + 1):
+                self._schedule(ahead)
+            future = self._futures.pop(idx)
+            yield page_number, future.result()
+
+    def close(self):
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_image(src, grayscale=False):
+    """
+    Normaliza a entrada dos estágios: aceita caminho (str/Path) ou np.ndarray.
+    Caminhos .npy (PageStore) são abertos via memory-map, sem decodificar.
+    Uma PreparedPage (page_prep) devolve o cinza / BGR já memorizado.
+    Retorna np.ndarray (BGR ou cinza) ou None se não for possível carregar.
+    """
+    if hasattr(src, "derive") and hasattr(src, "gray"):
+        return src.gray if grayscale else src.bgr
+
+    if not isinstance(src, np.ndarray) and str(src).lower().endswith(".npy"):
+        try:
+            src = np.load(str(src), mmap_mode="r", allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+
+    if isinstance(src, np.ndarray):
+        if grayscale and src.ndim == 3:
+            return cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
+        if not grayscale and src.ndim == 2:
+            return cv2.cvtColor(src, cv2.COLOR_GRAY2BGR)
+        return src
+
+    flag = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    return cv2.imread(str(src), flag)
+
+
+def save_image(img, output_path, quality=95):
+    """
+    Grava a imagem conforme a extensão: .npy e .png sem perda (uso interno
+    do pipeline), demais formatos via OpenCV (JPG em `quality`).
+    Escreve num temporário e substitui output_path (ver page_cache).
+    """
+    ext = os.path.splitext(str(output_path))[1].lower()
+
+    def write(tmp):
+        if ext == ".npy":
+            np.save(tmp, np.ascontiguousarray(img), allow_pickle=False)
+            return True
+        if ext == ".png":
+            return cv2.imwrite(tmp, img, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        return cv2.imwrite(tmp, img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+
+    return replace_with(output_path, write)
+
+
+def save_page_jpg(img, output_path, quality=95):
+    """
+    Grava o array como JPG (artefato de depuração ou servido ao navegador).
+    O arquivo pode ser hardlink do cache de páginas: nunca grava por cima.
+    """
+    return replace_with(
+        output_path, lambda tmp: cv2.imwrite(tmp, img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    )
@@ -0,0 +1,163 @@
+"""
+Garimpo ML – Camada de texto nativa do PDF
+------------------------------------------
+Catálogos exportados de ferramentas de design já trazem texto com posição.
+Este módulo lê as palavras + bbox direto do PDF e devolve tokens no mesmo
+formato do OCR (run_ocr / ocr_page_processor), em pixels da resolução de
+renderização. O OCR só precisa rodar nas páginas sem texto utilizável.
+
+Backends (opcionais): PyMuPDF (fitz) ou pdfplumber.
+Sem nenhum deles, extract_page_tokens retorna None e o OCR segue normal.
+
+Formato do token:
+    {
+        "text": str,
+        "conf": 100,
+        "bbox": [x1, y1, x2, y2],
+        "left": int, "top": int, "width": int, "height": int,
+        "source": "pdf_text"
+    }
+"""
+
+import re
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # backend opcional
+    fitz = None
+
+try:
+    import pdfplumber
+except ImportError:  # backend opcional
+    pdfplumber = None
+
+
+# Critérios mínimos para considerar a camada de texto "utilizável"
+MIN_WORDS = 10
+MAX_BAD_CHAR_RATIO = 0.10
+MIN_ALNUM_RATIO = 0.50
+
+# Glifos sem mapeamento Unicode (fontes CID/Type3) aparecem assim
+_RE_BAD = re.compile(r"\(cid:\d+\)|�|[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _make_token(text, x1, y1, x2, y2, scale):
+    x1, y1 = int(round(x1 * scale)), int(round(y1 * scale))
+    x2, y2 = int(round(x2 * scale)), int(round(y2 * scale))
+    return {
+        "text": text,
+        "conf": 100,
+        "bbox": [x1, y1, x2, y2],
+        "left": x1,
+        "top": y1,
+        "width": x2 - x1,
+        "height": y2 - y1,
+        "source": "pdf_text",
+    }
+
+
+def is_text_layer_usable(tokens) -> bool:
+    """
+    Decide se os tokens nativos bastam para dispensar o OCR da página:
+    quantidade mínima de palavras, poucos glifos sem mapeamento e
+    maioria de caracteres alfanuméricos.
+    """
+    if not tokens or len(tokens) < MIN_WORDS:
+        return False
+
+    joined = "".join(t["text"] for t in tokens)
+    if not joined:
+        return False
+
+    bad = sum(len(m.group(0)) for m in _RE_BAD.finditer(joined))
+    if bad / len(joined) > MAX_BAD_CHAR_RATIO:
+        return False
+
+    alnum = sum(1 for ch in joined if ch.isalnum())
+    return alnum / len(joined) >= MIN_ALNUM_RATIO
+
+
+class PdfTextLayer:
+    """
+    Documento aberto uma vez para leitura da camada de texto por página.
+
+    Uso:
+        with PdfTextLayer(pdf_path) as layer:
+            tokens = layer.usable_page_tokens(5, dpi=300)  # None → precisa OCR
+    """
+
+    def __init__(self, pdf_path):
+        self.pdf_path = str(pdf_path)
+        self.backend = None
+        self._doc = None
+
+        try:
+            if fitz is not None:
+                self._doc = fitz.open(self.pdf_path)
+                self.backend = "fitz"
+            elif pdfplumber is not None:
+                self._doc = pdfplumber.open(self.pdf_path)
+                self.backend = "pdfplumber"
+        except Exception:
+            self._doc = None
+            self.backend = None
+
+    @property
+    def available(self) -> bool:
+        return self._doc is not None
+
+    def extract_page_tokens(self, page_number, dpi=300):
+        """
+        Extrai as palavras da página (1-based) com bbox em pixels no dpi dado.
+        Retorna lista de tokens ou None se não houver backend.
+        """
+        if self._doc is None:
+            return None
+
+        scale = dpi / 72.0
+        tokens = []
+
+        if self.backend == "fitz":
+            page = self._doc[page_number - 1]
+            rot = page.rotation_matrix if page.rotation else None
+            for w in page.get_text("words"):
+                text = (w[4] or "").strip()
+                if not text:
+                    continue
+                rect = fitz.Rect(w[:4])
+                if rot is not None:
+                    rect = rect * rot
+                tokens.append(_make_token(text, rect.x0, rect.y0, rect.x1, rect.y1, scale))
+        else:
+            page = self._doc.pages[page_number - 1]
+            for w in page.extract_words(keep_blank_chars=False, use_text_flow=False):
+                text = (w.get("text") or "").strip()
+                if not text:
+                    continue
+                tokens.append(_make_token(text, w["x0"], w["top"], w["x1"], w["bottom"], scale))
+
+        # Ordem de leitura aproximada (top → bottom, left → right)
+        tokens.sort(key=lambda t: (t["top"], t["left"]))
+        return tokens
+
+    def usable_page_tokens(self, page_number, dpi=300):
+        """
+        Tokens nativos da página se a camada de texto for utilizável,
+        senão None (a página deve seguir para o OCR).
+        """
+        try:
+            tokens = self.extract_page_tokens(page_number, dpi=dpi)
+        except Exception:
+            return None
+        return tokens if is_text_layer_usable(tokens) else None
+
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
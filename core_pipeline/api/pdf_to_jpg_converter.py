@@ -1,7 +1,15 @@
 import os
+import re
 import subprocess
 import glob
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from core_pipeline.api.page_cache import PageCache, PAGE_CACHE_ENABLED, temp_sibling
+
+
+# Identificador do renderer nas chaves do cache de páginas
+CACHE_RENDERER = "pdftoppm-jpeg"
 
 
 def _find_pdftoppm() -> str | None:
@@ -21,10 +29,187 @@ def _find_pdftoppm() -> str | None:
     return "pdftoppm"
 
 
-def convert_pdf_to_jpg(pdf_path, output_dir, dpi=300):
+def _get_page_count(pdf_path) -> int:
+    """
+    Obtém o número de páginas do PDF via pdfinfo (Poppler).
+    Retorna 0 se não for possível determinar.
+    """
+    try:
+        raw = subprocess.check_output(
+            ["pdfinfo", pdf_path], stderr=subprocess.PIPE
+        ).decode("utf-8", errors="ignore")
+    except Exception:
+        return 0
+
+    for line in raw.split("\n"):
+        if line.startswith("Pages:"):
+            try:
+                return int(line.split(":")[1].strip())
+            except ValueError:
+                return 0
+    return 0
+
+
+def _split_page_ranges(pages, n_chunks):
+    """
+    Divide a lista ordenada de páginas em até n_chunks fatias de tamanho
+    parecido e converte cada fatia em intervalos contíguos (first, last).
+    """
+    pages = sorted(pages)
+    if not pages:
+        return []
+
+    n_chunks = max(1, min(n_chunks, len(pages)))
+    base, extra = divmod(len(pages), n_chunks)
+
+    ranges = []
+    start = 0
+    for i in range(n_chunks):
+        size = base + (1 if i < extra else 0)
+        chunk = pages[start:start + size]
+        start += size
+
+        first = prev = chunk[0]
+        for n in chunk[1:]:
+            if n != prev + 1:
+                ranges.append((first, prev))
+                first = n
+            prev = n
+        ranges.append((first, prev))
+    return ranges
+
+
+def _run_pdftoppm(pdftoppm_bin, pdf_path, prefix, dpi, first=None, last=None):
+    """
+    Executa um pdftoppm (opcionalmente restrito ao intervalo -f/-l).
+    Retorna o CompletedProcess.
+    """
+    # -jpeg -> gera JPG
+    # -r <dpi> -> resolução
+    # -f/-l -> primeira/última página do intervalo
+    cmd = [pdftoppm_bin, "-jpeg", "-r", str(dpi)]
+    if first is not None and last is not None:
+        cmd += ["-f", str(first), "-l", str(last)]
+    cmd += [pdf_path, prefix]
+
+    return subprocess.run(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+def _render_ranges(pdftoppm_bin, pdf_path, prefix, dpi, ranges, workers):
+    """
+    Renderiza os intervalos (first, last), até `workers` pdftoppm simultâneos.
+    Cada pdftoppm já é um processo separado; as threads apenas
+    supervisionam os subprocessos. Retorna mensagem de erro ou None.
+    """
+    if not ranges:
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ranges)))) as pool:
+        procs = list(pool.map(
+            lambda r: _run_pdftoppm(pdftoppm_bin, pdf_path, prefix, dpi, r[0], r[1]),
+            ranges,
+        ))
+
+    for (first, last), proc in zip(ranges, procs):
+        if proc.returncode != 0:
+            return f"pdftoppm falhou (páginas {first}-{last}): {proc.stderr.strip()}"
+    return None
+
+
+def _page_number_from_raw(fpath) -> int:
+    """
+    Extrai o número da página de page-7.jpg / page-07.jpg / page-007.jpg.
+    """
+    m = re.search(r"-(\d+)\.jpg$", os.path.basename(fpath))
+    return int(m.group(1)) if m else 0
+
+
+def render_pdf_page(pdf_path, page_number, output_path, dpi=300, cache=None):
+    """
+    Renderiza uma única página do PDF para output_path (JPG) via pdftoppm.
+    Com cache (PageCache), reaproveita a página se já estiver renderizada.
+
+    Retorno:
+        {
+          "status": "success" | "error",
+          "page": int,
+          "output_path": str,
+          "error": str | None
+        }
+    """
+    result = {
+        "status": "error",
+        "page": page_number,
+        "output_path": output_path,
+        "error": None,
+    }
+
+    try:
+        key = None
+        if cache is not None:
+            key = cache.key(pdf_path, page_number, dpi, CACHE_RENDERER)
+            if cache.fetch(key, output_path):
+                result["status"] = "success"
+                return result
+
+        out_dir = os.path.dirname(output_path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+
+        # -singlefile -> grava <prefix>.jpg sem sufixo de página. Renderiza
+        # num temporário: output_path pode ser hardlink de outra entrada do
+        # cache e não pode ser truncado.
+        rendered = temp_sibling(os.path.splitext(output_path)[0] + ".jpg")
+        prefix = os.path.splitext(rendered)[0]
+        cmd = [
+            _find_pdftoppm(),
+            "-jpeg",
+            "-r", str(dpi),
+            "-f", str(page_number),
+            "-l", str(page_number),
+            "-singlefile",
+            pdf_path,
+            prefix,
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            if os.path.exists(rendered):
+                os.remove(rendered)
+            result["error"] = f"pdftoppm falhou (página {page_number}): {proc.stderr.strip()}"
+            return result
+
+        os.replace(rendered, output_path)
+
+        if key is not None:
+            cache.store(key, output_path)
+
+        result["status"] = "success"
+        return result
+
+    except Exception as e:
+        result["error"] = f"{e}\n{traceback.format_exc()}"
+        return result
+
+
+def convert_pdf_to_jpg(pdf_path, output_dir, dpi=300, workers=1, cache=None):
     """
     Converte um PDF em páginas JPG numeradas usando diretamente o pdftoppm.
 
+    Com workers > 1 o documento é dividido em intervalos de páginas (-f/-l)
+    e cada intervalo é renderizado por um pdftoppm próprio, com até
+    `workers` processos simultâneos. A nomenclatura page_XX.jpg e o dict de
+    retorno são os mesmos do modo sequencial.
+
+    Cache de páginas (page_cache.PageCache): páginas já renderizadas para o
+    mesmo PDF (por conteúdo), DPI e renderer são reaproveitadas via hardlink;
+    só as páginas ausentes vão para o pdftoppm. cache=None usa o cache
+    padrão (se GARIMPO_PAGE_CACHE_ENABLED), cache=False desativa.
+
     Retorno:
         {
           "status": "success" | "error",
@@ -32,9 +217,14 @@ def convert_pdf_to_jpg(pdf_path, output_dir, dpi=300):
           "page_count": int,
           "output_dir": str,
           "pdf_path": str,
+          "cache": {"hits": int, "misses": int} | None,
           "error": str | None
         }
     """
+    if cache is None:
+        cache = PageCache() if PAGE_CACHE_ENABLED else None
+    elif cache is False:
+        cache = None
 
     result = {
         "status": "error",
@@ -42,6 +232,7 @@ def convert_pdf_to_jpg(pdf_path, output_dir, dpi=300):
         "page_count": 0,
         "output_dir": output_dir,
         "pdf_path": pdf_path,
+        "cache": None,
         "error": None,
     }
 
@@ -60,46 +251,66 @@ def convert_pdf_to_jpg(pdf_path, output_dir, dpi=300):
         # Prefixo dos arquivos gerados (pdftoppm cria page-1.jpg, page-2.jpg, ...)
         prefix = os.path.join(output_dir, "page")
 
-        # Chamada direta ao pdftoppm
-        # -jpeg -> gera JPG
-        # -r <dpi> -> resolução
-        cmd = [
-            pdftoppm_bin,
-            "-jpeg",
-            "-r",
-            str(dpi),
-            pdf_path,
-            prefix,
-        ]
+        workers = max(1, workers or 1)
+        need_count = workers > 1 or cache is not None
+        total_pages = _get_page_count(pdf_path) if need_count else 0
 
-        proc = subprocess.run(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+        done_pages = set()
+        keys = {}
+        if cache is not None and total_pages > 0:
+            # Reaproveita páginas já renderizadas (hardlink a partir do cache)
+            for n in range(1, total_pages + 1):
+                keys[n] = cache.key(pdf_path, n, dpi, CACHE_RENDERER)
+                if cache.fetch(keys[n], os.path.join(output_dir, f"page_{n:02d}.jpg")):
+                    done_pages.add(n)
+            missing = [n for n in range(1, total_pages + 1) if n not in done_pages]
+            result["cache"] = {"hits": len(done_pages), "misses": len(missing)}
+        else:
+            missing = list(range(1, total_pages + 1))
 
-        if proc.returncode != 0:
-            # Erro real na conversão
-            result["error"] = f"pdftoppm falhou: {proc.stderr.strip()}"
-            return result
+        if total_pages > 1 or keys:
+            # Um pdftoppm por intervalo de páginas (paralelo se workers > 1)
+            ranges = _split_page_ranges(missing, workers * 2 if workers > 1 else 1)
+            err = _render_ranges(pdftoppm_bin, pdf_path, prefix, dpi, ranges, workers)
+            if err:
+                result["error"] = err
+                return result
+        else:
+            # Chamada direta ao pdftoppm (documento inteiro)
+            proc = _run_pdftoppm(pdftoppm_bin, pdf_path, prefix, dpi)
+
+            if proc.returncode != 0:
+                # Erro real na conversão
+                result["error"] = f"pdftoppm falhou: {proc.stderr.strip()}"
+                return result
 
         # Avisos (ex: Syntax Warning: Invalid Font Weight) são ignorados.
         # Agora coletamos os arquivos gerados: page-1.jpg, page-2.jpg, ...
-        raw_files = sorted(glob.glob(os.path.join(output_dir, "page-*.jpg")))
+        raw_files = sorted(
+            glob.glob(os.path.join(output_dir, "page-*.jpg")),
+            key=_page_number_from_raw,
+        )
 
-        pages = []
-        for idx, fpath in enumerate(raw_files, start=1):
-            new_name = f"page_{idx:02d}.jpg"
-            new_path = os.path.join(output_dir, new_name)
+        for fpath in raw_files:
+            page_num = _page_number_from_raw(fpath)
+            new_path = os.path.join(output_dir, f"page_{page_num:02d}.jpg")
             # Renomeia para padronizar o nome esperado pelo pipeline
             os.replace(fpath, new_path)
-            pages.append(new_name)
+            done_pages.add(page_num)
+
+            if page_num in keys:
+                cache.store(keys[page_num], new_path)
+
+        pages = [f"page_{n:02d}.jpg" for n in sorted(done_pages)]
 
         if not pages:
             result["error"] = "Nenhuma página convertida pelo pdftoppm"
             return result
 
+        if cache is not None:
+            cache.evict()
+            cache.flush_stats()
+
         result["status"] = "success"
         result["pages"] = pages
         result["page_count"] = len(pages)
@@ -1,9 +1,111 @@
 import os
+import time
 import cv2
 import numpy as np
 import traceback
 
-def preprocess_image(input_path, output_path, apply_denoise=True, apply_clahe=True):
+from core_pipeline.api.pdf_renderer import save_image
+from core_pipeline.api.page_prep import PreparedPage, is_prepared
+from core_pipeline.api.tiled_ops import run_local
+
+# Remoção de ruído:
+#   "full" → fastNlMeans na página inteira (comportamento original, padrão)
+#   "auto" → estima o ruído e escolhe o nível (skip / median / bilateral / nlmeans);
+#            muda a saída, então cada job liga explicitamente
+#            (denoise_mode="auto" ou GARIMPO_DENOISE_MODE=auto)
+DENOISE_MODE = os.environ.get("GARIMPO_DENOISE_MODE", "full")
+
+# Limiares do desvio padrão estimado do ruído (níveis de cinza)
+NOISE_SKIP_SIGMA = float(os.environ.get("GARIMPO_NOISE_SKIP_SIGMA", "2.0"))
+NOISE_MEDIAN_SIGMA = float(os.environ.get("GARIMPO_NOISE_MEDIAN_SIGMA", "4.0"))
+NOISE_BILATERAL_SIGMA = float(os.environ.get("GARIMPO_NOISE_BILATERAL_SIGMA", "8.0"))
+
+# fastNlMeans do nível mais alto roda nesta escala (≈ 1/4 dos pixels)
+NLMEANS_SCALE = 0.5
+
+# Passo da subamostragem usada na estimativa (sem média: preserva o ruído)
+NOISE_SAMPLE_STEP = 2
+
+
+# =========================================================
+# 🔹 Estimativa de ruído e níveis de denoise
+# =========================================================
+def estimate_noise(gray, step=NOISE_SAMPLE_STEP) -> float:
+    """
+    Desvio padrão do ruído (níveis de cinza) pelo MAD do Laplaciano numa
+    subamostragem gray[::step, ::step]. Bordas de texto são esparsas e
+    quase não mexem na mediana; fundo limpo dá ≈ 0.
+    """
+    sub = np.ascontiguousarray(gray[::step, ::step])
+    # kernel [0 1 0; 1 -4 1; 0 1 0]: ruído σ → Laplaciano com desvio σ·√20
+    lap = cv2.Laplacian(sub, cv2.CV_32F, ksize=1)
+    mad = float(np.median(np.abs(lap - np.median(lap))))
+    return round(float(mad / 0.6745 / np.sqrt(20.0)), 3)
+
+
+def denoise_tier(sigma) -> str:
+    if sigma < NOISE_SKIP_SIGMA:
+        return "skip"
+    if sigma < NOISE_MEDIAN_SIGMA:
+        return "median"
+    if sigma < NOISE_BILATERAL_SIGMA:
+        return "bilateral"
+    return "nlmeans"
+
+
+def _nlmeans_downscaled(src, sigma):
+    h, w = src.shape[:2]
+    # dimensões pares: a redução 2× fica alinhada também nos blocos (tiled_ops)
+    padded = cv2.copyMakeBorder(src, 0, h % 2, 0, w % 2, cv2.BORDER_REPLICATE)
+    small = cv2.resize(padded, None, fx=NLMEANS_SCALE, fy=NLMEANS_SCALE, interpolation=cv2.INTER_AREA)
+    # a redução já média os pixels: o ruído cai ~na mesma proporção
+    strength = float(np.clip(sigma * NLMEANS_SCALE * 1.5, 3.0, 10.0))
+    small = cv2.fastNlMeansDenoising(small, h=strength, templateWindowSize=7, searchWindowSize=21)
+    return cv2.resize(small, padded.shape[1::-1], interpolation=cv2.INTER_LINEAR)[:h, :w]
+
+
+_TIERS = {
+    "median": lambda src, sigma: cv2.medianBlur(src, 3),
+    "bilateral": lambda src, sigma: cv2.bilateralFilter(src, 5, 4 * sigma, 5),
+    "nlmeans": _nlmeans_downscaled,
+}
+
+
+def _denoised_variant(page, base, mode):
+    """
+    (nome, imagem) da variante a binarizar (memorizada na página) +
+    registro do denoise.
+    """
+    info = {"mode": mode, "tier": None, "noise": None, "seconds": 0.0, "estimate_seconds": 0.0}
+
+    if mode == "full":
+        info["tier"] = "nlmeans_full"
+        t0 = time.perf_counter()
+        out = page.get(f"{base}_nlmeans")
+        info["seconds"] = round(time.perf_counter() - t0, 4)
+        return f"{base}_nlmeans", out, info
+
+    t0 = time.perf_counter()
+    sigma = page.derive(f"noise:{base}", lambda p: estimate_noise(p.get(base)))
+    info["estimate_seconds"] = round(time.perf_counter() - t0, 4)
+    info["noise"] = float(sigma)
+
+    tier = denoise_tier(sigma)
+    info["tier"] = tier
+    if tier == "skip":
+        return base, page.get(base), info
+
+    # nome próprio para o NLMeans em meia escala: "<base>_nlmeans" é a
+    # variante de página inteira do page_prep (modo "full")
+    name = f"{base}_nlmeans_half" if tier == "nlmeans" else f"{base}_{tier}"
+    t0 = time.perf_counter()
+    out = page.derive(name, lambda p: run_local(p.get(base), lambda t: _TIERS[tier](t, sigma)))
+    info["seconds"] = round(time.perf_counter() - t0, 4)
+    return name, out, info
+
+
+def preprocess_image(input_path, output_path, apply_denoise=True, apply_clahe=True,
+                     denoise_mode=None):
     """
     Pré-processamento padrão para páginas de catálogo.
 
@@ -11,67 +113,78 @@ def preprocess_image(input_path, output_path, apply_denoise=True, apply_clahe=Tr
         - carregamento seguro via OpenCV
         - conversão para escala de cinza
         - equalização adaptativa (CLAHE) opcional
-        - remoção de ruído (fastNlMeans) opcional
+        - remoção de ruído opcional: fastNlMeans na página inteira
+          (modo "full", padrão) ou proporcional ao ruído estimado
+          (modo "auto", opt-in)
+        - páginas muito grandes (A3, páginas duplas) processadas em blocos
+          num pool de threads (tiled_ops)
         - binarização adaptativa
         - normalização do tamanho (mantém resolução original)
-        - salvamento em JPG otimizado
+        - salvamento (somente se output_path for informado): .npy/.png sem
+          perda para uso interno, .jpg apenas para artefatos do navegador
 
     Args:
-        input_path (str): Caminho da imagem original (JPG).
-        output_path (str): Caminho da imagem pré-processada.
+        input_path (str | np.ndarray | PreparedPage): Caminho da imagem
+            original (JPG/.npy), página já renderizada em memória (BGR/cinza)
+            ou PreparedPage compartilhada com outras etapas (as variantes
+            clahe / nlmeans / adaptive_31_5 ficam memorizadas nela).
+        output_path (str | None): Caminho da imagem pré-processada.
+            None → não grava; a imagem volta em result["image"].
         apply_denoise (bool): Remove ruído com algoritmo rápido.
         apply_clahe   (bool): Equalização adaptativa de contraste.
+        denoise_mode  (str | None): "auto" | "full" (padrão DENOISE_MODE).
 
     Returns:
-        dict: resultado com status, paths e erro (se existir).
+        dict: resultado com status, paths, imagem processada, nível de
+        denoise escolhido ({"mode", "tier", "noise", "seconds",
+        "estimate_seconds"}) e erro (se existir).
     """
+    in_memory = isinstance(input_path, np.ndarray) or is_prepared(input_path)
 
     result = {
         "status": "error",
-        "input_path": input_path,
+        "input_path": None if in_memory else input_path,
         "output_path": output_path,
+        "image": None,
+        "denoise": None,
         "error": None
     }
 
     try:
-        if not os.path.exists(input_path):
+        if not in_memory and not os.path.exists(input_path):
             result["error"] = f"Arquivo de entrada não existe: {input_path}"
             return result
 
-        # ---- Carregar imagem ----
-        img = cv2.imread(input_path)
-        if img is None:
+        # ---- Carregar imagem (uma vez por página) ----
+        try:
+            page = PreparedPage.wrap(input_path)
+        except RuntimeError:
             result["error"] = f"Falha ao carregar imagem: {input_path}"
             return result
 
-        # ---- Converter para escala de cinza ----
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        # ---- Cinza → CLAHE → denoise → binarização adaptativa ----
+        name = "clahe" if apply_clahe else "gray"
+        src = page.get(name)
+        if apply_denoise:
+            name, src, result["denoise"] = _denoised_variant(page, name, denoise_mode or DENOISE_MODE)
 
-        # ---- Equalização adaptativa (CLAHE) ----
-        if apply_clahe:
-            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-            gray = clahe.apply(gray)
+        if name == "clahe_nlmeans":
+            processed = page.get("adaptive_31_5")
+        else:
+            processed = page.derive(
+                f"adaptive_31_5:{name}",
+                lambda p: run_local(src, lambda t: cv2.adaptiveThreshold(
+                    t, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                    cv2.THRESH_BINARY, p.block(31), 5
+                ))
+            )
 
-        # ---- Denoise (remoção de ruído) ----
-        if apply_denoise:
-            gray = cv2.fastNlMeansDenoising(gray, h=10, templateWindowSize=7, searchWindowSize=21)
-
-        # ---- Binarização adaptativa ----
-        processed = cv2.adaptiveThreshold(
-            gray,
-            255,
-            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY,
-            31,
-            5
-        )
-
-        # ---- Salvar output ----
-        out_dir = os.path.dirname(output_path)
-        os.makedirs(out_dir, exist_ok=True)
-        cv2.imwrite(output_path, processed, [cv2.IMWRITE_JPEG_QUALITY, 95])
+        # ---- Salvar output (opcional) ----
+        if output_path:
+            save_image(processed, output_path, quality=95)
 
         result["status"] = "success"
+        result["image"] = processed
         return result
 
     except Exception as e:
@@ -1,6 +1,9 @@
 import os
 import traceback
 import cv2
+import numpy as np
+
+from core_pipeline.api.pdf_renderer import load_image
 
 
 def _safe_crop(img, x1, y1, x2, y2):
@@ -29,30 +32,34 @@ def crop_product_from_page(
     Recorta um produto da página usando seu bounding box.
 
     Args:
-        image_path (str): caminho da imagem completa da página.
+        image_path (str | np.ndarray): caminho da imagem completa da página
+            ou a página já renderizada em memória.
         bbox (list): [x1, y1, x2, y2] do produto.
-        output_path (str): caminho onde o recorte será salvo.
+        output_path (str | None): caminho onde o recorte será salvo.
+            None → não grava; o recorte volta em result["crop"].
         margin_ratio (float): margem percentual para expandir o recorte.
 
     Returns:
-        dict: status, bbox_final, output_path, erro.
+        dict: status, bbox_final, output_path, crop, erro.
     """
+    in_memory = isinstance(image_path, np.ndarray)
 
     result = {
         "status": "error",
-        "image_path": image_path,
+        "image_path": None if in_memory else image_path,
         "bbox_input": bbox,
         "bbox_final": None,
         "output_path": output_path,
+        "crop": None,
         "error": None
     }
 
     try:
-        if not os.path.exists(image_path):
+        if not in_memory and not os.path.exists(image_path):
             result["error"] = f"Imagem da página não encontrada: {image_path}"
             return result
 
-        img = cv2.imread(image_path)
+        img = load_image(image_path)
         if img is None:
             result["error"] = f"Falha ao carregar imagem: {image_path}"
             return result
@@ -79,15 +86,17 @@ def crop_product_from_page(
             result["error"] = "BBox inválido após aplicação de margem."
             return result
 
-        # Garante diretório de saída
-        out_dir = os.path.dirname(output_path)
-        if out_dir:
-            os.makedirs(out_dir, exist_ok=True)
+        if output_path:
+            # Garante diretório de saída
+            out_dir = os.path.dirname(output_path)
+            if out_dir:
+                os.makedirs(out_dir, exist_ok=True)
 
-        cv2.imwrite(output_path, crop, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            cv2.imwrite(output_path, crop, [cv2.IMWRITE_JPEG_QUALITY, 95])
 
         result["status"] = "success"
         result["bbox_final"] = [x1, y1, x2, y2]
+        result["crop"] = crop
         return result
 
     except Exception as e:
@@ -106,7 +115,8 @@ def crop_products_from_list(
     Efetua o crop de vários produtos de uma mesma página.
 
     Args:
-        image_path (str): caminho da página original.
+        image_path (str | np.ndarray): caminho da página original
+            ou a página já renderizada em memória.
         products (list): lista de dicts contendo:
           {
             "code": ...,
@@ -115,32 +125,35 @@ def crop_products_from_list(
             "bbox": [x1, y1, x2, y2],
             "block_id": ...
           }
-        output_dir (str): pasta onde os recortes serão salvos.
+        output_dir (str | None): pasta onde os recortes serão salvos.
+            None → não grava; cada item traz o recorte em "crop".
         margin_ratio (float): margem percentual.
 
     Returns:
         dict: status, items (detalhes por produto), erro.
     """
+    in_memory = isinstance(image_path, np.ndarray)
 
     result = {
         "status": "error",
-        "image_path": image_path,
+        "image_path": None if in_memory else image_path,
         "output_dir": output_dir,
         "items": [],
         "error": None
     }
 
     try:
-        if not os.path.exists(image_path):
+        if not in_memory and not os.path.exists(image_path):
             result["error"] = f"Imagem da página não encontrada: {image_path}"
             return result
 
-        img = cv2.imread(image_path)
+        img = load_image(image_path)
         if img is None:
             result["error"] = f"Falha ao carregar imagem: {image_path}"
             return result
 
-        os.makedirs(output_dir, exist_ok=True)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
 
         h, w = img.shape[:2]
 
@@ -163,16 +176,21 @@ def crop_products_from_list(
             if crop is None:
                 continue
 
-            filename = f"product_{idx:04d}.jpg"
-            out_path = os.path.join(output_dir, filename)
-
-            cv2.imwrite(out_path, crop, [cv2.IMWRITE_JPEG_QUALITY, 95])
-
-            result["items"].append({
+            item = {
                 "product_index": idx,
-                "output_path": out_path,
+                "output_path": None,
                 "bbox_final": [x1, y1, x2, y2]
-            })
+            }
+
+            if output_dir:
+                filename = f"product_{idx:04d}.jpg"
+                out_path = os.path.join(output_dir, filename)
+                cv2.imwrite(out_path, crop, [cv2.IMWRITE_JPEG_QUALITY, 95])
+                item["output_path"] = out_path
+            else:
+                item["crop"] = crop
+
+            result["items"].append(item)
 
         result["status"] = "success"
         return result
@@ -0,0 +1,263 @@
+"""
+Garimpo ML – OCR por regiões de interesse (ROI)
+-----------------------------------------------
+Em vez de rodar o OCR sobre a página inteira a 300 DPI (fotos, fundos,
+blocos de marketing), este módulo:
+
+    1. pega as caixas detectadas (find_boxes_multi ou
+       segment_page_into_blocks, ou caixas já calculadas);
+    2. empacota os recortes em mosaicos (prateleiras com faixa branca
+       entre eles), para UMA chamada de OCR por mosaico em vez de uma
+       por caixa;
+    3. roda o OCR (Tesseract ou PaddleOCR) no mosaico;
+    4. devolve cada palavra em coordenadas da página, descartando o que
+       cair fora de qualquer região.
+
+Formato do token (mesmo do restante do pipeline):
+    {
+        "text": str,
+        "conf": float,
+        "bbox": [x1, y1, x2, y2],
+        "left": int, "top": int, "width": int, "height": int,
+        "region": int,
+        "source": "roi_ocr"
+    }
+"""
+
+import os
+import traceback
+
+import numpy as np
+
+from core_pipeline.api.pdf_renderer import load_image
+from core_pipeline.api.ocr_cache import tesseract_image_to_data
+from core_pipeline.api.two_pass_render import detect_layout_boxes
+from core_pipeline.api.page_prep import is_prepared
+
+
+# Largura máxima do mosaico e altura máxima antes de abrir outro
+MOSAIC_MAX_WIDTH = int(os.environ.get("GARIMPO_ROI_MOSAIC_WIDTH", "2600"))
+MOSAIC_MAX_HEIGHT = int(os.environ.get("GARIMPO_ROI_MOSAIC_HEIGHT", "8000"))
+# Faixa branca entre recortes (evita que o OCR junte palavras vizinhas)
+MOSAIC_GAP = 40
+# Caixas menores que isso (px a 300 DPI) não têm texto legível
+MIN_REGION_SIDE = 24
+
+ROI_TESSERACT_CONFIG = "--oem 3 --psm 3"
+
+
+# =========================================================
+# 🔹 Mosaico
+# =========================================================
+def pack_mosaics(crops, max_width=MOSAIC_MAX_WIDTH, max_height=MOSAIC_MAX_HEIGHT, gap=MOSAIC_GAP):
+    """
+    Empacotamento em prateleiras (maiores alturas primeiro).
+
+    Args:
+        crops (list[np.ndarray]): recortes em cinza.
+
+    Returns:
+        list de mosaicos: [{"image": np.ndarray, "placements":
+            [(crop_idx, x, y, w, h), ...]}]
+    """
+    order = sorted(range(len(crops)), key=lambda i: crops[i].shape[0], reverse=True)
+
+    mosaics = []
+    placements = []
+    x = y = shelf_h = 0
+    width_used = 0
+
+    def flush():
+        if not placements:
+            return
+        height = y + shelf_h + gap
+        canvas = np.full((height, width_used + gap), 255, dtype=np.uint8)
+        for idx, px, py, w, h in placements:
+            canvas[py:py + h, px:px + w] = crops[idx]
+        mosaics.append({"image": canvas, "placements": list(placements)})
+
+    for idx in order:
+        h, w = crops[idx].shape[:2]
+        w_needed = w + gap
+
+        # Nova prateleira
+        if x > 0 and gap + x + w_needed > max_width:
+            y += shelf_h + gap
+            x, shelf_h = 0, 0
+
+        # Novo mosaico
+        if placements and y + gap + h > max_height:
+            flush()
+            placements = []
+            x = y = shelf_h = width_used = 0
+
+        px, py = gap + x, gap + y
+        placements.append((idx, px, py, w, h))
+        x += w_needed
+        shelf_h = max(shelf_h, h)
+        width_used = max(width_used, px + w)
+
+    flush()
+    return mosaics
+
+
+def _map_to_page(tokens, placements, boxes):
+    """
+    Converte tokens do mosaico para a página (pelo centro da palavra).
+    """
+    mapped = []
+    for tok in tokens:
+        x1, y1, x2, y2 = tok["bbox"]
+        cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+
+        for idx, px, py, w, h in placements:
+            if px <= cx < px + w and py <= cy < py + h:
+                bx, by = boxes[idx][0], boxes[idx][1]
+                # recorta a palavra aos limites da região
+                nx1 = max(x1, px) - px + bx
+                ny1 = max(y1, py) - py + by
+                nx2 = min(x2, px + w) - px + bx
+                ny2 = min(y2, py + h) - py + by
+                mapped.append({
+                    "text": tok["text"],
+                    "conf": tok["conf"],
+                    "bbox": [nx1, ny1, nx2, ny2],
+                    "left": nx1,
+                    "top": ny1,
+                    "width": nx2 - nx1,
+                    "height": ny2 - ny1,
+                    "region": idx,
+                    "source": "roi_ocr",
+                })
+                break
+    return mapped
+
+
+# =========================================================
+# 🔹 Motores
+# =========================================================
+def _ocr_tesseract(img, lang, config):
+    data = tesseract_image_to_data(img, lang=lang, config=config, variant="roi_mosaic")
+    tokens = []
+    for i in range(len(data["text"])):
+        text = (data["text"][i] or "").strip()
+        if not text:
+            continue
+        try:
+            conf = float(data["conf"][i])
+        except (TypeError, ValueError):
+            conf = -1.0
+        if conf < 0:
+            continue
+        x, y = int(data["left"][i]), int(data["top"][i])
+        w, h = int(data["width"][i]), int(data["height"][i])
+        tokens.append({"text": text, "conf": conf, "bbox": [x, y, x + w, y + h]})
+    return tokens
+
+
+def _ocr_paddle(img):
+    from core_pipeline.api.ocr_service import paddle_ocr_blocks
+
+    tokens = []
+    for block in paddle_ocr_blocks(img)["blocks"]:
+        xs = [p[0] for p in block["bbox"]]
+        ys = [p[1] for p in block["bbox"]]
+        tokens.append({
+            "text": block["text"],
+            "conf": round(float(block.get("conf", 1.0)) * 100, 2),
+            "bbox": [int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))],
+        })
+    return tokens
+
+
+# =========================================================
+# 🔹 API
+# =========================================================
+def roi_ocr_page(image, boxes=None, detector="line_segmenter", engine="tesseract",
+                 lang="por", config=ROI_TESSERACT_CONFIG, preprocess=None, padding=6):
+    """
+    OCR apenas das regiões de produto da página.
+
+    Args:
+        image (str | np.ndarray | PreparedPage): página a 300 DPI; com
+            PreparedPage o detector reaproveita as variantes memorizadas.
+        boxes (list | None): caixas [x1, y1, x2, y2] já detectadas; None →
+            detecta com `detector` ("line_segmenter" ou "find_boxes").
+        engine (str): "tesseract" (mosaico por chamada) ou "paddle"
+            (via ocr_service).
+        preprocess (callable | None): função cinza → cinza aplicada a cada
+            recorte antes do mosaico (ex.: filtro bilateral).
+        padding (int): folga ao redor de cada caixa, em pixels.
+
+    Returns:
+        {
+            "status": "success" | "error",
+            "tokens": [...],              # coordenadas da página
+            "regions": [[x1, y1, x2, y2], ...],
+            "mosaics": int,               # chamadas de OCR
+            "pixel_ratio": float,         # pixels reconhecidos / pixels da página
+            "error": str | None
+        }
+    """
+    result = {
+        "status": "error",
+        "tokens": [],
+        "regions": [],
+        "mosaics": 0,
+        "pixel_ratio": 0.0,
+        "error": None,
+    }
+
+    try:
+        gray = load_image(image, grayscale=True)
+        if gray is None:
+            result["error"] = f"Falha ao carregar imagem: {image}"
+            return result
+        ph, pw = gray.shape[:2]
+
+        if boxes is None:
+            boxes = detect_layout_boxes(image if is_prepared(image) else gray, detector)
+
+        regions, crops = [], []
+        for b in boxes:
+            x1, y1 = max(0, int(b[0]) - padding), max(0, int(b[1]) - padding)
+            x2, y2 = min(pw, int(b[2]) + padding), min(ph, int(b[3]) + padding)
+            if x2 - x1 < MIN_REGION_SIDE or y2 - y1 < MIN_REGION_SIDE:
+                continue
+            crop = gray[y1:y2, x1:x2]
+            if preprocess is not None:
+                crop = preprocess(crop)
+            regions.append([x1, y1, x2, y2])
+            crops.append(crop)
+
+        result["regions"] = regions
+        if not crops:
+            result["status"] = "success"
+            return result
+
+        tokens = []
+        mosaics = pack_mosaics(crops)
+        for mosaic in mosaics:
+            if engine == "paddle":
+                raw = _ocr_paddle(mosaic["image"])
+            else:
+                raw = _ocr_tesseract(mosaic["image"], lang, config)
+            tokens.extend(_map_to_page(raw, mosaic["placements"], regions))
+
+        tokens.sort(key=lambda t: (t["top"], t["left"]))
+
+        # Área única coberta pelas regiões (caixas podem se sobrepor)
+        mask = np.zeros((ph, pw), dtype=np.uint8)
+        for x1, y1, x2, y2 in regions:
+            mask[y1:y2, x1:x2] = 1
+
+        result["status"] = "success"
+        result["tokens"] = tokens
+        result["mosaics"] = len(mosaics)
+        result["pixel_ratio"] = round(float(mask.mean()), 4)
+        return result
+
+    except Exception as e:
+        result["error"] = str(e)
+        result["traceback"] = traceback.format_exc()
+        return result
@@ -10,7 +10,8 @@ import os
 import argparse
 import cv2
 from core_pipeline.calibra_p10.utils_calibra import find_boxes_multi
-from core_pipeline.api.ocr_extract import extract_ocr
+from core_pipeline.api.roi_ocr import roi_ocr_page
+from core_pipeline.api.two_pass_render import render_page_regions, compose_regions
 from PIL import Image
 
 BASE_DIR = "/home/ubuntu/garimpo-ml"
@@ -21,32 +22,63 @@ os.makedirs(RECORTES_DIR, exist_ok=True)
 
 
 def recortar_caixas(page_number):
-    """Localiza caixas e salva recortes individuais."""
+    """Localiza caixas e salva recortes individuais. Retorna (página, caixas)."""
     img_path = os.path.join(PAGES_DIR, f"page_{page_number:02d}.jpg")
     img = Image.open(img_path)
     img_cv = cv2.imread(img_path)
 
     boxes = find_boxes_multi(img_cv)
-    saved_paths = []
 
     for i, (x1, y1, x2, y2, conf) in enumerate(boxes):
         crop = img.crop((x1, y1, x2, y2))
         filename = f"page{page_number:02d}_box{i:03d}.jpg"
         out_path = os.path.join(RECORTES_DIR, filename)
         crop.save(out_path)
-        saved_paths.append(out_path)
 
-    return saved_paths
+    return img_cv, [[b[0], b[1], b[2], b[3]] for b in boxes]
 
 
-def processar_pagina(page_number):
-    """Faz o recorte das caixas e executa OCR em cada uma."""
-    recortes = recortar_caixas(page_number)
-    resultados = []
+def recortar_caixas_pdf(pdf_path, page_number):
+    """
+    Variante em duas resoluções: layout em baixa DPI direto do PDF e
+    re-renderização só das caixas detectadas em 300 DPI.
+    Retorna (página montada só com as caixas, caixas).
+    """
+    res = render_page_regions(pdf_path, page_number, detector="find_boxes", ocr_dpi=300)
+    if res["status"] != "success":
+        raise RuntimeError(res["error"])
+
+    for i, region in enumerate(res["regions"]):
+        filename = f"page{page_number:02d}_box{i:03d}.jpg"
+        out_path = os.path.join(RECORTES_DIR, filename)
+        cv2.imwrite(out_path, region["image"])
+
+    return compose_regions(res)
 
-    for r in recortes:
-        resultado = extract_ocr(r, page_number)
-        resultados.append(resultado)
+
+def processar_pagina(page_number, pdf_path=None):
+    """
+    Faz o recorte das caixas e executa o OCR (roi_ocr: um mosaico por
+    chamada) só nelas. Retorna uma entrada por caixa reconhecida.
+    """
+    if pdf_path:
+        page, boxes = recortar_caixas_pdf(pdf_path, page_number)
+    else:
+        page, boxes = recortar_caixas(page_number)
+
+    res = roi_ocr_page(page, boxes=boxes)
+    if res["status"] != "success":
+        raise RuntimeError(res["error"])
+
+    resultados = []
+    for i, bbox in enumerate(res["regions"]):
+        tokens = [t for t in res["tokens"] if t["region"] == i]
+        resultados.append({
+            "page": page_number,
+            "bbox": bbox,
+            "text": " ".join(t["text"] for t in tokens),
+            "tokens": tokens,
+        })
 
     return resultados
 
@@ -54,7 +86,8 @@ def processar_pagina(page_number):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--page", type=int, required=True)
+    parser.add_argument("--pdf", help="renderiza direto do PDF em duas resoluções")
     args = parser.parse_args()
 
-    resultados = processar_pagina(args.page)
+    resultados = processar_pagina(args.page, pdf_path=args.pdf)
     print(f"OCR finalizado – {len(resultados)} caixas processadas")
@@ -0,0 +1,209 @@
+"""
+Garimpo ML – Backends do Tesseract
+----------------------------------
+pytesseract abre um processo `tesseract` a cada chamada, grava a imagem
+em arquivo temporário e interpreta o TSV de volta. No OCR por recorte
+(ocr_duplo chega a 3 chamadas por caixa) esse custo fixo domina.
+
+Backends (GARIMPO_TESSERACT_BACKEND):
+    - "pytesseract" → subprocesso (comportamento original)
+    - "tesserocr"   → API C++ em processo: um handle PyTessBaseAPI por
+                      thread (e por lang/oem), reaproveitado entre chamadas;
+                      o buffer numpy vai direto para o Tesseract
+    - "auto"        → tesserocr se instalado, senão pytesseract
+
+Saída idêntica em formato à do pytesseract:
+    image_to_data   → dict (Output.DICT) com as chaves level, page_num,
+                      block_num, par_num, line_num, word_num, left, top,
+                      width, height, conf, text (no tesserocr, apenas as
+                      linhas de nível palavra)
+    image_to_string → str
+
+Comparação de desempenho: tools/bench_tesseract_backends.py
+"""
+
+import os
+import shlex
+import threading
+
+import numpy as np
+
+try:
+    import tesserocr
+except ImportError:  # backend opcional
+    tesserocr = None
+
+
+TESSERACT_BACKEND = os.environ.get("GARIMPO_TESSERACT_BACKEND", "auto")
+
+_DATA_KEYS = (
+    "level", "page_num", "block_num", "par_num", "line_num", "word_num",
+    "left", "top", "width", "height", "conf", "text",
+)
+
+
+def active_backend(backend=None) -> str:
+    backend = backend or TESSERACT_BACKEND
+    if backend == "auto":
+        return "tesserocr" if tesserocr is not None else "pytesseract"
+    if backend == "tesserocr" and tesserocr is None:
+        raise RuntimeError("tesserocr não instalado")
+    return backend
+
+
+# =========================================================
+# 🔹 Config "--oem N --psm N -c var=valor"
+# =========================================================
+def parse_config(config):
+    """
+    Converte a string de config do pytesseract em (oem, psm, variáveis).
+    """
+    oem, psm, variables = None, None, {}
+    args = shlex.split(config or "")
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        nxt = args[i + 1] if i + 1 < len(args) else None
+        if arg == "--oem" and nxt is not None:
+            oem, i = int(nxt), i + 2
+        elif arg == "--psm" and nxt is not None:
+            psm, i = int(nxt), i + 2
+        elif arg == "-c" and nxt is not None and "=" in nxt:
+            k, v = nxt.split("=", 1)
+            variables[k] = v
+            i += 2
+        else:
+            i += 1
+    return oem, psm, variables
+
+
+# =========================================================
+# 🔹 tesserocr (handle por thread)
+# =========================================================
+_local = threading.local()
+
+
+def _get_api(lang, oem, variables):
+    """
+    Handle da thread atual para (lang, oem, variáveis -c). As variáveis
+    entram na chave porque SetVariable persiste no handle.
+    """
+    apis = getattr(_local, "apis", None)
+    if apis is None:
+        apis = _local.apis = {}
+
+    key = (lang, oem, tuple(sorted(variables.items())))
+    api = apis.get(key)
+    if api is None:
+        kwargs = {"lang": lang}
+        if oem is not None:
+            kwargs["oem"] = oem
+        api = tesserocr.PyTessBaseAPI(**kwargs)
+        for k, v in variables.items():
+            api.SetVariable(k, v)
+        apis[key] = api
+    return api
+
+
+def _set_image(api, img):
+    arr = np.ascontiguousarray(np.asarray(img))
+    if arr.dtype != np.uint8:
+        arr = arr.astype(np.uint8)
+    if arr.ndim == 3 and arr.shape[2] == 4:
+        arr = np.ascontiguousarray(arr[:, :, :3])
+    # Canais na ordem recebida, como o pytesseract (Image.fromarray) faz:
+    # mesma entrada → mesma saída nos dois backends
+
+    h, w = arr.shape[:2]
+    bpp = 1 if arr.ndim == 2 else arr.shape[2]
+    api.SetImageBytes(arr.tobytes(), w, h, bpp, w * bpp)
+
+
+def _prepare(img, lang, config):
+    oem, psm, variables = parse_config(config)
+    api = _get_api(lang or "eng", oem, variables)
+    api.Clear()
+    # padrão do executável tesseract: --psm 3 (segmentação automática)
+    api.SetPageSegMode(psm if psm is not None else tesserocr.PSM.AUTO)
+    _set_image(api, img)
+    return api
+
+
+def _tesserocr_image_to_data(img, lang, config):
+    api = _prepare(img, lang, config)
+    api.Recognize()
+
+    data = {k: [] for k in _DATA_KEYS}
+    ri = api.GetIterator()
+    if ri is None:
+        return data
+
+    level = tesserocr.RIL.WORD
+    block = par = line = word = 0
+    while True:
+        if ri.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+            block, par, line, word = block + 1, 0, 0, 0
+        if ri.IsAtBeginningOf(tesserocr.RIL.PARA):
+            par, line, word = par + 1, 0, 0
+        if ri.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+            line, word = line + 1, 0
+        word += 1
+
+        text = ri.GetUTF8Text(level)
+        box = ri.BoundingBox(level)
+        if text is not None and box is not None:
+            x1, y1, x2, y2 = box
+            data["level"].append(5)
+            data["page_num"].append(1)
+            data["block_num"].append(block)
+            data["par_num"].append(par)
+            data["line_num"].append(line)
+            data["word_num"].append(word)
+            data["left"].append(x1)
+            data["top"].append(y1)
+            data["width"].append(x2 - x1)
+            data["height"].append(y2 - y1)
+            data["conf"].append(round(ri.Confidence(level), 2))
+            data["text"].append(text)
+
+        if not ri.Next(level):
+            break
+    return data
+
+
+def _tesserocr_image_to_string(img, lang, config):
+    api = _prepare(img, lang, config)
+    return api.GetUTF8Text()
+
+
+# =========================================================
+# 🔹 API
+# =========================================================
+def image_to_data(img, lang=None, config="", backend=None):
+    """
+    Equivalente a pytesseract.image_to_data(..., output_type=Output.DICT).
+    """
+    if active_backend(backend) == "tesserocr":
+        return _tesserocr_image_to_data(img, lang, config)
+
+    import pytesseract
+
+    kwargs = {"config": config, "output_type": pytesseract.Output.DICT}
+    if lang:
+        kwargs["lang"] = lang
+    return pytesseract.image_to_data(img, **kwargs)
+
+
+def image_to_string(img, lang=None, config="", backend=None):
+    """
+    Equivalente a pytesseract.image_to_string.
+    """
+    if active_backend(backend) == "tesserocr":
+        return _tesserocr_image_to_string(img, lang, config)
+
+    import pytesseract
+
+    kwargs = {"config": config}
+    if lang:
+        kwargs["lang"] = lang
+    return pytesseract.image_to_string(img, **kwargs)
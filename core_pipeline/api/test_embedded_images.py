@@ -0,0 +1,96 @@
+"""
+TESTE – Imagens dos produtos do job (embedded_images.attach_catalog_images)
+Fotos embutidas no PDF associadas pela caixa da linha de OCR; páginas sem
+imagem embutida (ou sem PyMuPDF) caem para o recorte raster.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api import embedded_images
+from core_pipeline.api.embedded_images import attach_catalog_images
+
+
+def _png(color, size=200):
+    img = np.full((size, size, 3), color, np.uint8)
+    cv2.circle(img, (size // 2, size // 2), size // 3, (255 - color[0], 80, 160), -1)
+    ok, buf = cv2.imencode(".png", img)
+    assert ok
+    return buf.tobytes()
+
+
+def _produtos():
+    return [
+        {"page": 1, "codigo": "CT1000", "original": "CT1000 Copo térmico R$ 3,99", "imagem": ""},
+        {"page": 2, "codigo": "CT2000", "original": "CT2000 Garrafa R$ 9,90", "imagem": ""},
+        {"page": 2, "codigo": "", "original": "linha sem caixa", "imagem": ""},
+    ]
+
+
+# caixas das linhas de OCR a 300 DPI, à direita de cada foto
+LINE_BOXES = {
+    1: {"CT1000 Copo térmico R$ 3,99": [900, 500, 1600, 560]},
+    2: {"CT2000 Garrafa R$ 9,90": [900, 500, 1500, 560]},
+}
+
+
+def test_catalog_images_from_embedded_pdf(tmp_path):
+    fitz = pytest.importorskip("fitz")
+    logo = _png((0, 0, 200), size=120)
+
+    pdf_path = str(tmp_path / "catalogo.pdf")
+    doc = fitz.open()
+    for color in ((30, 120, 30), (200, 60, 10)):
+        page = doc.new_page(width=595, height=842)
+        page.insert_image(fitz.Rect(50, 100, 200, 250), stream=_png(color))
+        page.insert_image(fitz.Rect(450, 20, 510, 80), stream=logo)
+        page.insert_text((220, 130), "CT1000 R$ 3,99", fontsize=14)
+    doc.save(pdf_path)
+    doc.close()
+
+    produtos = _produtos()
+    summary = attach_catalog_images(
+        pdf_path, produtos, LINE_BOXES, str(tmp_path / "crops"), url_prefix="/static_output/JOB/"
+    )
+
+    assert summary["error"] is None
+    assert summary["embedded"] == 2
+    assert summary["cropped"] == 0
+    assert summary["unique_images"] == 2
+    assert summary["skipped_repeated"] == 1        # logo em todas as páginas
+
+    names = [p["imagem"].rsplit("/", 1)[-1] for p in produtos[:2]]
+    assert all(p["imagem"].startswith("/static_output/JOB/img_") for p in produtos[:2])
+    assert names[0] != names[1]
+    for name in names:
+        assert os.path.exists(tmp_path / "crops" / name)
+    assert produtos[2]["imagem"] == ""
+
+
+def test_catalog_images_fall_back_to_raster_crop(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedded_images, "fitz", None)
+
+    page_jpg = tmp_path / "page_01.jpg"
+    cv2.imwrite(str(page_jpg), np.full((3508, 2481, 3), 200, np.uint8))
+
+    produtos = _produtos()
+    summary = attach_catalog_images(
+        str(tmp_path / "catalogo.pdf"), produtos, LINE_BOXES, str(tmp_path / "crops"),
+        page_image=lambda n: str(page_jpg) if n == 1 else None,
+        url_prefix="/static_output/JOB/",
+    )
+
+    assert summary["error"]
+    assert summary["embedded"] == 0
+    assert summary["cropped"] == 1
+    assert produtos[0]["imagem"] == "/static_output/JOB/page_01_CT1000.jpg"
+    assert os.path.exists(tmp_path / "crops" / "page_01_CT1000.jpg")
+    # página 2 sem imagem da página: nada a recortar
+    assert produtos[1]["imagem"] == ""
@@ -0,0 +1,123 @@
+"""
+TESTE – Segmentação de linhas e colunas (line_segmenter)
+Saída idêntica à versão anterior (laço por linha de pixel) nas bordas da
+máscara; página de 2 colunas detectada como 2 colunas (o KMeans com k
+pela largura da página partia em 5).
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api import line_segmenter
+from core_pipeline.api.line_segmenter import (
+    _load_image_as_binary,
+    _find_connected_components,
+    _cluster_columns_from_boxes,
+    _segment_lines_in_column,
+)
+
+PAGE_05 = os.path.join(BASE_DIR, "core_pipeline", "data", "TTBRASIL_20251201",
+                       "outputs", "pages_jpg", "page_05.jpg")
+
+
+def _segment_lines_loop(bin_img, col_x1, col_x2, min_line_height=20, min_area=100):
+    """
+    Versão anterior (laço Python), como referência.
+    """
+    h, w = bin_img.shape[:2]
+    col_x1 = max(0, min(col_x1, w - 1))
+    col_x2 = max(0, min(col_x2, w - 1))
+    if col_x2 <= col_x1:
+        return []
+    active = np.sum(bin_img[:, col_x1:col_x2 + 1] > 0, axis=1) > 0
+
+    blocks, start = [], None
+    for y in range(h + 1):
+        on = y < h and active[y]
+        if on and start is None:
+            start = y
+        elif not on and start is not None:
+            height = y - start
+            if height >= min_line_height and (col_x2 - col_x1 + 1) * height >= min_area:
+                blocks.append({"x1": int(col_x1), "y1": int(start), "x2": int(col_x2), "y2": int(y - 1)})
+            start = None
+    return blocks
+
+
+def _rows(h, w, active_rows):
+    img = np.zeros((h, w), np.uint8)
+    img[list(active_rows), w // 2] = 255
+    return img
+
+
+def test_run_length_matches_loop_on_edge_masks():
+    h, w = 200, 40
+    masks = {
+        "vazia": np.zeros((h, w), np.uint8),
+        "cheia": np.full((h, w), 255, np.uint8),
+        "da_primeira_linha": _rows(h, w, range(0, 30)),
+        "até_a_última_linha": _rows(h, w, range(170, h)),
+        "altura_exata_20": _rows(h, w, range(50, 70)),
+        "altura_19": _rows(h, w, range(50, 69)),
+        "linha_única": _rows(h, w, [100]),
+        "alternada": _rows(h, w, range(0, h, 2)),
+        "blocos_colados": _rows(h, w, list(range(10, 40)) + list(range(41, 90))),
+        "aleatória": (np.random.default_rng(0).random((h, w)) < 0.02).astype(np.uint8) * 255,
+    }
+    cols = [(0, w - 1), (5, 25), (w // 2, w // 2 + 1), (30, 500), (-10, 10), (20, 20), (25, 5)]
+    for name, mask in masks.items():
+        for x1, x2 in cols:
+            for min_h, min_area in ((20, 100), (1, 1), (5, 400)):
+                got = _segment_lines_in_column(mask, x1, x2, min_h, min_area)
+                ref = _segment_lines_loop(mask, x1, x2, min_h, min_area)
+                assert got == ref, (name, x1, x2, min_h, min_area)
+
+
+def _two_column_page(col_x=(150, 1340)):
+    """
+    A4 a 300 DPI: faixa de título na largura toda e 4 cards por coluna
+    (foto, especificações ao lado da foto, código e preço).
+    """
+    img = np.full((3508, 2481, 3), 255, np.uint8)
+    cv2.rectangle(img, (100, 80), (2380, 260), (40, 40, 40), -1)
+    cv2.putText(img, "OFERTAS DA SEMANA", (700, 200), cv2.FONT_HERSHEY_SIMPLEX, 3.0, (255, 255, 255), 6)
+    for col, x0 in enumerate(col_x):
+        for card in range(4):
+            y0 = 380 + card * 760
+            cv2.rectangle(img, (x0, y0), (x0 + 380, y0 + 380), (90, 120, 160), -1)
+            for j in range(6):
+                cv2.putText(img, f"Medidas {j + 1}: {20 + j}x{30 + j}cm", (x0 + 430, y0 + 40 + j * 55),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+            cv2.putText(img, f"CT{2000 + col * 10 + card} Garrafa Termica 1L", (x0, y0 + 470),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.1, (0, 0, 0), 2)
+            cv2.putText(img, f"R$ {card + 3},99", (x0, y0 + 560), cv2.FONT_HERSHEY_SIMPLEX, 1.8, (0, 0, 200), 4)
+    return img
+
+
+def _columns(img):
+    bin_img, _ = _load_image_as_binary(img)
+    return _cluster_columns_from_boxes(_find_connected_components(bin_img), bin_img.shape[1])
+
+
+def test_two_column_page_not_split(monkeypatch):
+    monkeypatch.setattr(line_segmenter, "COLUMN_DETECTOR", "gaps")
+    cols = _columns(_two_column_page())
+    assert len(cols) == 2, cols
+    # cada coluna de cards inteira (foto + especificações) numa coluna só
+    left, right = cols
+    assert left["x1"] <= 150 and 150 + 430 + 200 <= left["x2"] < 1340, cols
+    assert 150 + 430 < right["x1"] <= 1340 and right["x2"] >= 1340 + 430 + 200, cols
+
+
+def test_catalog_page_two_columns(monkeypatch):
+    if not os.path.exists(PAGE_05):
+        pytest.skip(f"amostra ausente: {PAGE_05}")
+    monkeypatch.setattr(line_segmenter, "COLUMN_DETECTOR", "gaps")
+    assert len(_columns(PAGE_05)) == 2
@@ -0,0 +1,74 @@
+"""
+TESTE – PageCache × regravação de páginas no job
+Uma página materializada no job é hardlink da entrada do cache; renderizar
+outra chave no mesmo caminho não pode alterar a entrada antiga.
+"""
+import os
+import sys
+import stat
+
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api import pdf_to_jpg_converter
+from core_pipeline.api.page_cache import PageCache
+from core_pipeline.api.pdf_renderer import save_page_jpg
+from core_pipeline.api.pdf_to_jpg_converter import render_pdf_page, CACHE_RENDERER
+
+
+# pdftoppm falso: a "página" renderizada é o próprio conteúdo do PDF
+FAKE_PDFTOPPM = """#!/bin/sh
+for a in "$@"; do pdf="$prev"; prev="$a"; done
+cat "$pdf" > "$prev.jpg"
+"""
+
+
+def _setup(tmp_path, monkeypatch):
+    tool = tmp_path / "pdftoppm"
+    tool.write_text(FAKE_PDFTOPPM)
+    tool.chmod(tool.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(pdf_to_jpg_converter, "_find_pdftoppm", lambda: str(tool))
+
+    pdf_a, pdf_b = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    pdf_a.write_bytes(b"%PDF catalogo A")
+    pdf_b.write_bytes(b"%PDF catalogo B (reenvio com outro preco)")
+    return PageCache(root=tmp_path / "cache"), str(pdf_a), str(pdf_b)
+
+
+def test_rerender_keeps_cached_entry(tmp_path, monkeypatch):
+    cache, pdf_a, pdf_b = _setup(tmp_path, monkeypatch)
+    page = str(tmp_path / "job" / "page_01.jpg")
+
+    assert render_pdf_page(pdf_a, 1, page, cache=cache)["status"] == "success"
+    key_a = cache.key(pdf_a, 1, 300, CACHE_RENDERER)
+    entry_a = cache.path_for(key_a)
+    assert cache.fetch(key_a, page)            # página do job = hardlink da entrada
+
+    # chave nova no mesmo caminho (miss → pdftoppm)
+    assert render_pdf_page(pdf_b, 1, page, cache=cache)["status"] == "success"
+
+    with open(entry_a, "rb") as f:
+        assert f.read() == b"%PDF catalogo A"
+    with open(page, "rb") as f:
+        assert f.read() == b"%PDF catalogo B (reenvio com outro preco)"
+    entry_b = cache.path_for(cache.key(pdf_b, 1, 300, CACHE_RENDERER))
+    assert not os.path.samefile(entry_b, page)     # store copia, não linka
+
+
+def test_save_page_jpg_over_cached_link(tmp_path, monkeypatch):
+    cache, pdf_a, _ = _setup(tmp_path, monkeypatch)
+    page = str(tmp_path / "job" / "page_01.jpg")
+
+    render_pdf_page(pdf_a, 1, page, cache=cache)
+    key_a = cache.key(pdf_a, 1, 300, CACHE_RENDERER)
+    assert cache.fetch(key_a, page)
+
+    # backend em memória regravando o JPG da mesma página
+    save_page_jpg(np.zeros((32, 32, 3), np.uint8), page)
+
+    with open(cache.path_for(key_a), "rb") as f:
+        assert f.read() == b"%PDF catalogo A"
+    assert not os.path.samefile(cache.path_for(key_a), page)
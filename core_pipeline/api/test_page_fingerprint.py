@@ -0,0 +1,68 @@
+"""
+TESTE – Reaproveitamento de páginas (page_fingerprint)
+Assinatura de blocos sensível a um dígito de preço e índice por fornecedor
+gravado por jobs simultâneos.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api.page_fingerprint import (
+    SupplierPageIndex,
+    fingerprint_page,
+    hamming,
+    signatures_match,
+)
+
+
+def _catalog_page(price, origin=(1200, 1500), scale=1.0):
+    """
+    Página A4 a 300 DPI: lista de produtos + um preço em destaque.
+    """
+    img = np.full((3508, 2481, 3), 255, np.uint8)
+    for i in range(40):
+        cv2.putText(img, f"CT{1000 + i} Produto teste R$ 1,{i:02d}", (150, 100 + i * 80),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 0, 0), 2)
+    cv2.putText(img, f"R$ {price}", origin, cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), 2)
+    return img
+
+
+def test_single_digit_price_change_not_matched():
+    for dx in (0, 8, 16, 24):
+        origin = (1200 + dx, 1500)
+        old = fingerprint_page(_catalog_page("3,99", origin))
+        new = fingerprint_page(_catalog_page("3,98", origin))
+        # o phash não vê o dígito; a assinatura de blocos precisa ver
+        assert hamming(old["phash"], new["phash"]) <= 6
+        assert not signatures_match(old["signature"], new["signature"])
+
+
+def test_same_page_matches_after_jpeg_roundtrip():
+    img = _catalog_page("3,99")
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    assert ok
+    a = fingerprint_page(img)
+    b = fingerprint_page(cv2.imdecode(buf, cv2.IMREAD_COLOR))
+    assert signatures_match(a["signature"], b["signature"])
+
+
+def test_concurrent_saves_merge_entries(tmp_path):
+    fp = fingerprint_page(_catalog_page("3,99"))
+    job_a = SupplierPageIndex("ttbrasil", root=tmp_path)
+    job_b = SupplierPageIndex("ttbrasil", root=tmp_path)
+
+    job_a.add("TTBRASIL_20251201", 1, fp, [{"text": "CT1000"}])
+    job_b.add("TTBRASIL_20251202", 1, fp, [{"text": "CT1000"}])
+    job_a.save()
+    job_b.save()
+
+    ids = {e["id"] for e in SupplierPageIndex("ttbrasil", root=tmp_path)._entries}
+    assert ids == {"TTBRASIL_20251201_p01", "TTBRASIL_20251202_p01"}
+    leftovers = [n for n in os.listdir(tmp_path / "TTBRASIL") if ".tmp" in n]
+    assert leftovers == []
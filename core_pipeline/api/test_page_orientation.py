@@ -0,0 +1,57 @@
+"""
+TESTE – Orientação da página (page_orientation)
+Uma página em pé nunca pode sair deitada; sem certeza, fica como veio.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api.page_orientation import estimate_orientation
+
+PAGE_05 = os.path.join(BASE_DIR, "core_pipeline", "data", "TTBRASIL_20251201",
+                       "outputs", "pages_jpg", "page_05.jpg")
+
+
+def _price_list(rows=70, pitch=45):
+    """
+    Lista de preços alinhada à esquerda: colunas de caracteres iguais
+    deixam o perfil vertical mais nítido que o das linhas.
+    """
+    img = np.full((3508, 2481), 255, np.uint8)
+    for i in range(rows):
+        cv2.putText(img, f"CT{1000 + i} ... R$ {i % 10},99", (150, 120 + i * pitch),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, 0, 2)
+    return img
+
+
+def _check(img):
+    for k in range(4):
+        info = estimate_orientation(np.ascontiguousarray(np.rot90(img, k)))
+        expected = ((4 - k) % 4) * 90
+        if info["ambiguous"]:
+            assert info["rotation"] == 0, (k, info)
+        else:
+            assert info["rotation"] == expected, (k, info)
+
+
+def test_left_aligned_price_list_never_turned_sideways():
+    img = _price_list()
+    info = estimate_orientation(img)
+    assert info["rotation"] == 0, info
+    _check(img)
+
+
+def test_catalog_page_all_rotations():
+    if not os.path.exists(PAGE_05):
+        pytest.skip(f"amostra ausente: {PAGE_05}")
+    img = cv2.imread(PAGE_05, cv2.IMREAD_GRAYSCALE)
+    _check(img)
+    info = estimate_orientation(np.ascontiguousarray(np.rot90(img, 1)))
+    assert not info["ambiguous"] and info["rotation"] == 270, info
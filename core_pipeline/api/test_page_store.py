@@ -0,0 +1,43 @@
+"""
+TESTE – PageStore do job
+A página gravada no armazém é lida pelas etapas seguintes pelo caminho do
+.npy (mmap), igual ao array renderizado, e o armazém é esvaziado no fim.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api.page_fingerprint import fingerprint_page, signatures_match
+from core_pipeline.api.page_store import PageStore, page_name
+from core_pipeline.api.pdf_renderer import load_image
+
+
+def test_store_path_feeds_downstream_stages(tmp_path):
+    img = np.full((3508, 2481, 3), 255, np.uint8)
+    cv2.putText(img, "CT1000 R$ 3,99", (200, 400), cv2.FONT_HERSHEY_SIMPLEX, 3, (0, 0, 0), 6)
+
+    store = PageStore(tmp_path / "page_store")
+    path = store.put(page_name(5), img, source="pdfium@300dpi")
+    assert path == store.path_for("page_05")
+
+    page = load_image(path)
+    assert isinstance(page, np.memmap)
+    assert np.array_equal(page, img)
+    assert np.array_equal(load_image(path, grayscale=True), cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+    a = fingerprint_page(img)
+    b = fingerprint_page(path)
+    assert a["phash"] == b["phash"]
+    assert signatures_match(a["signature"], b["signature"])
+
+    store.remove("page_05")
+    assert not store.has("page_05")
+    store.put(page_name(6), img)
+    store.clear()
+    assert os.listdir(tmp_path / "page_store") == []
@@ -0,0 +1,44 @@
+"""
+TESTE – Remoção de ruído do preprocess_image
+O padrão continua sendo o fastNlMeans na página inteira ("full"); o modo
+"auto" só entra quando o job pede, com o nível escolhido pelo ruído.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api.preprocess_image import preprocess_image
+
+
+def _page(sigma, seed=0):
+    img = np.full((1200, 900), 235, np.uint8)
+    for i in range(12):
+        cv2.putText(img, f"CT{1000 + i} Produto R$ 1,{i:02d}", (40, 80 + i * 90),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, 20, 2)
+    noise = np.random.default_rng(seed).normal(0, sigma, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def test_default_is_full_page_nlmeans():
+    page = _page(3.0)
+    default = preprocess_image(page, None)
+    full = preprocess_image(page, None, denoise_mode="full")
+    assert default["denoise"]["mode"] == "full"
+    assert default["denoise"]["tier"] == "nlmeans_full"
+    assert np.array_equal(default["image"], full["image"])
+
+
+def test_auto_tier_follows_noise():
+    # sem CLAHE a estimativa acompanha o σ do ruído somado à página
+    tiers = {}
+    for sigma in (1.0, 3.0, 6.0, 14.0):
+        res = preprocess_image(_page(sigma), None, apply_clahe=False, denoise_mode="auto")
+        assert res["status"] == "success", res["error"]
+        tiers[sigma] = res["denoise"]["tier"]
+    assert tiers == {1.0: "skip", 3.0: "median", 6.0: "bilateral", 14.0: "nlmeans"}
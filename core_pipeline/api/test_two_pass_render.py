@@ -0,0 +1,104 @@
+"""
+TESTE – Renderização em duas resoluções (two_pass_render)
+Layout em baixa DPI, só as caixas de produto a 300 DPI, e o caminho
+pdf_path do ocr_page_processor (GARIMPO_OCR_ROI=1) usando essas caixas.
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api import roi_ocr
+from core_pipeline.api.two_pass_render import render_page_regions, compose_regions
+from core_pipeline.extractors import ocr_page_processor
+
+
+def _catalog_page():
+    """
+    Página A4 a 300 DPI com uma grade de caixas de produto.
+    """
+    img = np.full((3508, 2481, 3), 255, np.uint8)
+    for row in range(4):
+        for col in range(2):
+            x, y = 150 + col * 1150, 200 + row * 800
+            cv2.rectangle(img, (x, y), (x + 1000, y + 600), (0, 0, 0), 4)
+            cv2.putText(img, f"CT{1000 + row * 2 + col}", (x + 60, y + 200),
+                        cv2.FONT_HERSHEY_SIMPLEX, 2.5, (0, 0, 0), 5)
+            cv2.putText(img, "R$ 3,99", (x + 60, y + 450),
+                        cv2.FONT_HERSHEY_SIMPLEX, 2.5, (0, 0, 0), 5)
+    return img
+
+
+class _FakeDoc:
+    """
+    PdfDocument falso: a "página" é um array a 300 DPI.
+    """
+    pdf_path = "catalogo.pdf"
+    page_count = 1
+
+    def __init__(self, page):
+        self.page = page
+        self.page_renders = []
+
+    def render_page(self, page_number, dpi=300, grayscale=False):
+        self.page_renders.append(dpi)
+        h, w = self.page.shape[:2]
+        f = dpi / 300.0
+        img = cv2.resize(self.page, (int(round(w * f)), int(round(h * f))), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if grayscale else img
+
+    def render_region(self, page_number, bbox, dpi=300, bbox_dpi=None, grayscale=False):
+        assert dpi == 300
+        x1, y1, x2, y2 = bbox
+        img = self.page[y1:y2, x1:x2]
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if grayscale else img.copy()
+
+
+def test_compose_regions_keeps_only_detected_boxes():
+    page = _catalog_page()
+    res = render_page_regions(None, 1, detector="find_boxes", doc=_FakeDoc(page), grayscale=True)
+    assert res["status"] == "success", res["error"]
+    # tamanho da página a 300 DPI reconstruído do layout (±1 px de arredondamento)
+    page_w, page_h = res["page_size"]
+    assert abs(page_w - 2481) <= 1 and abs(page_h - 3508) <= 1
+    assert len(res["regions"]) == 8
+
+    composed, boxes = compose_regions(res)
+    gray = cv2.cvtColor(page, cv2.COLOR_BGR2GRAY)[:page_h, :page_w]
+    assert composed.shape == gray.shape
+    for x1, y1, x2, y2 in boxes:
+        assert np.array_equal(composed[y1:y2, x1:x2], gray[y1:y2, x1:x2])
+    mask = np.zeros(gray.shape, bool)
+    for x1, y1, x2, y2 in boxes:
+        mask[y1:y2, x1:x2] = True
+    assert (composed[~mask] == 255).all()
+
+
+def test_process_page_source_pdf_uses_two_pass_regions(monkeypatch):
+    doc = _FakeDoc(_catalog_page())
+    monkeypatch.setattr(ocr_page_processor, "OCR_ROI_MODE", True)
+    monkeypatch.setattr(ocr_page_processor, "OCR_ROUTER_MODE", False)
+    monkeypatch.setattr(ocr_page_processor, "_worker_doc", lambda pdf_path: doc)
+
+    mosaics = []
+
+    def fake_tesseract(img, lang, config):
+        # uma palavra por caixa, no topo de cada recorte do mosaico
+        mosaics.append(img.shape)
+        return [{"text": "CT1000 R$ 3,99", "conf": 95.0, "bbox": [70, 150, 600, 230]}]
+
+    monkeypatch.setattr(roi_ocr, "_ocr_tesseract", fake_tesseract)
+
+    out = ocr_page_processor.process_page_source(1, pdf_path="catalogo.pdf")
+
+    # só a passada de layout renderiza a página inteira (100 DPI)
+    assert doc.page_renders == [100]
+    assert mosaics
+    assert out["produtos"]
+    assert out["produtos"][0]["codigo"] == "CT1000"
+    assert out["produtos"][0]["preco"] == "R$ 3,99"
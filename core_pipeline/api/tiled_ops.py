@@ -0,0 +1,203 @@
+"""
+Garimpo ML – Execução em blocos (tiles) para páginas muito grandes
+------------------------------------------------------------------
+Pôsteres A3 e páginas duplas chegam a 7000+ px; CLAHE, binarização
+adaptativa e denoise rodavam numa thread só sobre o array inteiro, com
+buffers intermediários do tamanho da página.
+
+Aqui a página é dividida em blocos de TILE_SIZE processados num pool de
+threads (o OpenCV libera o GIL). Só `workers` blocos ficam em voo, então
+os buffers intermediários são limitados pelo tamanho do bloco, não da
+página (apenas o resultado final tem o tamanho da página).
+
+Dois modos:
+    run_local(src, fn, halo)   → operações locais (limiar adaptativo,
+        mediana, bilateral, NLMeans, morfologia): cada bloco leva uma
+        margem `halo` ≥ raio da operação e só o miolo é gravado; o
+        resultado é igual ao da página inteira.
+    run_blended(src, fn)       → operações não locais (CLAHE): blocos com
+        sobreposição TILE_BLEND, emendas misturadas por rampa linear.
+
+Páginas abaixo de TILED_MIN_PIXELS seguem pelo caminho direto (fn(src)).
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import cv2
+import numpy as np
+
+
+TILE_SIZE = int(os.environ.get("GARIMPO_TILE_SIZE", "2048"))
+# Acima disso (pixels) a página é processada em blocos; A4 a 300 DPI ≈ 8.7 MP
+TILED_MIN_PIXELS = int(os.environ.get("GARIMPO_TILED_MIN_PIXELS", "12000000"))
+# Sem GARIMPO_TILE_WORKERS, segue o limite de threads do OpenCV no momento
+# da chamada (ocr_executor.limit_threads → GARIMPO_OCR_THREADS por worker)
+TILE_WORKERS = int(os.environ.get("GARIMPO_TILE_WORKERS", "0"))
+
+# Margem dos blocos em run_local (par: mantém reduções 2× alinhadas)
+TILE_HALO = 64
+# Sobreposição dos blocos em run_blended
+TILE_BLEND = 256
+
+
+def should_tile(shape, min_pixels=None) -> bool:
+    min_pixels = TILED_MIN_PIXELS if min_pixels is None else min_pixels
+    return shape[0] * shape[1] >= min_pixels
+
+
+def _spans(length, tile, step):
+    """
+    Intervalos [a, b) de tamanho tile a cada step, cobrindo [0, length).
+    """
+    if length <= tile:
+        return [(0, length)]
+    spans = []
+    a = 0
+    while True:
+        b = min(a + tile, length)
+        spans.append((a, b))
+        if b >= length:
+            return spans
+        a += step
+
+
+def _workers(workers=None) -> int:
+    return max(1, workers or TILE_WORKERS or cv2.getNumThreads())
+
+
+def _pool(workers):
+    return ThreadPoolExecutor(max_workers=_workers(workers))
+
+
+# =========================================================
+# 🔹 Operações locais: margem + miolo
+# =========================================================
+def map_local(src, fn, halo=TILE_HALO, tile=None, workers=None):
+    """
+    Aplica fn bloco a bloco; cada bloco leva `halo` px de vizinhança e só o
+    miolo volta para a saída.
+    """
+    tile = tile or TILE_SIZE
+    tile += tile % 2        # origens pares (ver TILE_HALO)
+    workers = _workers(workers)
+    h, w = src.shape[:2]
+    cores = [(y, x) for y in _spans(h, tile, tile) for x in _spans(w, tile, tile)]
+
+    def work(core):
+        (y0, y1), (x0, x1) = core
+        ty0, tx0 = max(0, y0 - halo), max(0, x0 - halo)
+        ty1, tx1 = min(h, y1 + halo), min(w, x1 + halo)
+        out = fn(src[ty0:ty1, tx0:tx1])
+        return core, out[y0 - ty0:y1 - ty0, x0 - tx0:x1 - tx0]
+
+    result = None
+    pending = set()
+    todo = deque(cores)
+    with _pool(workers) as pool:
+        while todo or pending:
+            # no máximo 2 blocos por worker em voo (memória limitada)
+            while todo and len(pending) < 2 * workers:
+                pending.add(pool.submit(work, todo.popleft()))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                ((y0, y1), (x0, x1)), part = fut.result()
+                if result is None:
+                    result = np.empty((h, w) + part.shape[2:], dtype=part.dtype)
+                result[y0:y1, x0:x1] = part
+    return result
+
+
+def run_local(src, fn, halo=TILE_HALO, min_pixels=None, **kwargs):
+    """
+    fn(src) direto em páginas normais; em blocos (map_local) nas grandes.
+    """
+    if not should_tile(src.shape, min_pixels):
+        return fn(src)
+    return map_local(src, fn, halo=halo, **kwargs)
+
+
+# =========================================================
+# 🔹 Operações não locais: sobreposição + mistura
+# =========================================================
+def _ramp(n):
+    return (np.arange(1, n + 1, dtype=np.float32) / (n + 1))
+
+
+def map_blended(src, fn, overlap=TILE_BLEND, tile=None, workers=None):
+    """
+    Aplica fn em blocos sobrepostos e grava em ordem de varredura: na faixa
+    sobreposta com blocos já gravados (acima / à esquerda), o valor novo
+    entra com peso crescente (rampa linear), sem costura visível.
+    """
+    tile = tile or TILE_SIZE
+    workers = _workers(workers)
+    overlap = min(overlap, tile // 2)
+    h, w = src.shape[:2]
+    ys = _spans(h, tile, tile - overlap)
+    xs = _spans(w, tile, tile - overlap)
+    tiles = [(iy, ix) for iy in range(len(ys)) for ix in range(len(xs))]
+
+    def work(idx):
+        (y0, y1), (x0, x1) = ys[idx[0]], xs[idx[1]]
+        return fn(src[y0:y1, x0:x1])
+
+    result = None
+    queue = deque()
+    todo = deque(tiles)
+    with _pool(workers) as pool:
+        while todo or queue:
+            while todo and len(queue) < 2 * workers:
+                idx = todo.popleft()
+                queue.append((idx, pool.submit(work, idx)))
+            (iy, ix), fut = queue.popleft()     # gravação em ordem
+            part = fut.result()
+            (y0, y1), (x0, x1) = ys[iy], xs[ix]
+            if result is None:
+                result = np.empty((h, w) + part.shape[2:], dtype=part.dtype)
+
+            oy = ys[iy - 1][1] - y0 if iy else 0
+            ox = xs[ix - 1][1] - x0 if ix else 0
+            if not oy and not ox:
+                result[y0:y1, x0:x1] = part
+                continue
+
+            wy = np.ones(y1 - y0, dtype=np.float32)
+            wx = np.ones(x1 - x0, dtype=np.float32)
+            if oy:
+                wy[:oy] = _ramp(oy)
+            if ox:
+                wx[:ox] = _ramp(ox)
+            alpha = np.outer(wy, wx)
+            if part.ndim == 3:
+                alpha = alpha[:, :, None]
+            prev = result[y0:y1, x0:x1].astype(np.float32)
+            fresh = part.astype(np.float32)
+            mixed = prev * (1.0 - alpha) + fresh * alpha
+            result[y0:y1, x0:x1] = np.clip(np.rint(mixed), 0, 255).astype(part.dtype)
+    return result
+
+
+def run_blended(src, fn, min_pixels=None, **kwargs):
+    if not should_tile(src.shape, min_pixels):
+        return fn(src)
+    return map_blended(src, fn, **kwargs)
+
+
+def clahe(gray, clip_limit=3.0, grid=(8, 8), min_pixels=None, **kwargs):
+    """
+    CLAHE com as células do tamanho que teriam na página inteira; em
+    páginas grandes, cada bloco usa uma grade proporcional ao seu tamanho.
+    """
+    h, w = gray.shape[:2]
+    cell_h, cell_w = h / grid[1], w / grid[0]
+
+    def fn(tile):
+        th, tw = tile.shape[:2]
+        g = (max(1, int(round(tw / cell_w))), max(1, int(round(th / cell_h))))
+        return cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=g).apply(tile)
+
+    if not should_tile(gray.shape, min_pixels):
+        return cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=grid).apply(gray)
+    return map_blended(gray, fn, **kwargs)
@@ -0,0 +1,159 @@
+"""
+Garimpo ML – Renderização em duas resoluções
+--------------------------------------------
+A segmentação (line_segmenter / find_boxes_multi) não precisa de 300 DPI.
+Este módulo:
+    1. renderiza a página em baixa resolução (LAYOUT_DPI) só para o layout;
+    2. detecta os blocos/caixas de produto nessa imagem pequena;
+    3. re-renderiza em alta resolução (OCR_DPI) apenas as regiões
+       detectadas, direto do PDF (sem decodificar a página inteira).
+
+O trabalho de pixels por página cai proporcionalmente à área das regiões
+(e ao quadrado da razão LAYOUT_DPI / OCR_DPI na etapa de layout).
+
+Todas as coordenadas de saída estão no espaço da página a OCR_DPI, o mesmo
+das páginas page_XX.jpg de 300 DPI.
+
+compose_regions monta a página a OCR_DPI só com as regiões (resto em
+branco), para quem espera a página inteira — o ROI OCR do
+ocr_page_processor (GARIMPO_OCR_ROI=1 com pdf_path) e o run_page_ocr.py.
+"""
+
+import os
+import traceback
+
+import numpy as np
+
+from core_pipeline.api.pdf_renderer import PdfDocument
+from core_pipeline.api.line_segmenter import segment_page_into_blocks
+from core_pipeline.calibra_p10.utils_calibra import find_boxes_multi
+
+
+LAYOUT_DPI = int(os.environ.get("GARIMPO_LAYOUT_DPI", "100"))
+OCR_DPI = int(os.environ.get("GARIMPO_OCR_DPI", "300"))
+
+# Folga (em pixels a OCR_DPI) ao redor de cada região re-renderizada
+REGION_PADDING = 12
+
+
+def detect_layout_boxes(img, detector="line_segmenter", scale=1.0):
+    """
+    Retorna lista de bboxes [x1, y1, x2, y2] na imagem de layout.
+    detector: "line_segmenter" (blocos) ou "find_boxes" (caixas Calibra P10);
+    scale = dpi da imagem / 300 (ajusta os limiares dos detectores).
+    """
+    if detector == "find_boxes":
+        return [[b[0], b[1], b[2], b[3]] for b in find_boxes_multi(img, scale=scale)]
+
+    seg = segment_page_into_blocks(img, scale=scale)
+    if seg.get("status") != "success":
+        raise RuntimeError(seg.get("error") or "Falha na segmentação de layout")
+    return [b["bbox"] for b in seg["blocks"]]
+
+
+def render_page_regions(pdf_path, page_number, detector="line_segmenter",
+                        layout_dpi=None, ocr_dpi=None, doc=None, grayscale=False):
+    """
+    Layout em baixa resolução + re-renderização das regiões em alta.
+
+    Args:
+        pdf_path (str): PDF do job.
+        page_number (int): página (1-based).
+        detector (str): "line_segmenter" (blocos coluna+linha) ou
+            "find_boxes" (caixas de produto do Calibra P10).
+        layout_dpi / ocr_dpi (int): resoluções das duas passadas.
+        doc (PdfDocument | None): documento já aberto (reutilizado entre páginas).
+        grayscale (bool): regiões em escala de cinza (suficiente para OCR).
+
+    Returns:
+        {
+            "status": "success" | "error",
+            "page": int,
+            "layout_dpi": int,
+            "ocr_dpi": int,
+            "page_size": [w, h] | None,   # em pixels a ocr_dpi
+            "regions": [
+                {"id": int, "bbox": [x1, y1, x2, y2], "image": np.ndarray},
+                ...
+            ],
+            "error": str | None
+        }
+    """
+    layout_dpi = layout_dpi or LAYOUT_DPI
+    ocr_dpi = ocr_dpi or OCR_DPI
+    factor = ocr_dpi / float(layout_dpi)
+
+    result = {
+        "status": "error",
+        "page": page_number,
+        "layout_dpi": layout_dpi,
+        "ocr_dpi": ocr_dpi,
+        "page_size": None,
+        "regions": [],
+        "error": None,
+    }
+
+    own_doc = doc is None
+    try:
+        if own_doc:
+            doc = PdfDocument(pdf_path)
+
+        # 1) Passada de layout (baixa resolução)
+        layout_img = doc.render_page(page_number, dpi=layout_dpi)
+        lh, lw = layout_img.shape[:2]
+        page_w, page_h = int(round(lw * factor)), int(round(lh * factor))
+        result["page_size"] = [page_w, page_h]
+
+        boxes = detect_layout_boxes(layout_img, detector, scale=layout_dpi / 300.0)
+
+        # 2) Re-renderização das regiões em alta resolução
+        regions = []
+        for idx, (x1, y1, x2, y2) in enumerate(boxes):
+            bx1 = max(0, int(x1 * factor) - REGION_PADDING)
+            by1 = max(0, int(y1 * factor) - REGION_PADDING)
+            bx2 = min(page_w, int((x2 + 1) * factor) + REGION_PADDING)
+            by2 = min(page_h, int((y2 + 1) * factor) + REGION_PADDING)
+            if bx2 <= bx1 or by2 <= by1:
+                continue
+
+            img = doc.render_region(
+                page_number, [bx1, by1, bx2, by2], dpi=ocr_dpi, grayscale=grayscale
+            )
+            regions.append({"id": idx, "bbox": [bx1, by1, bx2, by2], "image": img})
+
+        result["status"] = "success"
+        result["regions"] = regions
+        return result
+
+    except Exception as e:
+        result["error"] = str(e)
+        result["traceback"] = traceback.format_exc()
+        return result
+
+    finally:
+        if own_doc and doc is not None:
+            doc.close()
+
+
+def compose_regions(res, background=255):
+    """
+    Página a ocr_dpi montada a partir de render_page_regions: cada região
+    colada na sua bbox, o restante com `background`.
+
+    Returns:
+        (np.ndarray, [[x1, y1, x2, y2], ...]) — página e bboxes das regiões.
+    """
+    regions = res["regions"]
+    page_w, page_h = res["page_size"]
+    shape = (page_h, page_w) + regions[0]["image"].shape[2:] if regions else (page_h, page_w)
+    page = np.full(shape, background, dtype=np.uint8)
+
+    boxes = []
+    for region in regions:
+        x1, y1, x2, y2 = region["bbox"]
+        img = region["image"]
+        # o renderizador pode arredondar o recorte em 1 px
+        h, w = min(img.shape[0], y2 - y1), min(img.shape[1], x2 - x1)
+        page[y1:y1 + h, x1:x1 + w] = img[:h, :w]
+        boxes.append([x1, y1, x2, y2])
+    return page, boxes
@@ -6,8 +6,8 @@ Gera arquivos ocr_page_##.json com bounding boxes e texto reconhecido.
 """
 
 import os
+import sys
 import cv2
-import pytesseract
 import json
 from datetime import datetime
 
@@ -18,6 +18,12 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 LOG_PATH = os.path.join(BASE_DIR, "logs", "calibra_full.log")
 
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api.ocr_executor import OcrExecutor
+from core_pipeline.api.ocr_cache import tesseract_image_to_data
+
 def log(msg):
     ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     with open(LOG_PATH, "a", encoding="utf-8") as f:
@@ -36,7 +42,7 @@ def process_page(page_num):
     gray = cv2.bilateralFilter(gray, 9, 75, 75)
 
     custom_oem_psm_config = r'--oem 3 --psm 6'
-    data = pytesseract.image_to_data(gray, output_type=pytesseract.Output.DICT, config=custom_oem_psm_config)
+    data = tesseract_image_to_data(gray, config=custom_oem_psm_config, variant="bilateral_9_75")
 
     ocr_results = []
     for i in range(len(data["text"])):
@@ -63,10 +69,14 @@ def process_page(page_num):
         json.dump(ocr_results, f, ensure_ascii=False, indent=2)
     log(f"[OK] Página {page_num:02} processada → {out_file}")
 
-def main():
+def main(workers=None):
     log("==== INÍCIO calibra_full ====")
-    for page_num in range(11, 34):
-        process_page(page_num)
+    # Páginas em paralelo (um Tesseract por worker, 1 thread cada)
+    pages = list(range(11, 34))
+    with OcrExecutor("core_pipeline.calibra_full.calibra_main:process_page", workers=workers) as executor:
+        for item in executor.map([(n,) for n in pages], keys=pages):
+            if item["error"]:
+                log(f"[ERRO] Página {item['key']:02}: {item['error']}")
     log("==== FIM calibra_full ====")
 
 if __name__ == "__main__":
@@ -11,6 +11,8 @@ import numpy as np
 import datetime
 import os
 
+from core_pipeline.api.page_prep import is_prepared
+
 # Caminho de log seguro
 LOG_PATH = "/home/ubuntu/garimpo-ml/core_pipeline/outputs/calibra_p10_log.txt"
 
@@ -45,67 +47,83 @@ def enhance_for_ocr(img, strong=False):
 
 
 # ============================================================
-# 3️⃣ OCR duplo (habilitado apenas se pytesseract estiver ativo)
+# 3️⃣ OCR em cascata (habilitado apenas se pytesseract estiver ativo)
 # ============================================================
-def ocr_duplo(img, strong=False, enable_ocr=False):
+def ocr_duplo(img, strong=False, enable_ocr=False, stats=None):
+    """
+    OCR de um recorte via ocr_cascade: passada rápida em baixa resolução,
+    escalando (realce → 2× → PaddleOCR) só se a confiança ficar baixa.
+    Recortes claros (média > 210) começam como antes, pelo colorido em
+    resolução cheia, e caem no realce se ficarem fracos.
+    strong=True começa direto no realce. stats: new_cascade_stats().
+    """
     if not enable_ocr:
         return ""  # OCR desativado conforme protocolo
 
-    import pytesseract
+    from core_pipeline.api.ocr_cascade import cascade_ocr
 
     if img is None or img.size == 0:
         return ""
 
     mean_val = np.mean(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)) if len(img.shape) == 3 else np.mean(img)
-    use_color_direct = mean_val > 210
+    use_color_direct = mean_val > 210 and not strong
 
     try:
-        if use_color_direct:
-            text = pytesseract.image_to_string(img, lang="por+eng", config="--psm 6")
-        else:
-            img_proc = enhance_for_ocr(img, strong=False)
-            text = pytesseract.image_to_string(img_proc, lang="por+eng", config="--psm 7")
-        text = text.strip()
+        result = cascade_ocr(
+            img, lang="por+eng", start_level=1 if (strong or use_color_direct) else 0,
+            stats=stats, color_first=use_color_direct,
+        )
+        return result["text"].strip()
     except Exception:
-        text = ""
-
-    if not text or len(text) < 3:
-        try:
-            img_proc2 = enhance_for_ocr(img, strong=True)
-            text2 = pytesseract.image_to_string(img_proc2, lang="por+eng", config="--psm 6")
-            return (text2 or "").strip()
-        except Exception:
-            return ""
-
-    return text
+        return ""
 
 
 # ============================================================
 # 4️⃣ Localiza blocos de texto prováveis de produtos
 # ============================================================
-def find_boxes_multi(img):
+def _odd(value, minimum=3):
+    v = max(minimum, int(round(value)))
+    return v if v % 2 == 1 else v + 1
+
+
+def find_boxes_multi(img, scale=1.0):
     """
     Detecta blocos de produtos com robustez.
     Versão validada em 27/10 (funcionando para TABELA_TTBRASIL).
+
+    scale: resolução da imagem relativa a 300 DPI (ex.: 100 DPI → 1/3);
+    kernels e filtros em pixels são ajustados proporcionalmente.
+    img pode ser uma PreparedPage (page_prep): o Otsu vem memorizado.
     """
 
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if is_prepared(img) and img.scale == scale:
+        gray = img.gray
+        th = img.get("otsu_inv")
+    else:
+        if is_prepared(img):
+            img = img.gray
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
 
-    # 1) Suavizar (reduce noise)
-    blur = cv2.GaussianBlur(gray, (5, 5), 0)
+        # 1) Suavizar (reduce noise)
+        k_blur = _odd(5 * scale)
+        blur = cv2.GaussianBlur(gray, (k_blur, k_blur), 0)
 
-    # 2) Threshold automático (Otsu) — muito mais robusto
-    _, th = cv2.threshold(
-        blur, 0, 255,
-        cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
-    )
+        # 2) Threshold automático (Otsu) — muito mais robusto
+        _, th = cv2.threshold(
+            blur, 0, 255,
+            cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU
+        )
 
     # 3) Dilatação horizontal – junta textos que pertencem ao mesmo bloco de produto
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (35, 5))
+    kernel = cv2.getStructuringElement(
+        cv2.MORPH_RECT, (max(1, int(round(35 * scale))), max(1, int(round(5 * scale))))
+    )
     dil = cv2.dilate(th, kernel, iterations=2)
 
     # 4) Fecha pequenos buracos internos
-    close_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (25, 7))
+    close_kernel = cv2.getStructuringElement(
+        cv2.MORPH_RECT, (max(1, int(round(25 * scale))), max(1, int(round(7 * scale))))
+    )
     closed = cv2.morphologyEx(dil, cv2.MORPH_CLOSE, close_kernel)
 
     # 5) Contornos
@@ -123,9 +141,9 @@ def find_boxes_multi(img):
 
         # 6) Filtros inteligentes da versão validada
         area = w * h
-        if area < 8000:      # elimina lixo
+        if area < 8000 * scale * scale:      # elimina lixo
             continue
-        if w < 120 or h < 40:
+        if w < 120 * scale or h < 40 * scale:
             continue
         if w > W * 0.95:     # evita blocos enormes
             continue
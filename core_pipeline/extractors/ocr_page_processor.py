@@ -1,13 +1,34 @@
 import os
 import re
+import sys
 import json
 from pathlib import Path
 from collections import defaultdict
 import cv2
-import pytesseract
-from pytesseract import Output
 
 BASE_DIR = Path("/home/ubuntu/garimpo-ml")
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from core_pipeline.api.pdf_renderer import PdfDocument
+from core_pipeline.api.page_prep import PreparedPage
+from core_pipeline.api.ocr_executor import OcrExecutor
+from core_pipeline.api.roi_ocr import roi_ocr_page
+from core_pipeline.api.two_pass_render import render_page_regions, compose_regions
+from core_pipeline.api.ocr_cache import tesseract_image_to_data
+from core_pipeline.api.ocr_cascade import (
+    CASCADE_MIN_CONF, cascade_ocr, new_cascade_stats, merge_cascade_stats, record_level
+)
+from core_pipeline.api.ocr_router import OCR_ROUTER_MODE, route_page, summarize_decisions
+
+# OCR só nas caixas de produto (mosaico por chamada) em vez da página inteira
+OCR_ROI_MODE = os.environ.get("GARIMPO_OCR_ROI", "0") == "1"
+OCR_ROI_DETECTOR = os.environ.get("GARIMPO_OCR_ROI_DETECTOR", "find_boxes")
+# Folga (px) ao recortar uma linha para a cascata
+LINE_PAD = 8
+
+# Documento aberto por processo (cada worker do pool mantém só o do PDF atual)
+_worker_docs = {}
 # CORRETO: onde realmente estão as páginas hoje
 PAGES_BASE = BASE_DIR / "core_pipeline" / "data"
 OUTPUTS_BASE = BASE_DIR / "core_pipeline" / "outputs"
@@ -32,86 +53,299 @@ def _sorted_pages(pages_dir: Path):
     pages.sort(key=lambda p: int(re.findall(r"\d+", p.stem)[0]))
     return pages
 
-def process_pages(job_id: str):
-    pages_dir = PAGES_BASE / job_id / "outputs" / "pages_jpg"
-    out_dir = OUTPUTS_BASE / job_id
-    ensure_dir(out_dir)
+def _binarize(gray):
+    gray = cv2.bilateralFilter(gray, 9, 75, 75)
+    return cv2.adaptiveThreshold(
+        gray, 255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        31, 2
+    )
+
+def _page_words(page):
+    """
+    Palavras reconhecidas na página inteira: {top, text, conf, bbox}.
+    A binarização (bilateral + adaptativa 31/2) vem da PreparedPage.
+    """
+    ocr = tesseract_image_to_data(
+        page.get("adaptive_31_2"),
+        lang="por",
+        variant="bilateral_adaptive_31_2"
+    )
+
+    words = []
+    n = len(ocr["text"])
+    for i in range(n):
+        txt = (ocr["text"][i] or "").strip()
+        if not txt:
+            continue
+        try:
+            conf = float(ocr["conf"][i])
+        except:
+            conf = 0
+        if conf < 0:
+            continue
+        x, y = ocr["left"][i], ocr["top"][i]
+        words.append({
+            "top": y,
+            "text": txt,
+            "conf": conf,
+            "bbox": [x, y, x + ocr["width"][i], y + ocr["height"][i]]
+        })
+    return words
+
+def _roi_words(page, boxes=None):
+    """
+    Palavras dentro das caixas de produto (ROI OCR), mesmo formato de
+    _page_words. boxes: caixas já detectadas (None → OCR_ROI_DETECTOR).
+    Sem caixas detectadas, cai para a página inteira.
+    """
+    res = roi_ocr_page(page, boxes=boxes, detector=OCR_ROI_DETECTOR, preprocess=_binarize)
+    if res["status"] != "success" or not res["regions"]:
+        return _page_words(page)
+    return [
+        {"top": t["top"], "text": t["text"], "conf": t["conf"], "bbox": t["bbox"]}
+        for t in res["tokens"]
+    ]
+
+def _paddle_words(img):
+    """
+    Linhas do PaddleOCR (ocr_service) no mesmo formato de _page_words.
+    """
+    from core_pipeline.api.ocr_service import paddle_ocr_blocks
+
+    words = []
+    for block in paddle_ocr_blocks(img)["blocks"]:
+        xs = [pt[0] for pt in block["bbox"]]
+        ys = [pt[1] for pt in block["bbox"]]
+        x1, y1, x2, y2 = int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))
+        words.append({
+            "top": y1,
+            "text": block["text"],
+            "conf": round(float(block.get("conf", 1.0)) * 100, 2),
+            "bbox": [x1, y1, x2, y2]
+        })
+    return words
+
+def _escalate_line(gray, words, stats, require_fields=False):
+    """
+    Reprocessa pela cascata (a partir do realce) o recorte de uma linha
+    com confiança baixa ou com código sem preço.
+    require_fields só para linhas que já têm código (falta o preço); as
+    demais (título, descrição) são aceitas só pela confiança, senão nunca
+    seriam aceitas e passariam por todos os níveis, Paddle incluído.
+    Retorna (texto, conf) ou None se a cascata não melhorou a linha.
+    """
+    h, w = gray.shape[:2]
+    x1 = max(0, min(wd["bbox"][0] for wd in words) - LINE_PAD)
+    y1 = max(0, min(wd["bbox"][1] for wd in words) - LINE_PAD)
+    x2 = min(w, max(wd["bbox"][2] for wd in words) + LINE_PAD)
+    y2 = min(h, max(wd["bbox"][3] for wd in words) + LINE_PAD)
+
+    res = cascade_ocr(
+        gray[y1:y2, x1:x2], lang="por", start_level=1, psm=7,
+        require_fields=require_fields, stats=stats
+    )
+    text = " ".join(res["text"].split())
+    if not text:
+        return None
+    return text, res["conf"]
+
+def process_page_image(img, page_num: int, stats=None, route=None, boxes=None) -> list:
+    """
+    OCR de uma página já carregada (np.ndarray BGR ou cinza, ou PreparedPage:
+    a página é decodificada uma vez e as variantes ficam memorizadas).
+    Com GARIMPO_OCR_ROI=1, reconhece apenas as caixas de produto (boxes,
+    se já detectadas).
+    Linhas abaixo de CASCADE_MIN_CONF (ou com código sem preço) sobem na
+    cascata de ocr_cascade; stats recebe os contadores por nível.
+    Com GARIMPO_OCR_ROUTER=1, páginas de baixo rendimento são refeitas com
+    o PaddleOCR (ocr_router); a decisão da página é anexada a route.
+    Retorna a lista de blocos {page, codigo, titulo, preco, conf, original, fonte}.
+    """
+    page = PreparedPage.wrap(img)
+    gray = page.gray
+
+    def fast():
+        words = _roi_words(page, boxes) if OCR_ROI_MODE else _page_words(page)
+        return _words_to_products(gray, words, page_num, stats)
+
+    if not OCR_ROUTER_MODE:
+        return fast()
 
+    def paddle():
+        words = _paddle_words(page.bgr)
+        return _words_to_products(gray, words, page_num, fonte="ocr_paddle")
+
+    produtos, decision = route_page(page, page_num, fast, paddle)
+    if route is not None:
+        route.append(decision)
+    return produtos
+
+def _words_to_products(gray, words, page_num, stats=None, fonte="ocr_auto"):
+    """
+    Agrupa as palavras em linhas (faixas de 30 px) e extrai código, título
+    e preço. Só as linhas do Tesseract (fonte ocr_auto) sobem na cascata.
+    """
+    escalate = fonte == "ocr_auto"
+    line_map = defaultdict(list)
+    for wd in words:
+        key = wd["top"] // 30
+        line_map[key].append(wd)
+
+    produtos = []
+    for _, line_words in sorted(line_map.items()):
+        joined = " ".join(wd["text"] for wd in line_words)
+        conf = sum(wd["conf"] for wd in line_words) / len(line_words)
+        origem = fonte
+
+        weak = conf < CASCADE_MIN_CONF or (norm_code(joined) and not norm_price(joined))
+        if escalate:
+            record_level(stats, "page", not weak)
+        if escalate and weak:
+            better = _escalate_line(gray, line_words, stats, require_fields=bool(norm_code(joined)))
+            if better and (norm_price(better[0]) or better[1] > conf):
+                joined, conf = better
+                origem = "ocr_cascade"
+
+        codigo = norm_code(joined)
+        preco = norm_price(joined)
+        titulo = norm_title(joined)
+
+        if codigo or preco or titulo:
+            produtos.append({
+                "page": page_num,
+                "codigo": codigo,
+                "titulo": titulo,
+                "preco": preco,
+                "conf": round(conf, 1),
+                "original": joined,
+                "fonte": origem
+            })
+    return produtos
+
+def _page_sources(job_id: str, pdf_path=None):
+    """
+    Lista (page_num, img_path, pdf_path) das páginas do job.
+    Com pdf_path, cada página é renderizada em memória no worker (sem JPG
+    em disco); senão lê core_pipeline/data/<job>/outputs/pages_jpg/*.jpg.
+    """
+    if pdf_path:
+        with PdfDocument(pdf_path) as doc:
+            print(f"🧠 Renderizando {doc.page_count} páginas em memória ({doc.backend})")
+            return [(n, None, str(pdf_path)) for n in range(1, doc.page_count + 1)]
+
+    pages_dir = PAGES_BASE / job_id / "outputs" / "pages_jpg"
     if not pages_dir.exists():
         print(f"❌ Diretório de páginas não encontrado: {pages_dir}")
-        return
+        return []
 
     imgs = _sorted_pages(pages_dir)
     print(f"🧠 Encontradas {len(imgs)} páginas em: {pages_dir}")
 
-    for img_path in imgs:
-        page_num = int(re.findall(r"\d+", img_path.stem)[0])
+    return [(int(re.findall(r"\d+", p.stem)[0]), str(p), None) for p in imgs]
 
-        img = cv2.imread(str(img_path))
+def _worker_doc(pdf_path):
+    """
+    PdfDocument do worker para pdf_path; fecha o de um PDF anterior.
+    """
+    doc = _worker_docs.get(pdf_path)
+    if doc is None:
+        for old in _worker_docs.values():
+            old.close()
+        _worker_docs.clear()
+        doc = _worker_docs[pdf_path] = PdfDocument(pdf_path)
+    return doc
+
+def _render_pdf_page(doc, page_num: int):
+    """
+    Página do PDF para o OCR → (imagem a 300 DPI, caixas | None).
+    Com GARIMPO_OCR_ROI=1 (e sem o roteador, cujo Paddle lê a página
+    inteira) usa render_page_regions: layout em baixa DPI e só as caixas
+    de produto re-renderizadas a 300 DPI, que seguem direto para o ROI OCR.
+    Sem caixas detectadas, renderiza a página inteira.
+    """
+    if OCR_ROI_MODE and not OCR_ROUTER_MODE:
+        res = render_page_regions(
+            doc.pdf_path, page_num, detector=OCR_ROI_DETECTOR, ocr_dpi=300, doc=doc, grayscale=True
+        )
+        if res["status"] == "success" and res["regions"]:
+            return compose_regions(res)
+    return doc.render_page(page_num, dpi=300), None
+
+def process_page_source(page_num: int, img_path=None, pdf_path=None):
+    """
+    Tarefa do OcrExecutor: carrega a página (JPG ou PDF renderizado em
+    memória) e roda process_page_image.
+    Retorna {"produtos": [...], "cascade": {...}, "route": {...} | None}
+    ou None se a imagem falhar.
+    """
+    boxes = None
+    if pdf_path:
+        img, boxes = _render_pdf_page(_worker_doc(pdf_path), page_num)
+    else:
+        img = cv2.imread(img_path)
         if img is None:
             print(f"⚠️ Falha ao abrir {img_path}")
-            continue
+            return None
 
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        gray = cv2.bilateralFilter(gray, 9, 75, 75)
-        thresh = cv2.adaptiveThreshold(
-            gray, 255,
-            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-            cv2.THRESH_BINARY,
-            31, 2
-        )
+    stats = new_cascade_stats()
+    route = []
+    produtos = process_page_image(img, page_num, stats=stats, route=route, boxes=boxes)
+    return {"produtos": produtos, "cascade": stats, "route": route[0] if route else None}
 
-        ocr = pytesseract.image_to_data(
-            thresh,
-            lang="por",
-            output_type=Output.DICT
-        )
+def process_pages(job_id: str, pdf_path=None, workers=None):
+    out_dir = OUTPUTS_BASE / job_id
+    ensure_dir(out_dir)
 
-        line_map = defaultdict(list)
+    sources = _page_sources(job_id, pdf_path)
+    task = "core_pipeline.extractors.ocr_page_processor:process_page_source"
+    cascade = new_cascade_stats()
+    decisions = []
 
-        n = len(ocr["text"])
-        for i in range(n):
-            txt = (ocr["text"][i] or "").strip()
-            if not txt:
+    with OcrExecutor(task, workers=workers) as executor:
+        for item in executor.map(sources, keys=[s[0] for s in sources]):
+            page_num, result = item["key"], item["result"]
+            if item["error"]:
+                print(f"⚠️ Página {page_num}: {item['error']}")
                 continue
-            try:
-                conf = float(ocr["conf"][i])
-            except:
-                conf = 0
-            if conf < 0:
+            if result is None:
                 continue
+            produtos = result["produtos"]
+            merge_cascade_stats(cascade, result["cascade"])
+            motor = ""
+            if result.get("route"):
+                decision = result["route"]
+                decisions.append(decision)
+                motor = f" [{decision['engine']}: {decision['reason']}]"
 
-            y = ocr["top"][i]
-            key = y // 30
-            line_map[key].append(txt)
-
-        produtos = []
-        for _, words in sorted(line_map.items()):
-            joined = " ".join(words)
-            codigo = norm_code(joined)
-            preco = norm_price(joined)
-            titulo = norm_title(joined)
+            out_json = out_dir / f"page_{page_num:02d}_ocr.json"
+            out_json.write_text(json.dumps(produtos, ensure_ascii=False, indent=2))
 
-            if codigo or preco or titulo:
-                produtos.append({
-                    "page": page_num,
-                    "codigo": codigo,
-                    "titulo": titulo,
-                    "preco": preco,
-                    "original": joined,
-                    "fonte": "ocr_auto"
-                })
+            print(f"✅ Página {page_num}: {len(produtos)} blocos{motor} → {out_json} ({item['seconds']:.1f}s)")
 
-        out_json = out_dir / f"page_{page_num:02d}_ocr.json"
-        out_json.write_text(json.dumps(produtos, ensure_ascii=False, indent=2))
+    # Relatório do job: quantas linhas cada nível da cascata resolveu
+    report = out_dir / "ocr_cascade_stats.json"
+    report.write_text(json.dumps(cascade, ensure_ascii=False, indent=2))
+    resumo = ", ".join(
+        f"{name} {c['accepted']}/{c['runs']}" for name, c in cascade["levels"].items() if c["runs"]
+    )
+    print(f"📊 Cascata: {resumo or 'sem linhas'} → {report}")
 
-        print(f"✅ Página {page_num}: {len(produtos)} blocos → {out_json}")
+    # Decisão do roteador (motor, motivo, tempos) por página
+    if decisions:
+        router_log = out_dir / "ocr_router.json"
+        summary = summarize_decisions(decisions)
+        router_log.write_text(json.dumps(
+            {"summary": summary, "pages": decisions}, ensure_ascii=False, indent=2
+        ))
+        print(f"🔀 Roteador: {summary['engine']} → {router_log}")
 
     print("🎯 OCR concluído.")
 
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 2:
-        print("Uso: python3 ocr_page_processor.py <JOB_ID>")
+        print("Uso: python3 ocr_page_processor.py <JOB_ID> [PDF_PATH]")
         raise SystemExit(1)
-    process_pages(sys.argv[1])
\ No newline at end of file
+    process_pages(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
\ No newline at end of file
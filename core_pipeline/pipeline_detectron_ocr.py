@@ -1,7 +1,13 @@
-import pytesseract, json
+import os, sys, json
 import cv2
 from pathlib import Path
 
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api.ocr_cache import tesseract_image_to_data
+
 IN_DIR = Path("data/pages")
 OUT_DIR = Path("core_pipeline/outputs")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -11,7 +17,7 @@ all_blocks = []
 
 for img_file in sorted(IN_DIR.glob("page_*.jpg")):
     img = cv2.imread(str(img_file))
-    data = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT, lang="por")
+    data = tesseract_image_to_data(img, lang="por")
     blocks = []
     for i in range(len(data["text"])):
         txt = data["text"][i].strip()
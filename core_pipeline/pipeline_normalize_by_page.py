@@ -35,6 +35,35 @@ def norm_title(txt: str) -> str:
     t = re.sub(r"R\$ ?[\d\.,]+", "", t, flags=re.I)
     return re.sub(r"\s+", " ", t).strip()
 
+def normalize_page(pg: int, data: list) -> list:
+    """
+    Normaliza os blocos OCR de uma página.
+    Aceita tanto dicts (com "original") quanto linhas de texto simples.
+    """
+    norm = []
+    for blk in data:
+        if isinstance(blk, str):
+            blk = {"original": blk}
+        raw = blk.get("original","")
+        codigo = blk.get("codigo") or norm_code(raw)
+        preco  = blk.get("preco")  or norm_price(raw)
+        titulo = blk.get("titulo") or norm_title(raw)
+
+        img = blk.get("imagem") or ""
+        if not img and codigo:
+            img = f"/crops/page_{pg:02d}_{codigo}.jpg"
+
+        norm.append({
+            "page": pg,
+            "codigo": codigo,
+            "titulo": titulo,
+            "preco": preco,
+            "imagem": img,
+            "fonte": "ocr_normalized",
+            "original": raw
+        })
+    return norm
+
 def normalize_upload(job_id: str):
     out_dir = OUT_BASE / job_id
     if not out_dir.exists():
@@ -48,26 +77,7 @@ def normalize_upload(job_id: str):
         pg = int(re.findall(r"\d+", ocr_path.stem)[0])
         data = json.loads(ocr_path.read_text())
 
-        norm = []
-        for blk in data:
-            raw = blk.get("original","")
-            codigo = blk.get("codigo") or norm_code(raw)
-            preco  = blk.get("preco")  or norm_price(raw)
-            titulo = blk.get("titulo") or norm_title(raw)
-
-            img = blk.get("imagem") or ""
-            if not img and codigo:
-                img = f"/crops/page_{pg:02d}_{codigo}.jpg"
-
-            norm.append({
-                "page": pg,
-                "codigo": codigo,
-                "titulo": titulo,
-                "preco": preco,
-                "imagem": img,
-                "fonte": "ocr_normalized",
-                "original": raw
-            })
+        norm = normalize_page(pg, data)
 
         out_norm = out_dir / f"normalized_page_{pg:02d}.json"
         out_norm.write_text(json.dumps(norm, ensure_ascii=False, indent=2))
@@ -70,18 +70,23 @@ def extrair_produtos(pdf_path):
                 "descricao": ""
             })
 
-    # Extrai imagens reais
+    # Extrai imagens reais (cada xref é gravado uma única vez)
+    gravadas = {}
     with fitz.open(pdf_path) as pdf_img:
         for i, page in enumerate(pdf_img):
             for j, img in enumerate(page.get_images(full=True)):
                 xref = img[0]
-                base_image = pdf_img.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                image_filename = f"{pdf_path.stem}_p{i+1}_{j}.{image_ext}"
-                image_path = IMG_DIR / image_filename
-                with open(image_path, "wb") as f:
-                    f.write(image_bytes)
+                if xref in gravadas:
+                    image_filename = gravadas[xref]
+                else:
+                    base_image = pdf_img.extract_image(xref)
+                    image_bytes = base_image["image"]
+                    image_ext = base_image["ext"]
+                    image_filename = f"{pdf_path.stem}_p{i+1}_{j}.{image_ext}"
+                    image_path = IMG_DIR / image_filename
+                    with open(image_path, "wb") as f:
+                        f.write(image_bytes)
+                    gravadas[xref] = image_filename
 
                 # Vincula imagem ao produto se possível
                 if j < len(produtos):
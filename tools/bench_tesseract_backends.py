@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Compara os backends do Tesseract (pytesseract × tesserocr) no OCR por
+recorte: caixas de find_boxes_multi de uma página, mesmas chamadas do
+ocr_duplo (image_to_string --psm 6) e do ocr_page_processor (image_to_data).
+
+Uso:
+    python tools/bench_tesseract_backends.py core_pipeline/data/<JOB>/outputs/pages_jpg/page_05.jpg [REPETIÇÕES]
+"""
+import os
+import sys
+import time
+
+import cv2
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from core_pipeline.api import tesseract_engine
+from core_pipeline.calibra_p10.utils_calibra import find_boxes_multi
+
+if len(sys.argv) < 2:
+    print("Uso: python tools/bench_tesseract_backends.py page_XX.jpg [REPETIÇÕES]")
+    sys.exit(1)
+
+img = cv2.imread(sys.argv[1])
+if img is None:
+    print(f"❌ Falha ao abrir {sys.argv[1]}")
+    sys.exit(1)
+reps = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+crops = [gray[y1:y2, x1:x2] for x1, y1, x2, y2, _ in find_boxes_multi(img)]
+print(f"📄 {len(crops)} recortes × {reps} repetições")
+
+backends = ["pytesseract"] + (["tesserocr"] if tesseract_engine.tesserocr is not None else [])
+outputs = {}
+
+for backend in backends:
+    for name, call in (
+        ("image_to_string", lambda c: tesseract_engine.image_to_string(c, lang="por+eng", config="--psm 6", backend=backend)),
+        ("image_to_data", lambda c: tesseract_engine.image_to_data(c, lang="por", backend=backend)),
+    ):
+        call(crops[0])  # aquecimento (carrega traineddata / cria o handle)
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            out = [call(c) for c in crops]
+        ms = (time.perf_counter() - t0) * 1000 / (reps * len(crops))
+        outputs[(backend, name)] = out
+        print(f"{backend:12s} {name:16s} {ms:8.1f} ms/recorte")
+
+if len(backends) == 2:
+    same = sum(
+        " ".join(a.split()) == " ".join(b.split())
+        for a, b in zip(outputs[("pytesseract", "image_to_string")], outputs[("tesserocr", "image_to_string")])
+    )
+    print(f"🔎 Texto idêntico em {same}/{len(crops)} recortes (image_to_string)")
+else:
+    print("⚠️ tesserocr não instalado: apenas o pytesseract foi medido")